@@ -1,7 +1,10 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from typing import Optional
 from pydantic import BaseModel
 import joblib
 import pandas as pd
+from retrieval_api import router as retrieval_router
+from spatial_api import find_comparables, router as spatial_router
 
 #X_new = pd.DataFrame(
 #   [[47, 'Łódź Bałuty', 2, True, 16.0, '6 dni temu']],
@@ -14,6 +17,9 @@ class PricePrediction(BaseModel):
     owner_direct: bool
     photos: int
     date_posted: str
+    # Opcjonalna lokalizacja: odpowiedź zawiera wtedy porównywalne oferty w pobliżu
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
 
 def predict_price(area_m2: float, locality: str, rooms: int, owner_direct: bool, photos: int, date_posted: str) -> float:
@@ -27,6 +33,8 @@ def predict_price(area_m2: float, locality: str, rooms: int, owner_direct: bool,
 
 
 app = FastAPI(title="Housing API")
+app.include_router(retrieval_router)
+app.include_router(spatial_router)
 
 @app.get("/")
 def read_root():
@@ -42,7 +50,17 @@ async def predict(offer: PricePrediction):
         photos=offer.photos,
         date_posted=offer.date_posted
     )
-    return {"predicted_price": price}
+    response = {"predicted_price": price}
+    if offer.latitude is not None and offer.longitude is not None:
+        try:
+            response["comparables"] = find_comparables(
+                offer.latitude, offer.longitude, rooms=offer.rooms, area=offer.area_m2, k=5
+            )
+        except HTTPException as e:
+            # Brak indeksu przestrzennego nie może blokować wyceny
+            response["comparables"] = []
+            response["comparables_note"] = e.detail
+    return response
 
 @app.get("/train_model/")
 async def train_model():
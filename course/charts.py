@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+# Zserializowane wykresy (JSON Plotly) - wspólne dla wszystkich sesji i restartów aplikacji
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / ".figure_cache"
+MEMORY_CACHE_SIZE = 64
+# Na dysku zostaje tyle ostatnio używanych figur; starsze (np. z poprzednich wersji danych) są usuwane
+DISK_CACHE_FILES = 512
+
+# Górna granica punktów wysyłanych do przeglądarki na jeden wykres punktowy
+MAX_SCATTER_POINTS = 2000
+GRID_BINS = 50
+SCATTER_METHODS = ["grid", "lttb", "density"]
+
+
+def data_version(paths):
+    """Wersja danych: skrót ścieżek, rozmiarów i czasów modyfikacji plików (nowy snapshot = nowa wersja)."""
+    digest = hashlib.sha1()
+    for path in sorted(str(p) for p in paths):
+        stat = os.stat(path) if os.path.exists(path) else None
+        digest.update(f"{path}:{stat.st_size if stat else -1}:{stat.st_mtime_ns if stat else -1};".encode())
+    return digest.hexdigest()[:16]
+
+
+class FigureCache:
+    """
+    Pamięć podręczna wykresów po stronie serwera: klucz to nazwa wykresu,
+    wersja danych i filtry, a wartość - JSON figury Plotly. Najpierw LRU
+    w pamięci procesu, potem plik na dysku; wykres jest budowany tylko
+    wtedy, gdy nie ma go w żadnym z nich. Katalog na dysku trzyma najwyżej
+    disk_files ostatnio używanych figur.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, memory_size=MEMORY_CACHE_SIZE, disk_files=DISK_CACHE_FILES):
+        self.cache_dir = Path(cache_dir)
+        self.memory_size = memory_size
+        self.disk_files = disk_files
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = {"memory": 0, "disk": 0, "built": 0}
+
+    @staticmethod
+    def key(name, version, filters=None):
+        payload = json.dumps([name, version, filters or {}], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, key, figure_json):
+        with self._lock:
+            self._memory[key] = figure_json
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _prune_disk(self):
+        # Czas modyfikacji = ostatnie użycie (odczyt z dysku go odświeża), więc usuwamy najdawniej używane
+        files = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                files.append((path.stat().st_mtime_ns, path))
+            except FileNotFoundError:
+                continue
+        if len(files) <= self.disk_files:
+            return
+        for _, path in sorted(files)[:len(files) - self.disk_files]:
+            path.unlink(missing_ok=True)
+
+    def get_json(self, name, version, filters, build):
+        """
+        Args:
+            name (str): Nazwa wykresu
+            version (str): Wersja danych (np. data_version)
+            filters (dict): Filtry, od których zależy wykres
+            build (callable): Funkcja bez argumentów zwracająca go.Figure
+
+        Returns:
+            str: JSON figury
+        """
+        key = self.key(name, version, filters)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits["memory"] += 1
+                return self._memory[key]
+
+        path = self.cache_dir / f"{key}.json"
+        try:
+            figure_json = path.read_text(encoding="utf-8")
+            os.utime(path)
+            self.hits["disk"] += 1
+        except FileNotFoundError:
+            figure_json = build().to_json()
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(figure_json, encoding="utf-8")
+            os.replace(tmp_path, path)
+            self.hits["built"] += 1
+            self._prune_disk()
+        self._remember(key, figure_json)
+        return figure_json
+
+    def get(self, name, version, filters, build):
+        """Jak get_json, ale zwraca go.Figure."""
+        return pio.from_json(self.get_json(name, version, filters, build))
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: z punktów posortowanych po x wybiera n_out
+    tak, by zachować kształt wykresu (ekstrema zostają, gęste odcinki są przerzedzane).
+
+    Returns:
+        np.ndarray: Indeksy wybranych punktów (względem x, y)
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    order = np.argsort(x, kind="stable")
+    xs, ys = x[order], y[order]
+    # Pierwszy i ostatni punkt zostają; środek dzielimy na n_out - 2 kubełki
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = [0]
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if end <= start:
+            continue
+        next_start, next_end = end, (edges[i + 2] if i + 2 < len(edges) else n)
+        next_x, next_y = xs[next_start:next_end].mean(), ys[next_start:next_end].mean()
+        area = np.abs((xs[previous] - next_x) * (ys[start:end] - ys[previous])
+                      - (xs[previous] - xs[start:end]) * (next_y - ys[previous]))
+        previous = start + int(np.argmax(area))
+        selected.append(previous)
+    selected.append(n - 1)
+    return order[selected]
+
+
+def grid_sample_indices(x, y, max_points=MAX_SCATTER_POINTS, bins=GRID_BINS, seed=42):
+    """
+    Próbkowanie warstwowe po siatce bins x bins: z każdej zajętej komórki
+    zostaje co najmniej jeden punkt (wartości odstające są widoczne), a gęste
+    komórki są przerzedzane do wspólnego limitu, tak by łącznie było <= max_points.
+
+    Returns:
+        np.ndarray: Posortowane indeksy wybranych punktów
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+
+    def cell_index(values):
+        low, high = values.min(), values.max()
+        scaled = (values - low) / (high - low) if high > low else np.zeros_like(values)
+        return np.minimum((scaled * bins).astype(np.int64), bins - 1)
+
+    cells = cell_index(x) * bins + cell_index(y)
+    rng = np.random.default_rng(seed)
+    shuffled = rng.permutation(n)
+    shuffled = shuffled[np.argsort(cells[shuffled], kind="stable")]
+    sorted_cells = cells[shuffled]
+    first = np.searchsorted(sorted_cells, sorted_cells, side="left")
+    rank_in_cell = np.arange(n) - first
+
+    # Największy limit na komórkę, przy którym łączna liczba punktów mieści się w max_points
+    counts = np.bincount(cells)
+    counts = counts[counts > 0]
+    low, high = 1, int(counts.max())
+    while low < high:
+        middle = (low + high + 1) // 2
+        if np.minimum(counts, middle).sum() <= max_points:
+            low = middle
+        else:
+            high = middle - 1
+    chosen = shuffled[rank_in_cell < low]
+    if len(chosen) > max_points:
+        chosen = rng.choice(chosen, size=max_points, replace=False)
+    return np.sort(chosen)
+
+
+def scatter_figure(df, x, y, max_points=MAX_SCATTER_POINTS, method="grid", hover=None, labels=None, title=None):
+    """
+    Wykres punktowy o ograniczonym rozmiarze niezależnie od liczby wierszy.
+
+    Args:
+        df (pd.DataFrame): Dane
+        x (str): Kolumna osi X
+        y (str): Kolumna osi Y
+        max_points (int): Maksymalna liczba punktów w figurze
+        method (str): grid - próbkowanie warstwowe po siatce, lttb - Largest-Triangle-Three-Buckets
+            po osi X, density - mapa gęstości (liczności w siatce GRID_BINS x GRID_BINS)
+        hover (list): Kolumny w podpowiedzi
+        labels (dict): Opisy osi
+        title (str): Tytuł
+
+    Returns:
+        go.Figure: Wykres z adnotacją, ile punktów pokazano
+    """
+    if method not in SCATTER_METHODS:
+        raise ValueError(f"Nieznana metoda '{method}'. Dostępne: {', '.join(SCATTER_METHODS)}")
+    labels = labels or {}
+    data = df[[x, y, *(hover or [])]].dropna(subset=[x, y])
+    n = len(data)
+
+    if method == "density" and n > max_points:
+        counts, x_edges, y_edges = np.histogram2d(data[x], data[y], bins=GRID_BINS)
+        figure = go.Figure(go.Heatmap(
+            x=(x_edges[:-1] + x_edges[1:]) / 2, y=(y_edges[:-1] + y_edges[1:]) / 2,
+            z=np.where(counts.T > 0, counts.T, np.nan), colorscale="Viridis", colorbar={"title": "Liczba"},
+        ))
+        shown = f"mapa gęstości {n} ogłoszeń"
+    else:
+        if method == "lttb":
+            keep = lttb_indices(data[x].to_numpy(), data[y].to_numpy(), max_points)
+        else:
+            keep = grid_sample_indices(data[x].to_numpy(), data[y].to_numpy(), max_points)
+        sample = data.iloc[keep]
+        figure = go.Figure(go.Scattergl(
+            x=sample[x], y=sample[y], mode="markers", marker={"size": 5, "opacity": 0.6},
+            customdata=sample[hover].to_numpy() if hover else None,
+            hovertemplate=(
+                f"{labels.get(x, x)}: %{{x}}<br>{labels.get(y, y)}: %{{y}}"
+                + "".join(f"<br>{column}: %{{customdata[{i}]}}" for i, column in enumerate(hover or []))
+                + "<extra></extra>"
+            ),
+        ))
+        shown = f"{len(sample)} z {n} ogłoszeń" if len(sample) < n else f"{n} ogłoszeń"
+    figure.update_layout(title=f"{title} ({shown})" if title else shown,
+                         xaxis_title=labels.get(x, x), yaxis_title=labels.get(y, y))
+    return figure
+
+
+def box_figure(stats, title=None, axis_title=None):
+    """
+    Wykres pudełkowy z gotowych statystyk (np. kwantyli z kostki), bez
+    przesyłania do przeglądarki wszystkich wartości.
+
+    Args:
+        stats (dict): Nazwa grupy -> dict z q1, median, q3, lowerfence, upperfence
+        title (str): Tytuł
+        axis_title (str): Opis osi wartości
+    """
+    figure = go.Figure()
+    for name, box in stats.items():
+        if box is None:
+            continue
+        figure.add_trace(go.Box(
+            name=name, q1=[box["q1"]], median=[box["median"]], q3=[box["q3"]],
+            lowerfence=[box["lowerfence"]], upperfence=[box["upperfence"]], showlegend=False,
+            boxpoints=False,
+        ))
+    figure.update_layout(title=title, yaxis_title=axis_title)
+    return figure
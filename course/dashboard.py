@@ -0,0 +1,149 @@
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import streamlit as st
+
+from charts import SCATTER_METHODS, FigureCache, box_figure, data_version, scatter_figure
+
+# Kostka statystyk rynku (scraper/market_stats.py) - dashboard nie czyta wierszy ogłoszeń
+SCRAPER_DIR = Path(__file__).resolve().parent.parent / "scraper"
+sys.path.append(str(SCRAPER_DIR))
+
+from market_stats import (  # noqa: E402
+    DEFAULT_CUBE_PATH, HISTOGRAM_EDGES, latest_weeks, load_cube, out_of_range, rollup, rooms_bucket,
+)
+
+DATA_DIR = SCRAPER_DIR / "data"
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+MIN_LISTINGS = 5
+
+
+@st.cache_resource
+def figure_cache():
+    return FigureCache()
+
+
+@st.cache_data
+def cached_cube(cube_version):
+    # Wersja = czas modyfikacji pliku kostki: nowy snapshot unieważnia cache
+    return load_cube(DEFAULT_CUBE_PATH)
+
+
+def city_cells(cube, city, buckets, week):
+    cells = cube[(cube["city"] == city) & cube["rooms_bucket"].isin(buckets)]
+    if week == "najnowszy":
+        return latest_weeks(cells)
+    return cells[cells["week"] == week]
+
+
+def ranking_figure(districts):
+    ranking = districts.sort_values("price_sqm_zl_q50")
+    return px.bar(
+        ranking, x="price_sqm_zl_q50", y="locality", orientation="h",
+        hover_data={"listings": True, "price_sqm_zl_mean": ":.0f"},
+        labels={"price_sqm_zl_q50": "Mediana ceny za m² [zł]", "locality": "Dzielnica"},
+        title="Ranking dzielnic wg mediany ceny za m²",
+    )
+
+
+def boxplot_figure(districts):
+    # Statystyki pudełek policzone z histogramów kostki; wąsy to kwantyle 5% i 95%
+    stats = {
+        row.locality: {"q1": row.price_total_zl_q25, "median": row.price_total_zl_q50, "q3": row.price_total_zl_q75,
+                       "lowerfence": row.price_total_zl_q5, "upperfence": row.price_total_zl_q95}
+        for row in districts.sort_values("price_total_zl_q50").itertuples(index=False)
+    }
+    return box_figure(stats, "Ceny mieszkań w dzielnicach", "Cena [zł]")
+
+
+def histogram_figure(hist, measure, title, axis_title):
+    # Skrajne liczności histogramu to wartości poza zakresem przedziałów - tylko w tytule
+    edges = HISTOGRAM_EDGES[measure]
+    figure = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=hist[1:-1], width=np.diff(edges)))
+    if out_of_range(hist):
+        title = f"{title} (poza zakresem: {hist[0]} poniżej {edges[0]:.0f}, {hist[-1]} od {edges[-1]:.0f})"
+    figure.update_layout(title=title, xaxis_title=axis_title, yaxis_title="Liczba ogłoszeń", bargap=0)
+    return figure
+
+
+def listings_scatter(csv_path, buckets, method):
+    # Jedyny wykres z wierszy ogłoszeń: czytany tylko przy braku figury w cache
+    df = pd.read_csv(csv_path, usecols=["area", "price_total_zl", "rooms", "locality"])
+    df["price_total_zl"] = pd.to_numeric(df["price_total_zl"], errors="coerce")
+    df = df[rooms_bucket(df["rooms"]).isin(buckets)]
+    return scatter_figure(
+        df, "area", "price_total_zl", method=method, hover=["locality", "rooms"],
+        labels={"area": "Powierzchnia [m²]", "price_total_zl": "Cena [zł]"}, title="Powierzchnia a cena",
+    )
+
+
+def trend_figure(trend):
+    return px.line(trend, x="week", y="price_sqm_zl_q50", markers=True,
+                   labels={"week": "Tydzień", "price_sqm_zl_q50": "Mediana ceny za m² [zł]"},
+                   title="Mediana ceny za m² w czasie")
+
+
+def main():
+    st.title("Rynek mieszkań - statystyki dzielnic")
+    if not os.path.exists(DEFAULT_CUBE_PATH):
+        st.error("Brak kostki statystyk - uruchom: python scraper/market_stats.py update scraper/data/*_cleaned.csv")
+        return
+    cube = cached_cube(os.path.getmtime(DEFAULT_CUBE_PATH))
+
+    city = st.sidebar.selectbox("Miasto", sorted(cube["city"].unique()))
+    buckets = st.sidebar.multiselect("Liczba pokoi", sorted(cube["rooms_bucket"].unique()),
+                                     default=sorted(cube["rooms_bucket"].unique()))
+    weeks = sorted(cube.loc[cube["city"] == city, "week"].unique(), reverse=True)
+    week = st.sidebar.selectbox("Tydzień snapshotu", ["najnowszy", *weeks])
+
+    cells = city_cells(cube, city, buckets, week)
+    if cells.empty:
+        st.warning("Brak ogłoszeń dla wybranych filtrów")
+        return
+    total = rollup(cells, ["city"], QUANTILES).iloc[0]
+    districts = rollup(cells, ["locality"], QUANTILES)
+    districts = districts[districts["listings"] >= MIN_LISTINGS]
+
+    left, middle, right = st.columns(3)
+    left.metric("Ogłoszenia", f"{total['listings']:,}".replace(",", " "))
+    middle.metric("Mediana ceny za m²", f"{total['price_sqm_zl_q50']:,.0f} zł".replace(",", " "))
+    right.metric("Mediana ceny", f"{total['price_total_zl_q50']:,.0f} zł".replace(",", " "))
+
+    # Figury z kostki: klucz = wersja kostki + filtry, więc kolejne odświeżenia nie budują ich od nowa
+    cache = figure_cache()
+    cube_version = data_version([DEFAULT_CUBE_PATH])
+    filters = {"city": city, "rooms": sorted(buckets), "week": week}
+    st.plotly_chart(cache.get("ranking", cube_version, filters, lambda: ranking_figure(districts)), width="stretch")
+    st.plotly_chart(cache.get("boxplot", cube_version, filters, lambda: boxplot_figure(districts)), width="stretch")
+    st.plotly_chart(cache.get("area_histogram", cube_version, filters, lambda: histogram_figure(
+        total["area_hist"], "area", "Histogram powierzchni mieszkań", "Powierzchnia [m²]")), width="stretch")
+
+    # Trend: mediana ceny za m² w kolejnych tygodniach (wszystkie tygodnie z kostki)
+    trend_cells = cube[(cube["city"] == city) & cube["rooms_bucket"].isin(buckets)]
+    st.plotly_chart(cache.get("trend", cube_version, {"city": city, "rooms": sorted(buckets)}, lambda: trend_figure(
+        rollup(trend_cells, ["week"], QUANTILES).sort_values("week"))), width="stretch")
+
+    # Wykres punktowy z aktualnego snapshotu: najwyżej MAX_SCATTER_POINTS punktów niezależnie od liczby ogłoszeń
+    csv_path = DATA_DIR / f"ogloszenia_{city}_cleaned.csv"
+    if csv_path.exists():
+        method = st.radio("Wykres punktowy", SCATTER_METHODS, horizontal=True,
+                          format_func={"grid": "próbka z siatki", "lttb": "LTTB", "density": "mapa gęstości"}.get)
+        st.plotly_chart(cache.get("scatter", data_version([csv_path]), {"rooms": sorted(buckets), "method": method},
+                                  lambda: listings_scatter(csv_path, buckets, method)), width="stretch")
+
+    st.dataframe(
+        districts.sort_values("price_sqm_zl_q50", ascending=False)[
+            ["locality", "listings", "price_sqm_zl_q50", "price_sqm_zl_mean", "price_total_zl_q50", "area_q50"]
+        ].round(0),
+        hide_index=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+
+# Moduły wyszukiwarki leżą w katalogu rag/ repozytorium
+RAG_DIR = Path(__file__).resolve().parent.parent / "rag"
+sys.path.append(str(RAG_DIR))
+
+from embeddings import MicroBatcher  # noqa: E402
+from retrieval import DEFAULT_INDEX_DIR, META_FILE, ListingRetriever  # noqa: E402
+
+MAX_K = 50
+MAX_BATCH = 64
+
+
+class SearchFilters(BaseModel):
+    city: Optional[str] = None
+    min_rooms: Optional[int] = None
+    max_rooms: Optional[int] = None
+    min_area: Optional[float] = None
+    max_area: Optional[float] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+
+    def to_dict(self):
+        filters = {}
+        if self.city:
+            filters["city"] = self.city
+        for column, low, high in [
+            ("rooms", self.min_rooms, self.max_rooms),
+            ("area", self.min_area, self.max_area),
+            ("price_total_zl", self.min_price, self.max_price),
+        ]:
+            if low is not None or high is not None:
+                filters[column] = (low, high)
+        return filters
+
+
+class SearchQuery(BaseModel):
+    query: str
+    k: int = Field(5, ge=1, le=MAX_K)
+    nprobe: Optional[int] = Field(None, ge=1)
+    mode: Literal["hybrid", "vector", "keyword"] = "hybrid"
+    filters: Optional[SearchFilters] = None
+
+
+class BatchSearchQuery(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=MAX_BATCH)
+    k: int = Field(5, ge=1, le=MAX_K)
+    nprobe: Optional[int] = Field(None, ge=1)
+    mode: Literal["hybrid", "vector", "keyword"] = "hybrid"
+    filters: Optional[SearchFilters] = None
+
+
+@lru_cache(maxsize=1)
+def _open_retriever(built_mtime_ns) -> ListingRetriever:
+    retriever = ListingRetriever(DEFAULT_INDEX_DIR)
+    # Równoległe żądania (pula wątków FastAPI) liczone jedną partią modelu
+    retriever.embedder = MicroBatcher(retriever.embedder)
+    return retriever
+
+
+def get_retriever() -> ListingRetriever:
+    # Indeks budowany offline (rag/retrieval.py build) - tu tylko otwierany;
+    # build podmienia cały katalog z nowym meta.json, więc zmiana jego czasu
+    # modyfikacji oznacza nowy indeks i wczytanie go bez restartu serwera
+    meta_path = Path(DEFAULT_INDEX_DIR) / META_FILE
+    if not meta_path.exists():
+        raise HTTPException(status_code=503, detail="Brak indeksu - uruchom: python rag/retrieval.py build")
+    return _open_retriever(meta_path.stat().st_mtime_ns)
+
+
+router = APIRouter(prefix="/retrieval", tags=["retrieval"])
+
+
+@router.post("/search/")
+def search(request: SearchQuery):
+    """Ogłoszenia (bez powtórzeń) najlepiej pasujące do zapytania: BM25 + wektory, filtry przed rankingiem."""
+    filters = request.filters.to_dict() if request.filters else None
+    results = get_retriever().search(request.query, request.k, request.nprobe, mode=request.mode, filters=filters)
+    return {"query": request.query, "results": results}
+
+
+@router.post("/search_batch/")
+def search_batch(request: BatchSearchQuery):
+    """Wiele zapytań naraz: jedna partia embeddingów i jedno przeszukanie indeksu."""
+    filters = request.filters.to_dict() if request.filters else None
+    results = get_retriever().search(request.queries, request.k, request.nprobe, mode=request.mode, filters=filters)
+    return {"results": [{"query": query, "results": hits} for query, hits in zip(request.queries, results)]}
@@ -0,0 +1,61 @@
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+# Indeks przestrzenny leży w katalogu model/ repozytorium
+MODEL_DIR = Path(__file__).resolve().parent.parent / "model"
+sys.path.append(str(MODEL_DIR))
+
+from spatial import DEFAULT_RADIUS_KM, DEFAULT_SPATIAL_INDEX_PATH, SpatialIndex, offers_to_records  # noqa: E402
+
+MAX_K = 50
+MAX_RADIUS_KM = 20.0
+
+
+@lru_cache(maxsize=1)
+def _load_spatial_index(mtime_ns) -> SpatialIndex:
+    return SpatialIndex.load(DEFAULT_SPATIAL_INDEX_PATH)
+
+
+def get_spatial_index() -> SpatialIndex:
+    # Indeks budowany offline (model/spatial.py build) - tu tylko wczytywany;
+    # kluczem cache jest czas modyfikacji pliku, więc przebudowany indeks jest
+    # wczytywany przy następnym żądaniu, bez restartu serwera
+    path = Path(DEFAULT_SPATIAL_INDEX_PATH)
+    if not path.exists():
+        raise HTTPException(status_code=503, detail="Brak indeksu - uruchom: python model/spatial.py build")
+    return _load_spatial_index(path.stat().st_mtime_ns)
+
+
+def find_comparables(latitude, longitude, radius_km=DEFAULT_RADIUS_KM, k=10, rooms=None, area=None):
+    offers = get_spatial_index().comparables(latitude, longitude, radius_km, k, rooms, area)
+    return offers_to_records(offers)
+
+
+router = APIRouter(prefix="/spatial", tags=["spatial"])
+
+
+@router.get("/nearest/")
+def nearest(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(10, ge=1, le=MAX_K),
+):
+    """k ofert najbliższych punktowi (zapytanie do BallTree, bez przeglądania całego zbioru)."""
+    return {"results": offers_to_records(get_spatial_index().nearest(lat, lon, k))}
+
+
+@router.get("/comparables/")
+def comparables(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(DEFAULT_RADIUS_KM, gt=0, le=MAX_RADIUS_KM),
+    k: int = Query(10, ge=1, le=MAX_K),
+    rooms: Optional[int] = Query(None, ge=1),
+    area: Optional[float] = Query(None, gt=0),
+):
+    """Porównywalne oferty w promieniu radius_km: ta sama liczba pokoi, metraż +-25%."""
+    return {"results": find_comparables(lat, lon, radius_km, k, rooms, area)}
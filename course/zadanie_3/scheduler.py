@@ -1,17 +1,440 @@
-import schedule, time
+import argparse
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from scrape import main as scrape_main
+from pathlib import Path
 
-def run_scraper():
-    print(f"Uruchamianie scrapera o {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    scrape_main()
-    print(f"Zakończono scrapera o {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+import schedule
 
-#schedule.every(24).hours.do(run_scraper)
-schedule.every().day.at("15:48").do(run_scraper)
+REPO_ROOT = Path(__file__).resolve().parents[2]
+SCHEDULER_DIR = Path(__file__).resolve().parent
+DEFAULT_DB_PATH = SCHEDULER_DIR / "scheduler_history.sqlite"
+DEFAULT_LOCK_DIR = SCHEDULER_DIR / "locks"
+DEFAULT_LOG_DIR = SCHEDULER_DIR / "logs"
 
-while True:
-    schedule.run_pending()
-    time.sleep(60)
+# Miasta i liczba stron do scrapowania (jak w .github/workflows/scaper.yml)
+CITIES = {
+    "warszawa": 11,
+    "wroclaw": 9,
+    "lodz": 8,
+    "krakow": 10,
+}
 
+DEFAULT_MAX_WORKERS = 4
+POLL_SECONDS = 0.5
 
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    pipeline_run TEXT NOT NULL,
+    job TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    duration_seconds REAL,
+    returncode INTEGER,
+    log_file TEXT,
+    error_tail TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_job ON runs(job, started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_pipeline ON runs(pipeline_run);
+"""
+
+
+def build_pipeline(cities=CITIES):
+    """
+    Graf zadań potoku: scrape -> szczegóły -> czyszczenie dla każdego miasta,
+    potem historia ogłoszeń, trening modelu i PDFy.
+
+    Returns:
+        dict: nazwa zadania -> {command, cwd, depends_on, timeout}
+    """
+    python = sys.executable
+    data_dir = REPO_ROOT / "scraper" / "data"
+    jobs = {}
+    for city, pages in cities.items():
+        listing = data_dir / f"ogloszenia_{city}.csv"
+        detailed = data_dir / f"ogloszenia_{city}_detailed.csv"
+        jobs[f"scrape_{city}"] = {
+            "command": [python, "scraper/scrape.py", "--city", city, "--pages", str(pages), "--output", str(listing)],
+            "depends_on": [],
+            "timeout": 30 * 60,
+        }
+        jobs[f"details_{city}"] = {
+            "command": [python, "scraper/scrape_more.py", "--input", str(listing), "--output", str(detailed),
+                        "--delay", "0.01"],
+            "depends_on": [f"scrape_{city}"],
+            "timeout": 2 * 60 * 60,
+        }
+        jobs[f"clean_{city}"] = {
+            "command": [python, "scraper/clean_data.py", str(detailed), "--remove-price-ask"],
+            "depends_on": [f"details_{city}"],
+            "timeout": 10 * 60,
+        }
+
+    cleaned = [f"clean_{city}" for city in cities]
+    jobs["history"] = {
+        "command": [python, "scraper/history.py", "update",
+                    *[str(data_dir / f"ogloszenia_{city}_cleaned.csv") for city in cities]],
+        "depends_on": cleaned,
+        "timeout": 10 * 60,
+    }
+    jobs["market_stats"] = {
+        "command": [python, "scraper/market_stats.py", "update",
+                    *[str(data_dir / f"ogloszenia_{city}_cleaned.csv") for city in cities]],
+        "depends_on": cleaned,
+        "timeout": 10 * 60,
+    }
+    jobs["spatial_index"] = {
+        "command": [python, "model/spatial.py", "build"],
+        "depends_on": cleaned,
+        "timeout": 10 * 60,
+    }
+    jobs["retrain"] = {
+        "command": [python, "train.py"],
+        "cwd": REPO_ROOT / "model",
+        "depends_on": [f"details_{city}" for city in cities],
+        "timeout": 60 * 60,
+    }
+    if "lodz" in cities:
+        jobs["pdfs"] = {
+            "command": [python, "documents/generate_pdfs.py", "--workers", "0"],
+            "depends_on": ["details_lodz"],
+            "timeout": 30 * 60,
+        }
+    return jobs
+
+
+def topological_order(jobs):
+    """Kolejność zadań zgodna z zależnościami; błąd przy cyklu lub nieznanej zależności."""
+    for name, job in jobs.items():
+        missing = [dep for dep in job["depends_on"] if dep not in jobs]
+        if missing:
+            raise ValueError(f"Zadanie '{name}' zależy od nieznanych zadań: {', '.join(missing)}")
+
+    remaining = {name: set(job["depends_on"]) for name, job in jobs.items()}
+    order = []
+    while remaining:
+        ready = sorted(name for name, deps in remaining.items() if not deps)
+        if not ready:
+            raise ValueError(f"Cykl w zależnościach zadań: {', '.join(sorted(remaining))}")
+        for name in ready:
+            order.append(name)
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return order
+
+
+def select_jobs(jobs, selected):
+    """Wybrane zadania razem ze wszystkimi ich zależnościami."""
+    needed, stack = set(), list(selected)
+    while stack:
+        name = stack.pop()
+        if name not in jobs:
+            raise ValueError(f"Nieznane zadanie '{name}'. Dostępne: {', '.join(jobs)}")
+        if name not in needed:
+            needed.add(name)
+            stack.extend(jobs[name]["depends_on"])
+    return {name: job for name, job in jobs.items() if name in needed}
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Blokada na pliku (O_EXCL) z PID właściciela; blokada po martwym procesie
+    jest przejmowana. Zwraca True, jeśli udało się ją założyć.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    acquired = False
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                pid = int(path.read_text().strip() or 0)
+            except (OSError, ValueError):
+                pid = 0
+            if pid and _pid_alive(pid):
+                break
+            path.unlink(missing_ok=True)
+            continue
+        with os.fdopen(fd, "w") as f:
+            f.write(str(os.getpid()))
+        acquired = True
+        break
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            path.unlink(missing_ok=True)
+
+
+class RunHistory:
+    """Historia uruchomień zadań w SQLite (czasy, statusy, końcówka logu przy błędzie)."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript(SCHEMA)
+
+    def record(self, pipeline_run, job, status, started_at=None, finished_at=None, duration=None,
+               returncode=None, log_file=None, error_tail=None):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                "INSERT INTO runs (pipeline_run, job, status, started_at, finished_at, duration_seconds, "
+                "returncode, log_file, error_tail) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (pipeline_run, job, status, started_at, finished_at,
+                 None if duration is None else round(duration, 3), returncode,
+                 None if log_file is None else str(log_file), error_tail),
+            )
+
+    def job_stats(self, since=None):
+        query = """
+            SELECT job, COUNT(*), SUM(status = 'ok'), AVG(duration_seconds), MAX(duration_seconds),
+                   MAX(started_at)
+            FROM runs WHERE started_at >= ? GROUP BY job ORDER BY job
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(query, (since or "",)).fetchall()
+
+    def pipeline_runs(self, limit=10):
+        query = """
+            SELECT pipeline_run, MIN(started_at), MAX(finished_at), COUNT(*), SUM(status = 'ok'),
+                   GROUP_CONCAT(CASE WHEN status != 'ok' THEN job || ':' || status END, ', ')
+            FROM runs GROUP BY pipeline_run ORDER BY pipeline_run DESC LIMIT ?
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(query, (limit,)).fetchall()
+
+
+def _log_tail(log_file, chars=2000):
+    try:
+        with open(log_file, encoding="utf-8", errors="replace") as f:
+            return f.read()[-chars:]
+    except OSError:
+        return None
+
+
+def _stop_process_group(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=10)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.wait()
+
+
+class JobLocks:
+    """Zbiór blokad zadań zakładanych i zwalnianych w trakcie potoku (zwalniane też przy błędzie)."""
+
+    def __init__(self):
+        self._locks = {}
+
+    def __enter__(self):
+        return self
+
+    def acquire(self, path):
+        lock = file_lock(path)
+        if lock.__enter__():
+            self._locks[path] = lock
+            return True
+        lock.__exit__(None, None, None)
+        return False
+
+    def release(self, path):
+        lock = self._locks.pop(path, None)
+        if lock is not None:
+            lock.__exit__(None, None, None)
+
+    def __exit__(self, *exc):
+        for path in list(self._locks):
+            self.release(path)
+        return False
+
+
+def run_pipeline(jobs, max_workers=DEFAULT_MAX_WORKERS, history=None, lock_dir=DEFAULT_LOCK_DIR,
+                 log_dir=DEFAULT_LOG_DIR):
+    """
+    Uruchamia graf zadań: każde zadanie w osobnym procesie (grupie procesów),
+    najwyżej max_workers naraz, z limitem czasu. Zadania, których zależności
+    się nie powiodły, są pomijane. Cały potok i każde zadanie mają blokadę,
+    więc nakładające się uruchomienia nie wystartują dwa razy tego samego.
+
+    Returns:
+        dict: nazwa zadania -> status (ok, failed, timeout, locked, skipped)
+    """
+    history = history or RunHistory()
+    order = topological_order(jobs)
+    pipeline_run = datetime.now().isoformat(timespec="seconds")
+    log_dir = Path(log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
+    statuses = {}
+
+    with file_lock(Path(lock_dir) / "pipeline.lock") as acquired:
+        if not acquired:
+            print(f"⏭️  Potok już działa - pomijam uruchomienie {pipeline_run}")
+            history.record(pipeline_run, "pipeline", "overlap", started_at=pipeline_run)
+            return {}
+
+        print(f"🚀 Start potoku {pipeline_run}: {len(order)} zadań, do {max_workers} równolegle")
+        running = {}
+        with JobLocks() as locks:
+            while len(statuses) < len(order):
+                # Zadania z nieudanymi zależnościami - pomijamy
+                for name in order:
+                    if name in statuses or name in running:
+                        continue
+                    failed_deps = [dep for dep in jobs[name]["depends_on"]
+                                   if dep in statuses and statuses[dep] != "ok"]
+                    if failed_deps:
+                        statuses[name] = "skipped"
+                        history.record(pipeline_run, name, "skipped", error_tail=f"zależności: {', '.join(failed_deps)}")
+                        print(f"⏭️  {name}: pominięte (nie powiodło się: {', '.join(failed_deps)})")
+
+                # Uruchom gotowe zadania
+                for name in order:
+                    if len(running) >= max_workers:
+                        break
+                    if name in statuses or name in running:
+                        continue
+                    if not all(statuses.get(dep) == "ok" for dep in jobs[name]["depends_on"]):
+                        continue
+                    if not locks.acquire(Path(lock_dir) / f"{name}.lock"):
+                        statuses[name] = "locked"
+                        history.record(pipeline_run, name, "locked", started_at=datetime.now().isoformat(timespec="seconds"))
+                        print(f"🔒 {name}: już uruchomione przez inny proces")
+                        continue
+                    job = jobs[name]
+                    log_file = log_dir / f"{pipeline_run.replace(':', '-')}_{name}.log"
+                    with open(log_file, "w") as log:
+                        process = subprocess.Popen(
+                            job["command"], cwd=job.get("cwd", REPO_ROOT), stdout=log, stderr=subprocess.STDOUT,
+                            start_new_session=True,
+                        )
+                    running[name] = (process, time.perf_counter(), datetime.now().isoformat(timespec="seconds"), log_file)
+                    print(f"▶️  {name} (PID {process.pid})")
+
+                # Sprawdź działające zadania
+                for name, (process, start, started_at, log_file) in list(running.items()):
+                    elapsed = time.perf_counter() - start
+                    returncode = process.poll()
+                    if returncode is None and elapsed <= jobs[name]["timeout"]:
+                        continue
+                    if returncode is None:
+                        _stop_process_group(process)
+                        status = "timeout"
+                    else:
+                        status = "ok" if returncode == 0 else "failed"
+                    statuses[name] = status
+                    del running[name]
+                    locks.release(Path(lock_dir) / f"{name}.lock")
+                    history.record(
+                        pipeline_run, name, status, started_at=started_at,
+                        finished_at=datetime.now().isoformat(timespec="seconds"), duration=elapsed,
+                        returncode=process.returncode, log_file=log_file,
+                        error_tail=None if status == "ok" else _log_tail(log_file),
+                    )
+                    icon = "✅" if status == "ok" else "❌"
+                    print(f"{icon} {name}: {status} ({elapsed:.1f} s)")
+
+                if running:
+                    time.sleep(POLL_SECONDS)
+
+    ok = sum(status == "ok" for status in statuses.values())
+    print(f"🏁 Koniec potoku {pipeline_run}: {ok}/{len(order)} zadań zakończonych poprawnie")
+    return statuses
+
+
+def print_history(history, limit=10):
+    """Ostatnie uruchomienia potoku i statystyki czasów zadań."""
+    print(f"{'uruchomienie':<21}{'czas [s]':>10}{'ok':>8}  problemy")
+    for pipeline_run, started, finished, count, ok, problems in history.pipeline_runs(limit):
+        duration = ""
+        if started and finished:
+            duration = f"{(datetime.fromisoformat(finished) - datetime.fromisoformat(started)).total_seconds():.0f}"
+        print(f"{pipeline_run:<21}{duration:>10}{f'{ok}/{count}':>8}  {problems or ''}")
+
+    print(f"\n{'zadanie':<20}{'uruchomień':>11}{'ok':>6}{'śr. [s]':>10}{'maks. [s]':>11}  ostatnio")
+    for job, count, ok, avg, longest, last in history.job_stats():
+        avg = f"{avg:.1f}" if avg is not None else "-"
+        longest = f"{longest:.1f}" if longest is not None else "-"
+        print(f"{job:<20}{count:>11}{ok:>6}{avg:>10}{longest:>11}  {last or ''}")
+
+
+def start_in_background(jobs, max_workers, history):
+    """Uruchamia potok w osobnym wątku, żeby pętla harmonogramu nie była blokowana."""
+    thread = threading.Thread(target=run_pipeline, args=(jobs, max_workers, history), daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Harmonogram potoku: scraping, czyszczenie, trening modelu i PDFy",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Przykłady użycia:
+  # Codziennie o 6:00 (proces działa w tle)
+  python scheduler.py --at 06:00
+
+  # Jednorazowo cały potok
+  python scheduler.py --run-now
+
+  # Tylko czyszczenie Łodzi (razem z zależnościami: scrape, szczegóły)
+  python scheduler.py --run-now --jobs clean_lodz
+
+  # Historia uruchomień i czasy zadań
+  python scheduler.py --history
+        """
+    )
+    parser.add_argument("--at", default="06:00", help="Godzina codziennego uruchomienia (domyślnie: 06:00)")
+    parser.add_argument("--run-now", action="store_true", help="Uruchom potok raz i zakończ")
+    parser.add_argument("--jobs", nargs="+", default=None, help="Uruchom tylko wybrane zadania (z zależnościami)")
+    parser.add_argument("--cities", nargs="+", default=list(CITIES), choices=list(CITIES),
+                        help="Miasta do przetworzenia (domyślnie: wszystkie)")
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f"Maksymalna liczba równoległych zadań (domyślnie: {DEFAULT_MAX_WORKERS})")
+    parser.add_argument("--db", default=str(DEFAULT_DB_PATH), help="Plik SQLite z historią uruchomień")
+    parser.add_argument("--history", action="store_true", help="Pokaż historię uruchomień i zakończ")
+    args = parser.parse_args()
+
+    history = RunHistory(args.db)
+    if args.history:
+        print_history(history)
+        sys.exit(0)
+
+    jobs = build_pipeline({city: CITIES[city] for city in args.cities})
+    if args.jobs:
+        jobs = select_jobs(jobs, args.jobs)
+    topological_order(jobs)
+
+    if args.run_now:
+        statuses = run_pipeline(jobs, args.max_workers, history)
+        sys.exit(0 if statuses and all(status == "ok" for status in statuses.values()) else 1)
+
+    schedule.every().day.at(args.at).do(start_in_background, jobs, args.max_workers, history)
+    print(f"⏰ Potok zaplanowany codziennie o {args.at} ({len(jobs)} zadań)")
+    while True:
+        schedule.run_pending()
+        time.sleep(30)
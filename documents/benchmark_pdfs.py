@@ -0,0 +1,71 @@
+import pandas as pd
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from generate_pdfs import DATA_DIR, create_property_pdf
+from pdf_template import PropertyPdfTemplate, configure_template
+
+
+def benchmark(csv_path, count=50, repeats=3):
+    """
+    Mikro-benchmark renderowania broszur: PDFy na sekundę ze wspólnym
+    szablonem vs. szablon (czcionki + style) budowany od nowa dla każdego
+    dokumentu, jak przed wprowadzeniem PropertyPdfTemplate.
+
+    Args:
+        csv_path (str): Plik *_detailed.csv z ofertami
+        count (int): Liczba dokumentów w jednym przebiegu
+        repeats (int): Liczba przebiegów (bierzemy najlepszy)
+
+    Returns:
+        dict: Czas przygotowania szablonu i PDF/s dla obu wariantów
+    """
+    df = pd.read_csv(csv_path).head(count)
+    rows = [row for _, row in df.iterrows()]
+
+    # Koszt samego przygotowania szablonu (z ponownym parsowaniem TTF)
+    setup_times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeats):
+            start = time.perf_counter()
+            PropertyPdfTemplate(force_fonts=True, photos=False)
+            setup_times.append(time.perf_counter() - start)
+
+    def run(template_for_row):
+        best = float('inf')
+        with tempfile.TemporaryDirectory() as output_dir:
+            for _ in range(repeats):
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for i, row in enumerate(rows):
+                        create_property_pdf(row, i, output_dir, template=template_for_row())
+                best = min(best, time.perf_counter() - start)
+        return len(rows) / best
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        shared = configure_template(photos=False)
+    results = {
+        'documents': len(rows),
+        'template_setup_ms': round(min(setup_times) * 1000, 2),
+        'per_document_setup_pdf_per_s': round(run(lambda: PropertyPdfTemplate(force_fonts=True, photos=False)), 1),
+        'shared_template_pdf_per_s': round(run(lambda: shared), 1),
+    }
+
+    print(f"Przygotowanie szablonu (czcionki + style): {results['template_setup_ms']:.1f} ms")
+    print(f"Szablon budowany dla każdego dokumentu: {results['per_document_setup_pdf_per_s']:.1f} PDF/s")
+    print(f"Wspólny szablon:                        {results['shared_template_pdf_per_s']:.1f} PDF/s")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Mikro-benchmark generowania PDFów (PDF/s)')
+    parser.add_argument('--city', '-c', type=str, default='lodz', help='Miasto (domyślnie: lodz)')
+    parser.add_argument('--count', '-n', type=int, default=50, help='Liczba dokumentów (domyślnie: 50)')
+    parser.add_argument('--repeats', '-r', type=int, default=3, help='Liczba przebiegów (domyślnie: 3)')
+    args = parser.parse_args()
+
+    benchmark(os.path.join(DATA_DIR, f'ogloszenia_{args.city}_detailed.csv'), args.count, args.repeats)
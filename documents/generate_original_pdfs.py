@@ -1,201 +1,31 @@
 import pandas as pd
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
 from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Table, Paragraph, Spacer
 import os
 import argparse
+from functools import partial
 
-# Globalna zmienna do przechowywania informacji o czcionkach
-FONT_NORMAL = 'Helvetica'
-FONT_BOLD = 'Helvetica-Bold'
+from pdf_batch import (
+    OUTPUT_DIR, PdfManifest, create_catalogue_pdf, iter_catalogue_rows, pdf_filename, render_pdfs,
+    render_property_pdf,
+)
+from pdf_template import configure_template, get_template, init_worker, register_fonts
 
-# Rejestracja czcionek z obsługą polskich znaków
-def register_fonts():
-    """Rejestruje czcionki z pełnym wsparciem dla polskich znaków"""
-    global FONT_NORMAL, FONT_BOLD
-    
-    try:
-        from reportlab.pdfbase.pdfmetrics import registerFont, registerFontFamily
-        from reportlab.pdfbase.ttfonts import TTFont
-        import os
-        
-        # Ścieżka do katalogu ze skryptem
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        
-        # Najpierw spróbuj użyć czcionek Lato z lokalnego katalogu
-        # Sprawdź zarówno bezpośrednio w katalogu, jak i w podfolderze Lato/
-        lato_paths = {
-            'Lato-Regular': [
-                os.path.join(script_dir, 'Lato', 'Lato-Regular.ttf'),
-                os.path.join(script_dir, 'Lato-Regular.ttf'),
-            ],
-            'Lato-Bold': [
-                os.path.join(script_dir, 'Lato', 'Lato-Bold.ttf'),
-                os.path.join(script_dir, 'Lato-Bold.ttf'),
-            ],
-            'Lato-BoldItalic': [
-                os.path.join(script_dir, 'Lato', 'Lato-BoldItalic.ttf'),
-                os.path.join(script_dir, 'Lato-BoldItalic.ttf'),
-            ],
-        }
-        
-        lato_registered = {}
-        for font_name, paths in lato_paths.items():
-            registered = False
-            for path in paths:
-                try:
-                    if os.path.exists(path):
-                        registerFont(TTFont(font_name, path))
-                        lato_registered[font_name] = True
-                        print(f"✓ Zarejestrowano czcionkę: {font_name} ({os.path.basename(path)})")
-                        registered = True
-                        break
-                except Exception as e:
-                    continue
-            
-            if not registered:
-                lato_registered[font_name] = False
-        
-        # Sprawdź czy mamy wystarczające czcionki Lato
-        if lato_registered.get('Lato-Regular') and lato_registered.get('Lato-Bold'):
-            registerFontFamily('Lato', normal='Lato-Regular', bold='Lato-Bold')
-            FONT_NORMAL = 'Lato-Regular'
-            FONT_BOLD = 'Lato-Bold'
-            print("✓ Używam czcionek Lato (pełne wsparcie dla polskich znaków)\n")
-            return True
-        elif lato_registered.get('Lato-Bold'):
-            # Jeśli mamy tylko Lato-Bold, użyj jej dla obu
-            FONT_NORMAL = 'Lato-Bold'
-            FONT_BOLD = 'Lato-Bold'
-            print("✓ Używam czcionki Lato-Bold (tylko pogrubienie dostępne)")
-            print("💡 Wskazówka: Dodaj pliki Lato-Regular.ttf i Lato-Bold.ttf do katalogu documents/\n")
-            return True
-        else:
-            print("⚠ Nie znaleziono kompletnych czcionek Lato")
-            if lato_registered.get('Lato-BoldItalic'):
-                print("   Znaleziono: Lato-BoldItalic.ttf")
-            print("   Brakuje: Lato-Regular.ttf, Lato-Bold.ttf")
-            print("💡 Pobierz czcionki Lato z: https://fonts.google.com/specimen/Lato\n")
-        
-        # Próbuj użyć czcionek systemowych DejaVu jako opcja rezerwowa
-        print("Szukam czcionek systemowych DejaVu...")
-        font_paths = {
-            'DejaVuSans': [
-                '/System/Library/Fonts/Supplemental/DejaVuSans.ttf',
-                '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
-                '/Library/Fonts/DejaVuSans.ttf',
-            ],
-            'DejaVuSans-Bold': [
-                '/System/Library/Fonts/Supplemental/DejaVuSans-Bold.ttf',
-                '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf',
-                '/Library/Fonts/DejaVuSans-Bold.ttf',
-            ]
-        }
-        
-        fonts_registered = True
-        for font_name, paths in font_paths.items():
-            registered = False
-            for path in paths:
-                try:
-                    registerFont(TTFont(font_name, path))
-                    registered = True
-                    print(f"✓ Zarejestrowano czcionkę: {font_name}")
-                    break
-                except Exception as e:
-                    continue
-            
-            if not registered:
-                fonts_registered = False
-                break
-        
-        if fonts_registered:
-            registerFontFamily('DejaVuSans', normal='DejaVuSans', bold='DejaVuSans-Bold')
-            FONT_NORMAL = 'DejaVuSans'
-            FONT_BOLD = 'DejaVuSans-Bold'
-            print("✓ Używam czcionek DejaVu Sans (pełne wsparcie Unicode)\n")
-            return True
-        else:
-            print("⚠ Nie znaleziono czcionek DejaVu")
-            print("✓ Używam wbudowanych czcionek Helvetica (podstawowe wsparcie dla polskich znaków)\n")
-            FONT_NORMAL = 'Helvetica'
-            FONT_BOLD = 'Helvetica-Bold'
-            return False
-        
-    except Exception as e:
-        print(f"⚠ Błąd przy rejestracji czcionek: {e}")
-        print("✓ Używam wbudowanych czcionek Helvetica\n")
-        FONT_NORMAL = 'Helvetica'
-        FONT_BOLD = 'Helvetica-Bold'
-        return False
+# Katalog z danymi ze scrapera (względem repozytorium)
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scraper', 'data')
 
-def create_property_pdf(row, index, output_dir='documents/pdfs'):
-    """Tworzy ładny PDF dla pojedynczej oferty mieszkania"""
-    
-    # Upewnij się, że katalog istnieje
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Nazwa pliku
-    filename = f"{output_dir}/oferta_{index+1:02d}_mieszkanie.pdf"
-    
-    # Tworzenie dokumentu PDF
-    doc = SimpleDocTemplate(filename, pagesize=A4,
-                           rightMargin=2*cm, leftMargin=2*cm,
-                           topMargin=2*cm, bottomMargin=2*cm)
+def build_property_elements(row, index, template=None):
+    """Buduje listę elementów (flowables) broszury dla jednej oferty"""
     
     # Elementy do dodania
     elements = []
     
-    # Style
-    styles = getSampleStyleSheet()
-    
-    # Customowy styl dla tytułu (obsługuje polskie znaki)
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1E40AF'),
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName=FONT_BOLD
-    )
-    
-    # Styl dla nagłówków sekcji
-    section_style = ParagraphStyle(
-        'SectionHeader',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#3B82F6'),
-        spaceAfter=12,
-        spaceBefore=20,
-        fontName=FONT_BOLD
-    )
-    
-    # Styl dla tekstu
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontSize=11,
-        textColor=colors.HexColor('#1F2937'),
-        spaceAfter=6,
-        fontName=FONT_NORMAL
-    )
-    
-    # Styl dla opisu
-    description_style = ParagraphStyle(
-        'Description',
-        parent=styles['Normal'],
-        fontSize=11,
-        textColor=colors.HexColor('#374151'),
-        spaceAfter=6,
-        alignment=TA_JUSTIFY,
-        fontName=FONT_NORMAL,
-        leading=16
-    )
+    # Style z szablonu (czcionki i style budowane raz na proces)
+    template = template or get_template()
+    title_style = template.title_style
+    section_style = template.section_style
+    normal_style = template.normal_style
+    description_style = template.description_style
     
     # Tytuł główny
     title_text = f"Oferta Mieszkania #{index+1}"
@@ -204,8 +34,10 @@ def create_property_pdf(row, index, output_dir='documents/pdfs'):
     
     elements.append(Spacer(1, 0.5*cm))
     
-    # Placeholder dla zdjęcia - możesz później dodać ładowanie obrazów
-    # Na razie skupiamy się na czystym, czytelnym formacie
+    # Zdjęcie oferty - miniatura ze wspólnego cache (bez zdjęcia zostaje sam odstęp)
+    photo = template.photo(row.get('image_url'))
+    if photo is not None:
+        elements.append(photo)
     elements.append(Spacer(1, 0.3*cm))
     
     # Lokalizacja
@@ -274,20 +106,7 @@ def create_property_pdf(row, index, output_dir='documents/pdfs'):
     
     # Tworzenie tabeli
     table = Table(data, colWidths=[4*cm, 4*cm, 4*cm, 4*cm])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#DBEAFE')),
-        ('BACKGROUND', (2, 0), (2, -1), colors.HexColor('#DBEAFE')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#1F2937')),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), FONT_BOLD),
-        ('FONTNAME', (2, 0), (2, -1), FONT_BOLD),
-        ('FONTNAME', (1, 0), (1, -1), FONT_NORMAL),
-        ('FONTNAME', (3, 0), (3, -1), FONT_NORMAL),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('TOPPADDING', (0, 0), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#93C5FD'))
-    ]))
+    table.setStyle(template.details_table_style)
     
     elements.append(table)
     elements.append(Spacer(1, 0.5*cm))
@@ -318,18 +137,7 @@ def create_property_pdf(row, index, output_dir='documents/pdfs'):
         info_data.append(['Forma własności:', str(row['ownership_type'])])
     
     info_table = Table(info_data, colWidths=[6*cm, 10*cm])
-    info_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#FEF3C7')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#1F2937')),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), FONT_BOLD),
-        ('FONTNAME', (1, 0), (1, -1), FONT_NORMAL),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-        ('TOPPADDING', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#FDE68A'))
-    ]))
+    info_table.setStyle(template.table_styles['info'])
     
     elements.append(info_table)
     elements.append(Spacer(1, 0.5*cm))
@@ -349,57 +157,51 @@ def create_property_pdf(row, index, output_dir='documents/pdfs'):
         link_header = Paragraph("🔗 Link do Ogłoszenia", section_style)
         elements.append(link_header)
         
-        url_style = ParagraphStyle(
-            'URLStyle',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor=colors.HexColor('#2563EB'),
-            fontName=FONT_NORMAL
-        )
-        link_para = Paragraph(f'<a href="{row["url"]}">{row["url"]}</a>', url_style)
+        link_para = Paragraph(f'<a href="{row["url"]}">{row["url"]}</a>', template.url_style)
         elements.append(link_para)
     
     # Footer
     elements.append(Spacer(1, 1*cm))
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.HexColor('#6B7280'),
-        alignment=TA_CENTER,
-        fontName=FONT_NORMAL
-    )
     # Stopka - określ miasto na podstawie locality
     city = row['locality'].split()[0] if pd.notna(row.get('locality')) else "Polsce"
-    footer = Paragraph(f"Wygenerowano automatycznie | Oferty mieszkań - {city}", footer_style)
+    footer = Paragraph(f"Wygenerowano automatycznie | Oferty mieszkań - {city}", template.footer_style)
     elements.append(footer)
     
-    # Budowanie PDF
-    doc.build(elements)
-    print(f"✓ Utworzono PDF: {filename}")
-    
-    return filename
+    return elements
+
+# Renderowanie pojedynczej oferty (do render_pdfs i benchmark_pdfs.py)
+create_property_pdf = partial(render_property_pdf, build_property_elements)
 
-def main(city='lodz', count=10):
+def main(city='lodz', count=10, workers=1, catalogue=None, force=False, photos=True):
     """Główna funkcja generująca PDFy
     
     Args:
         city (str): Nazwa miasta (lodz, warszawa, wroclaw)
         count (int): Liczba PDFów do wygenerowania
+        workers (int): Liczba procesów renderujących (1 - szeregowo, 0 - wszystkie rdzenie)
+        catalogue (str): Ścieżka do jednego PDF-katalogu z `count` ofertami (zamiast osobnych plików)
+        force (bool): Generuj wszystkie PDFy od nowa, ignorując manifest
+        photos (bool): Czy osadzać zdjęcia ofert (miniatury z cache)
     """
     
     # Zarejestruj czcionki z obsługą polskich znaków
     print("Rejestrowanie czcionek z obsługą polskich znaków...\n")
     register_fonts()
+    configure_template(photos=photos)
     
     # Wczytaj dane z pliku detailed (zawiera oryginalną treść ogłoszeń)
-    csv_path = f'/Users/mw/r_d_kurs/scraper/data/ogloszenia_{city}_detailed.csv'
+    csv_path = os.path.join(DATA_DIR, f'ogloszenia_{city}_detailed.csv')
     
     if not os.path.exists(csv_path):
         print(f"❌ Błąd: Plik {csv_path} nie istnieje!")
         print(f"Dostępne miasta: lodz, warszawa, wroclaw")
         return
     
+    if catalogue:
+        # Katalog: oferty czytane strumieniowo z CSV prosto do jednego PDF
+        create_catalogue_pdf(build_property_elements, iter_catalogue_rows(csv_path, count), catalogue)
+        return
+    
     df = pd.read_csv(csv_path)
     
     print(f"\nWczytano {len(df)} ofert z CSV (plik detailed z pełnymi opisami)")
@@ -420,20 +222,22 @@ def main(city='lodz', count=10):
             break
     
     # Jeśli nie mamy wystarczająco, dodaj kolejne
-    while len(sample_indices) < count and len(sample_indices) < len(df):
-        idx = len(sample_indices)
-        if idx < len(df) and idx not in sample_indices:
-            sample_indices.append(df.index[idx])
-    
-    # Generuj PDFy
-    generated_files = []
-    for i, idx in enumerate(sample_indices[:count]):
-        row = df.iloc[idx]
-        try:
-            filename = create_property_pdf(row, i)
-            generated_files.append(filename)
-        except Exception as e:
-            print(f"✗ Błąd przy tworzeniu PDF {i+1}: {e}")
+    for idx in df.index:
+        if len(sample_indices) >= count:
+            break
+        if idx not in sample_indices:
+            sample_indices.append(idx)
+    
+    # Generuj PDFy (szeregowo albo w puli procesów)
+    jobs = [(df.iloc[idx], i) for i, idx in enumerate(sample_indices[:count])]
+    # Manifest: pomijamy oferty, których wiersz, szablon i czcionki się nie zmieniły
+    manifest = None if force else PdfManifest(
+        OUTPUT_DIR, {**get_template().fingerprint(), 'generator': 'generate_original_pdfs'}, pdf_filename,
+        photo_for=lambda row: get_template().has_photo(row.get('image_url')),
+    )
+    results = render_pdfs(create_property_pdf, jobs, workers, initializer=init_worker,
+                          manifest=manifest, initargs=(photos,))
+    generated_files = [result['filename'] for result in results if result['error'] is None]
     
     print(f"\n{'='*60}")
     print(f"✓ Wygenerowano {len(generated_files)} PDFów w katalogu documents/pdfs/")
@@ -446,16 +250,22 @@ if __name__ == "__main__":
         epilog='''
 Przykłady użycia:
   # Wygeneruj 10 PDFów z ofertami z Łodzi (domyślnie)
-  python generate_pdfs.py
+  python generate_original_pdfs.py
   
   # Wygeneruj 10 PDFów z ofertami z Warszawy
-  python generate_pdfs.py --city warszawa
+  python generate_original_pdfs.py --city warszawa
   
   # Wygeneruj 20 PDFów z ofertami z Wrocławia
-  python generate_pdfs.py --city wroclaw --count 20
+  python generate_original_pdfs.py --city wroclaw --count 20
   
   # Skrócona forma
-  python generate_pdfs.py -c lodz -n 5
+  python generate_original_pdfs.py -c lodz -n 5
+  
+  # 100 PDFów renderowanych równolegle na wszystkich rdzeniach
+  python generate_original_pdfs.py -c warszawa -n 100 --workers 0
+  
+  # 500 ofert w jednym PDF-katalogu
+  python generate_original_pdfs.py -c warszawa -n 500 --catalogue documents/katalog_warszawa.pdf
         '''
     )
     
@@ -474,7 +284,33 @@ Przykłady użycia:
         help='Liczba PDFów do wygenerowania (domyślnie: 10)'
     )
     
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=1,
+        help='Liczba procesów renderujących PDFy (domyślnie: 1, 0 = wszystkie rdzenie)'
+    )
+    
+    parser.add_argument(
+        '--catalogue',
+        type=str,
+        default=None,
+        help='Zapisz oferty do jednego PDF-katalogu pod podaną ścieżką (zamiast osobnych plików)'
+    )
+    
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Generuj wszystkie PDFy od nowa (domyślnie pomijane są oferty bez zmian od ostatniego przebiegu)'
+    )
+    
+    parser.add_argument(
+        '--no-photos',
+        action='store_true',
+        help='Nie osadzaj zdjęć ofert (domyślnie: miniatury z documents/cache/thumbnails)'
+    )
+    
     args = parser.parse_args()
     
-    main(city=args.city, count=args.count)
+    main(city=args.city, count=args.count, workers=args.workers, catalogue=args.catalogue, force=args.force, photos=not args.no_photos)
 
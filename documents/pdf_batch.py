@@ -0,0 +1,308 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+from reportlab.platypus import PageBreak
+
+from pdf_template import get_template
+
+# Katalog na wygenerowane PDFy (względem bieżącego katalogu)
+OUTPUT_DIR = 'documents/pdfs'
+
+
+def pdf_filename(index, output_dir=OUTPUT_DIR):
+    """Nazwa pliku PDF dla oferty o danym numerze"""
+    return f"{output_dir}/oferta_{index+1:02d}_mieszkanie.pdf"
+
+
+def render_property_pdf(build_elements, row, index, output_dir=OUTPUT_DIR, template=None):
+    """
+    Tworzy PDF pojedynczej oferty z elementów zwróconych przez build_elements.
+
+    Skrypty przekazują do render_pdfs functools.partial(render_property_pdf,
+    build_property_elements) - obie funkcje są na poziomie modułu, więc
+    partial da się przesłać do procesu roboczego.
+
+    Args:
+        build_elements: Funkcja (row, index, template) -> lista elementów reportlab
+        row: Wiersz z danymi oferty
+        index (int): Numer oferty (do nazwy pliku i tytułu)
+        output_dir (str): Katalog wyjściowy
+        template (PropertyPdfTemplate): Szablon ze stylami (domyślnie: współdzielony szablon procesu)
+
+    Returns:
+        str: Ścieżka do pliku PDF
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    filename = pdf_filename(index, output_dir)
+    template = template or get_template()
+    template.document(filename).build(build_elements(row, index, template))
+    return filename
+
+
+def _timed_render(render, row, index):
+    """Renderuje jeden dokument i mierzy czas (wykonywane w procesie roboczym)."""
+    start = time.perf_counter()
+    try:
+        filename = render(row, index)
+        error = None
+    except Exception as e:
+        filename, error = None, str(e)
+    return index, filename, time.perf_counter() - start, error
+
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def row_hash(row):
+    """Stabilny hash zawartości wiersza (NaN traktowane jak brak wartości)."""
+    values = {str(key): (None if pd.isna(value) else value) for key, value in dict(row).items()}
+    payload = json.dumps(values, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PdfManifest:
+    """
+    Manifest wygenerowanych PDFów: dla każdego pliku hash wiersza źródłowego
+    i odcisk szablonu (wersja, czcionki, generator). Dokument jest
+    generowany ponownie tylko, gdy któryś z nich się zmienił albo pliku
+    nie ma na dysku. Opcjonalne photo_for(row) mówi, czy zdjęcie oferty
+    zostało osadzone (None - oferta bez zdjęcia): dokument wygenerowany po
+    nieudanym pobraniu zdjęcia jest przy kolejnym uruchomieniu ponawiany.
+    """
+
+    def __init__(self, output_dir, fingerprint, filename_for, photo_for=None):
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.fingerprint = fingerprint
+        self.filename_for = filename_for
+        self.photo_for = photo_for
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                self.entries = json.load(f).get('documents', {})
+
+    def is_current(self, row, index):
+        filename = self.filename_for(index)
+        entry = self.entries.get(os.path.basename(filename))
+        return (
+            entry is not None
+            and entry['row_hash'] == row_hash(row)
+            and entry['fingerprint'] == self.fingerprint
+            and entry.get('photo_embedded') is not False
+            and os.path.exists(filename)
+        )
+
+    def record(self, row, filename):
+        self.entries[os.path.basename(filename)] = {
+            'row_hash': row_hash(row),
+            'fingerprint': self.fingerprint,
+            'photo_embedded': self.photo_for(row) if self.photo_for else None,
+        }
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'documents': self.entries}, f, indent=2, ensure_ascii=False)
+
+
+def render_pdfs(render, jobs, workers=1, initializer=None, manifest=None, initargs=()):
+    """
+    Generuje PDFy szeregowo albo w puli procesów.
+
+    reportlab układa strony w czystym Pythonie (CPU), więc wątki nie pomagają
+    - każdy dokument trafia do osobnego procesu. Czcionki są rejestrowane raz
+    na proces roboczy przez `initializer`, a nie przy każdym dokumencie.
+
+    Args:
+        render: Funkcja (row, index) -> nazwa pliku, zdefiniowana na poziomie modułu
+        jobs (list): Lista par (row, index)
+        workers (int): Liczba procesów; 1 - szeregowo, 0 - tyle ile rdzeni
+        initializer: Funkcja wywoływana raz w każdym procesie (np. rejestracja czcionek)
+        manifest (PdfManifest): Jeśli podany, pomijane są dokumenty bez zmian od ostatniego przebiegu
+        initargs (tuple): Argumenty dla `initializer`
+
+    Returns:
+        list: Słowniki {index, filename, seconds, error} dla wygenerowanych dokumentów
+    """
+    workers = workers or os.cpu_count() or 1
+    if manifest is not None:
+        all_jobs = jobs
+        jobs = [(row, index) for row, index in all_jobs if not manifest.is_current(row, index)]
+        print(f"♻️  Bez zmian: {len(all_jobs) - len(jobs)} PDFów, do wygenerowania: {len(jobs)}")
+        rows = {index: row for row, index in jobs}
+    start = time.perf_counter()
+    results = []
+
+    if workers == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for row, index in jobs:
+            results.append(_timed_render(render, row, index))
+            _print_result(results[-1])
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+            futures = [executor.submit(_timed_render, render, row, index) for row, index in jobs]
+            for future in as_completed(futures):
+                results.append(future.result())
+                _print_result(results[-1])
+
+    wall = time.perf_counter() - start
+    results = sorted(
+        ({'index': i, 'filename': f, 'seconds': s, 'error': e} for i, f, s, e in results),
+        key=lambda result: result['index'],
+    )
+    print_timing_summary(results, wall, workers)
+
+    if manifest is not None:
+        for result in results:
+            if result['error'] is None:
+                manifest.record(rows[result['index']], result['filename'])
+        manifest.save()
+    return results
+
+
+def _print_result(result):
+    index, filename, seconds, error = result
+    if error is None:
+        print(f"✓ Utworzono PDF: {filename} ({seconds * 1000:.0f} ms)")
+    else:
+        print(f"✗ Błąd przy tworzeniu PDF {index + 1}: {error}")
+
+
+def print_timing_summary(results, wall, workers):
+    """Podsumowanie czasów renderowania: suma, mediana, maksimum i przepustowość."""
+    times = sorted(result['seconds'] for result in results if result['error'] is None)
+    if not times:
+        return
+    print(f"\n⏱️  Renderowanie ({workers} proc.): {len(times)} PDFów w {wall:.2f} s "
+          f"({len(times) / wall:.1f} PDF/s)")
+    print(f"   Czas na dokument: mediana {times[len(times) // 2] * 1000:.0f} ms, "
+          f"maks. {times[-1] * 1000:.0f} ms, suma {sum(times):.2f} s")
+
+
+def iter_csv_rows(csv_path, count=None, chunksize=500):
+    """Kolejne wiersze pliku CSV czytane kawałkami (bez wczytywania całego pliku)."""
+    yielded = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        for _, row in chunk.iterrows():
+            if count is not None and yielded >= count:
+                return
+            yield row
+            yielded += 1
+
+
+CATALOGUE_NUMERIC_COLUMNS = ['price_total_zl', 'price_sqm_zl', 'rooms', 'area', 'photo_count', 'year_built']
+
+
+def iter_catalogue_rows(csv_path, count=None, chunksize=500):
+    """
+    Jak iter_csv_rows, ale tylko oferty nadające się do katalogu: kolumny
+    liczbowe są konwertowane (np. 'zapytaj o cenę' -> NaN), a wiersze bez
+    ceny albo lokalizacji (także całkiem puste) są pomijane. `count` liczy
+    oferty, które trafią do katalogu.
+    """
+    yielded = skipped = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        for column in CATALOGUE_NUMERIC_COLUMNS:
+            if column in chunk.columns:
+                chunk[column] = pd.to_numeric(chunk[column], errors='coerce')
+        valid = (chunk['price_total_zl'].notna() & chunk['locality'].notna()).to_numpy()
+        for is_valid, (_, row) in zip(valid, chunk.iterrows()):
+            if count is not None and yielded >= count:
+                break
+            if not is_valid:
+                skipped += 1
+                continue
+            yield row
+            yielded += 1
+        if count is not None and yielded >= count:
+            break
+    if skipped:
+        print(f"⚠️  Pominięto {skipped} wierszy bez ceny lub lokalizacji")
+
+
+class _StreamingFlowables(list):
+    """
+    Lista flowables dociągana z iteratora grup: reportlab zdejmuje elementy
+    z początku listy, a kolejna oferta jest budowana dopiero, gdy lista się
+    opróżni - w pamięci są elementy jednej oferty naraz.
+    """
+
+    def __init__(self, groups):
+        super().__init__()
+        self._groups = iter(groups)
+
+    def __len__(self):
+        while not list.__len__(self):
+            group = next(self._groups, None)
+            if group is None:
+                break
+            self.extend(group)
+        return list.__len__(self)
+
+
+def build_catalogue(document, element_groups):
+    """
+    Składa wiele ofert w jeden PDF (każda od nowej strony). Czcionki są
+    osadzane raz na cały katalog, a elementy kolejnych ofert są budowane
+    leniwie z iteratora.
+
+    Args:
+        document: Dokument reportlab (np. PropertyPdfTemplate.document(...))
+        element_groups: Iterator list elementów, po jednej liście na ofertę
+
+    Returns:
+        dict: Liczba ofert, stron, czas renderowania i rozmiar pliku
+    """
+    offers = 0
+
+    def with_page_breaks():
+        nonlocal offers
+        for elements in element_groups:
+            if offers:
+                yield [PageBreak()] + list(elements)
+            else:
+                yield elements
+            offers += 1
+
+    start = time.perf_counter()
+    document.build(_StreamingFlowables(with_page_breaks()))
+    seconds = time.perf_counter() - start
+
+    stats = {
+        'offers': offers,
+        'pages': document.page,
+        'seconds': round(seconds, 3),
+        'size_bytes': os.path.getsize(document.filename),
+    }
+    if offers:
+        print(f"📚 Katalog: {offers} ofert, {stats['pages']} stron, {stats['size_bytes'] / 1024:.0f} KB, "
+              f"{seconds:.2f} s ({seconds / offers * 1000:.0f} ms/ofertę, "
+              f"{stats['size_bytes'] / offers / 1024:.1f} KB/ofertę)")
+    return stats
+
+
+def create_catalogue_pdf(build_elements, rows, filename, template=None):
+    """
+    Tworzy jeden PDF-katalog z wieloma ofertami (każda od nowej strony).
+
+    Args:
+        build_elements: Funkcja (row, index, template) -> lista elementów reportlab
+        rows: Iterator wierszy z ofertami (np. iter_catalogue_rows)
+        filename (str): Ścieżka do pliku katalogu
+        template (PropertyPdfTemplate): Szablon ze stylami (domyślnie: współdzielony szablon procesu)
+
+    Returns:
+        dict: Statystyki build_catalogue
+    """
+    template = template or get_template()
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+    stats = build_catalogue(
+        template.document(filename),
+        (build_elements(row, i, template) for i, row in enumerate(rows)),
+    )
+    print(f"✓ Utworzono katalog PDF: {filename}")
+    return stats
@@ -0,0 +1,313 @@
+import contextlib
+import io
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate, TableStyle
+from thumbnails import ThumbnailCache
+
+# Wersja szablonu - zmieniaj przy każdej zmianie wyglądu dokumentów
+TEMPLATE_VERSION = 2
+
+# Globalna zmienna do przechowywania informacji o czcionkach
+FONT_NORMAL = 'Helvetica'
+FONT_BOLD = 'Helvetica-Bold'
+
+# Wynik rejestracji czcionek - pliki TTF parsujemy raz na proces
+_FONTS_REGISTERED = None
+
+# Rejestracja czcionek z obsługą polskich znaków
+def register_fonts(force=False):
+    """Rejestruje czcionki z pełnym wsparciem dla polskich znaków (raz na proces, chyba że force=True)"""
+    global _FONTS_REGISTERED
+    if _FONTS_REGISTERED is None or force:
+        _FONTS_REGISTERED = _probe_and_register_fonts()
+    return _FONTS_REGISTERED
+
+def _probe_and_register_fonts():
+    """Szuka czcionek Lato, potem DejaVu; w ostateczności zostaje Helvetica"""
+    global FONT_NORMAL, FONT_BOLD
+    
+    try:
+        from reportlab.pdfbase.pdfmetrics import registerFont, registerFontFamily
+        from reportlab.pdfbase.ttfonts import TTFont
+        import os
+        
+        # Ścieżka do katalogu ze skryptem
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        
+        # Najpierw spróbuj użyć czcionek Lato z lokalnego katalogu
+        # Sprawdź zarówno bezpośrednio w katalogu, jak i w podfolderze Lato/
+        lato_paths = {
+            'Lato-Regular': [
+                os.path.join(script_dir, 'Lato', 'Lato-Regular.ttf'),
+                os.path.join(script_dir, 'Lato-Regular.ttf'),
+            ],
+            'Lato-Bold': [
+                os.path.join(script_dir, 'Lato', 'Lato-Bold.ttf'),
+                os.path.join(script_dir, 'Lato-Bold.ttf'),
+            ],
+            'Lato-BoldItalic': [
+                os.path.join(script_dir, 'Lato', 'Lato-BoldItalic.ttf'),
+                os.path.join(script_dir, 'Lato-BoldItalic.ttf'),
+            ],
+        }
+        
+        lato_registered = {}
+        for font_name, paths in lato_paths.items():
+            registered = False
+            for path in paths:
+                try:
+                    if os.path.exists(path):
+                        registerFont(TTFont(font_name, path))
+                        lato_registered[font_name] = True
+                        print(f"✓ Zarejestrowano czcionkę: {font_name} ({os.path.basename(path)})")
+                        registered = True
+                        break
+                except Exception as e:
+                    continue
+            
+            if not registered:
+                lato_registered[font_name] = False
+        
+        # Sprawdź czy mamy wystarczające czcionki Lato
+        if lato_registered.get('Lato-Regular') and lato_registered.get('Lato-Bold'):
+            registerFontFamily('Lato', normal='Lato-Regular', bold='Lato-Bold')
+            FONT_NORMAL = 'Lato-Regular'
+            FONT_BOLD = 'Lato-Bold'
+            print("✓ Używam czcionek Lato (pełne wsparcie dla polskich znaków)\n")
+            return True
+        elif lato_registered.get('Lato-Bold'):
+            # Jeśli mamy tylko Lato-Bold, użyj jej dla obu
+            FONT_NORMAL = 'Lato-Bold'
+            FONT_BOLD = 'Lato-Bold'
+            print("✓ Używam czcionki Lato-Bold (tylko pogrubienie dostępne)")
+            print("💡 Wskazówka: Dodaj pliki Lato-Regular.ttf i Lato-Bold.ttf do katalogu documents/\n")
+            return True
+        else:
+            print("⚠ Nie znaleziono kompletnych czcionek Lato")
+            if lato_registered.get('Lato-BoldItalic'):
+                print("   Znaleziono: Lato-BoldItalic.ttf")
+            print("   Brakuje: Lato-Regular.ttf, Lato-Bold.ttf")
+            print("💡 Pobierz czcionki Lato z: https://fonts.google.com/specimen/Lato\n")
+        
+        # Próbuj użyć czcionek systemowych DejaVu jako opcja rezerwowa
+        print("Szukam czcionek systemowych DejaVu...")
+        font_paths = {
+            'DejaVuSans': [
+                '/System/Library/Fonts/Supplemental/DejaVuSans.ttf',
+                '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+                '/Library/Fonts/DejaVuSans.ttf',
+            ],
+            'DejaVuSans-Bold': [
+                '/System/Library/Fonts/Supplemental/DejaVuSans-Bold.ttf',
+                '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf',
+                '/Library/Fonts/DejaVuSans-Bold.ttf',
+            ]
+        }
+        
+        fonts_registered = True
+        for font_name, paths in font_paths.items():
+            registered = False
+            for path in paths:
+                try:
+                    registerFont(TTFont(font_name, path))
+                    registered = True
+                    print(f"✓ Zarejestrowano czcionkę: {font_name}")
+                    break
+                except Exception as e:
+                    continue
+            
+            if not registered:
+                fonts_registered = False
+                break
+        
+        if fonts_registered:
+            registerFontFamily('DejaVuSans', normal='DejaVuSans', bold='DejaVuSans-Bold')
+            FONT_NORMAL = 'DejaVuSans'
+            FONT_BOLD = 'DejaVuSans-Bold'
+            print("✓ Używam czcionek DejaVu Sans (pełne wsparcie Unicode)\n")
+            return True
+        else:
+            print("⚠ Nie znaleziono czcionek DejaVu")
+            print("✓ Używam wbudowanych czcionek Helvetica (podstawowe wsparcie dla polskich znaków)\n")
+            FONT_NORMAL = 'Helvetica'
+            FONT_BOLD = 'Helvetica-Bold'
+            return False
+        
+    except Exception as e:
+        print(f"⚠ Błąd przy rejestracji czcionek: {e}")
+        print("✓ Używam wbudowanych czcionek Helvetica\n")
+        FONT_NORMAL = 'Helvetica'
+        FONT_BOLD = 'Helvetica-Bold'
+        return False
+
+# Kolory tabel dwukolumnowych (etykieta, wartość): tło etykiet i siatka
+TABLE_COLORS = {
+    'building': ('#E0E7FF', '#C7D2FE'),
+    'amenities': ('#D1FAE5', '#A7F3D0'),
+    'info': ('#FEF3C7', '#FDE68A'),
+}
+
+class PropertyPdfTemplate:
+    """
+    Szablon broszury z ofertą: czcionki, style akapitów i style tabel
+    budowane raz i współdzielone przez wszystkie renderowane dokumenty.
+    Zdjęcia ofert pochodzą ze wspólnego cache miniatur (photos=False - bez zdjęć).
+    """
+    
+    def __init__(self, force_fonts=False, photos=True):
+        register_fonts(force=force_fonts)
+        self.thumbnails = ThumbnailCache() if photos else None
+        self.font_normal = FONT_NORMAL
+        self.font_bold = FONT_BOLD
+        self.version = TEMPLATE_VERSION
+        
+        styles = getSampleStyleSheet()
+        
+        # Customowy styl dla tytułu (obsługuje polskie znaki)
+        self.title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor('#1E40AF'),
+            spaceAfter=30,
+            alignment=TA_CENTER,
+            fontName=self.font_bold
+        )
+        
+        # Styl dla nagłówków sekcji
+        self.section_style = ParagraphStyle(
+            'SectionHeader',
+            parent=styles['Heading2'],
+            fontSize=16,
+            textColor=colors.HexColor('#3B82F6'),
+            spaceAfter=12,
+            spaceBefore=20,
+            fontName=self.font_bold
+        )
+        
+        # Styl dla tekstu
+        self.normal_style = ParagraphStyle(
+            'CustomNormal',
+            parent=styles['Normal'],
+            fontSize=11,
+            textColor=colors.HexColor('#1F2937'),
+            spaceAfter=6,
+            fontName=self.font_normal
+        )
+        
+        # Styl dla opisu
+        self.description_style = ParagraphStyle(
+            'Description',
+            parent=styles['Normal'],
+            fontSize=11,
+            textColor=colors.HexColor('#374151'),
+            spaceAfter=6,
+            alignment=TA_JUSTIFY,
+            fontName=self.font_normal,
+            leading=16
+        )
+        
+        self.url_style = ParagraphStyle(
+            'URLStyle',
+            parent=styles['Normal'],
+            fontSize=10,
+            textColor=colors.HexColor('#2563EB'),
+            fontName=self.font_normal
+        )
+        
+        self.footer_style = ParagraphStyle(
+            'Footer',
+            parent=styles['Normal'],
+            fontSize=8,
+            textColor=colors.HexColor('#6B7280'),
+            alignment=TA_CENTER,
+            fontName=self.font_normal
+        )
+        
+        # Tabela szczegółów: cztery kolumny (etykieta, wartość, etykieta, wartość)
+        self.details_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#DBEAFE')),
+            ('BACKGROUND', (2, 0), (2, -1), colors.HexColor('#DBEAFE')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#1F2937')),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), self.font_bold),
+            ('FONTNAME', (2, 0), (2, -1), self.font_bold),
+            ('FONTNAME', (1, 0), (1, -1), self.font_normal),
+            ('FONTNAME', (3, 0), (3, -1), self.font_normal),
+            ('FONTSIZE', (0, 0), (-1, -1), 11),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+            ('TOPPADDING', (0, 0), (-1, -1), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#93C5FD'))
+        ])
+        
+        # Tabele dwukolumnowe różnią się tylko kolorami
+        self.table_styles = {
+            name: self._two_column_style(background, grid)
+            for name, (background, grid) in TABLE_COLORS.items()
+        }
+    
+    def fingerprint(self):
+        """Odcisk szablonu do manifestu: zmiana wersji lub czcionek unieważnia wygenerowane PDFy"""
+        return {
+            'template_version': self.version,
+            'fonts': [self.font_normal, self.font_bold],
+            'photos': self.thumbnails.settings() if self.thumbnails else None,
+        }
+    
+    def photo(self, source):
+        """Zdjęcie oferty jako obrazek reportlab albo None (brak zdjęcia lub zdjęcia wyłączone)"""
+        if self.thumbnails is None:
+            return None
+        return self.thumbnails.flowable(source)
+    
+    def has_photo(self, source):
+        """Czy zdjęcie oferty jest w cache miniatur (None - oferta bez zdjęcia albo zdjęcia wyłączone)"""
+        if self.thumbnails is None or not isinstance(source, str) or not source.strip():
+            return None
+        return self.thumbnails.cached(source) is not None
+    
+    def document(self, filename):
+        """Nowy dokument A4 z marginesami broszury"""
+        return SimpleDocTemplate(filename, pagesize=A4,
+                                 rightMargin=2*cm, leftMargin=2*cm,
+                                 topMargin=2*cm, bottomMargin=2*cm)
+    
+    def _two_column_style(self, background, grid):
+        return TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor(background)),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#1F2937')),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), self.font_bold),
+            ('FONTNAME', (1, 0), (1, -1), self.font_normal),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+            ('TOPPADDING', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor(grid))
+        ])
+
+# Domyślny szablon procesu (tworzony przy pierwszym użyciu)
+_DEFAULT_TEMPLATE = None
+
+def get_template():
+    """Zwraca współdzielony szablon bieżącego procesu"""
+    global _DEFAULT_TEMPLATE
+    if _DEFAULT_TEMPLATE is None:
+        _DEFAULT_TEMPLATE = PropertyPdfTemplate()
+    return _DEFAULT_TEMPLATE
+
+def configure_template(**kwargs):
+    """Ustawia współdzielony szablon procesu (np. configure_template(photos=False))"""
+    global _DEFAULT_TEMPLATE
+    _DEFAULT_TEMPLATE = PropertyPdfTemplate(**kwargs)
+    return _DEFAULT_TEMPLATE
+
+def init_worker(photos=True):
+    """Inicjalizacja procesu roboczego: szablon (czcionki, style) budowany raz na proces, bez komunikatów"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        configure_template(photos=photos)
@@ -0,0 +1,115 @@
+import hashlib
+import io
+import os
+import tempfile
+
+import requests
+from PIL import Image as PILImage
+from reportlab.lib.units import cm
+from reportlab.platypus import Image
+
+# Wspólny cache miniatur - każde zdjęcie skalowane i kompresowane tylko raz
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'thumbnails')
+
+# Pole na zdjęcie w broszurze i rozdzielczość, w jakiej je zapisujemy
+PHOTO_WIDTH = 16 * cm
+PHOTO_HEIGHT = 9 * cm
+PHOTO_DPI = 150
+JPEG_QUALITY = 80
+
+TIMEOUT = 5  # sekundy
+HTTP_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+
+class ThumbnailCache:
+    """
+    Cache miniatur zdjęć ofert: oryginał (URL albo ścieżka lokalna) jest
+    pobierany, zmniejszany do pola zdjęcia w zadanym DPI i zapisywany jako
+    JPEG. Kolejne dokumenty (i kolejne uruchomienia) używają gotowego pliku,
+    a reportlab osadza JPEG bez ponownego kodowania.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, width=PHOTO_WIDTH, height=PHOTO_HEIGHT,
+                 dpi=PHOTO_DPI, quality=JPEG_QUALITY):
+        self.cache_dir = cache_dir
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+        self.quality = quality
+        # Maksymalny rozmiar w pikselach: punkty (1/72 cala) -> piksele przy danym DPI
+        self.max_pixels = (round(width / 72 * dpi), round(height / 72 * dpi))
+        self._failed = set()
+
+    def settings(self):
+        """Ustawienia wpływające na wynik (do manifestu PDFów)"""
+        return {'max_pixels': list(self.max_pixels), 'quality': self.quality}
+
+    def path_for(self, source):
+        key = hashlib.sha1(str(source).encode('utf-8')).hexdigest()[:20]
+        width, height = self.max_pixels
+        return os.path.join(self.cache_dir, f"{key}_{width}x{height}_q{self.quality}.jpg")
+
+    def _read_source(self, source):
+        if os.path.exists(source):
+            with open(source, 'rb') as f:
+                return f.read()
+        response = requests.get(source, headers=HTTP_HEADERS, timeout=TIMEOUT)
+        response.raise_for_status()
+        return response.content
+
+    def _write_thumbnail(self, data, path):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Zapis przez plik tymczasowy - równoległe procesy nie zobaczą połowy pliku
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f, PILImage.open(io.BytesIO(data)) as image:
+                max_width, max_height = self.max_pixels
+                if image.format == 'JPEG' and image.mode == 'RGB' and image.width <= max_width and image.height <= max_height:
+                    # Mały JPEG (np. okładka z serwisu) - ponowna kompresja tylko by go powiększyła
+                    f.write(data)
+                else:
+                    image = image.convert('RGB')
+                    image.thumbnail(self.max_pixels, PILImage.LANCZOS)
+                    image.save(f, 'JPEG', quality=self.quality, optimize=True, progressive=True,
+                               dpi=(self.dpi, self.dpi))
+            os.replace(tmp_path, path)
+        except BaseException:
+            # Uszkodzone zdjęcie albo przerwany zapis - bez osieroconych plików .tmp
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def cached(self, source):
+        """Ścieżka do gotowej miniatury albo None (bez pobierania zdjęcia)"""
+        if not isinstance(source, str) or not source.strip():
+            return None
+        path = self.path_for(source.strip())
+        return path if os.path.exists(path) else None
+
+    def get(self, source):
+        """Ścieżka do miniatury albo None, jeśli zdjęcia nie da się pobrać"""
+        if not isinstance(source, str) or not source.strip() or source in self._failed:
+            return None
+        source = source.strip()
+        path = self.path_for(source)
+        if os.path.exists(path):
+            return path
+        try:
+            self._write_thumbnail(self._read_source(source), path)
+        except Exception as e:
+            print(f"⚠ Nie udało się przygotować zdjęcia {source}: {e}")
+            self._failed.add(source)
+            return None
+        return path
+
+    def flowable(self, source):
+        """Obrazek reportlab dopasowany do pola zdjęcia (z zachowaniem proporcji) albo None"""
+        path = self.get(source)
+        if path is None:
+            return None
+        with PILImage.open(path) as image:
+            pixel_width, pixel_height = image.size
+        scale = min(self.width / pixel_width, self.height / pixel_height)
+        return Image(path, width=pixel_width * scale, height=pixel_height * scale)
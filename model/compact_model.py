@@ -0,0 +1,275 @@
+import io
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.preprocessing import OneHotEncoder
+from sklearn.tree import DecisionTreeRegressor
+from features import parse_listing_age
+
+def _float32_at_most(values):
+    """Rzutuje progi na float32, zaokrąglając w dół, żeby `x <= próg` dawało ten sam wynik."""
+    values = np.asarray(values, dtype=np.float64)
+    values32 = values.astype(np.float32)
+    too_big = values32.astype(np.float64) > values
+    values32[too_big] = np.nextafter(values32[too_big], np.float32(-np.inf))
+    return values32
+
+
+def _tree_arrays(estimator):
+    """
+    Wyciąga z wytrenowanego modelu drzewiastego listę drzew
+    (feature, threshold, left, right, value), skalę, wyraz wolny i typ
+    danych wejściowych, w jakim model porównuje cechy z progami.
+    """
+    if isinstance(estimator, DecisionTreeRegressor):
+        trees, scale, baseline = [estimator.tree_], 1.0, 0.0
+    elif isinstance(estimator, RandomForestRegressor):
+        trees = [tree.tree_ for tree in estimator.estimators_]
+        scale, baseline = 1.0 / len(trees), 0.0
+    elif isinstance(estimator, HistGradientBoostingRegressor):
+        arrays = []
+        for (predictor,) in estimator._predictors:
+            nodes = predictor.nodes
+            is_leaf = nodes["is_leaf"].astype(bool)
+            arrays.append((
+                np.where(is_leaf, -1, nodes["feature_idx"]),
+                nodes["num_threshold"],
+                np.where(is_leaf, -1, nodes["left"].astype(np.int64)),
+                np.where(is_leaf, -1, nodes["right"].astype(np.int64)),
+                nodes["value"],
+            ))
+        # HistGradientBoosting porównuje cechy w float64, drzewa sklearn w float32
+        return arrays, 1.0, float(np.ravel(estimator._baseline_prediction)[0]), np.float64
+    else:
+        raise TypeError(f"Eksport kompaktowy obsługuje tylko modele drzewiaste, nie {type(estimator).__name__}")
+
+    arrays = []
+    for tree in trees:
+        is_leaf = tree.children_left == -1
+        arrays.append((
+            np.where(is_leaf, -1, tree.feature),
+            tree.threshold,
+            tree.children_left,
+            tree.children_right,
+            tree.value[:, 0, 0],
+        ))
+    return arrays, scale, baseline, np.float32
+
+
+class CompactTreeModel:
+    """
+    Odchudzona wersja pipeline'u do serwowania: drzewa jako płaskie tablice
+    float32/int32 (progi HistGradientBoosting zostają w float64) i tylko te
+    cechy, których drzewa faktycznie używają (nieużywane kategorie one-hot
+    są usuwane).
+
+    Bloki kodowania, których nie da się rozłożyć na pojedyncze kolumny
+    (hashed/target/ordinal), zostają jako wytrenowane obiekty sklearn;
+    wybieramy z nich tylko używane kolumny.
+    """
+
+    def __init__(self, features, blocks, feature_index, threshold, left, right, value,
+                 roots, max_depth, scale, baseline, dtype=np.float32):
+        self.features = features
+        self.blocks = blocks
+        self.feature_index = feature_index
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.scale = scale
+        self.baseline = baseline
+        self.dtype = dtype
+
+    def transform(self, X):
+        columns = np.empty((len(X), len(self.features)), dtype=self.dtype)
+        cache = {}
+        for j, spec in enumerate(self.features):
+            kind, column = spec["kind"], spec["column"]
+            if kind == "block":
+                if spec["block"] not in cache:
+                    block = self.blocks[spec["block"]]
+                    out = block["transformer"].transform(X[block["columns"]])
+                    cache[spec["block"]] = out.toarray() if hasattr(out, "toarray") else np.asarray(out)
+                columns[:, j] = cache[spec["block"]][:, spec["index"]]
+                continue
+
+            if kind == "numeric":
+                raw = pd.to_numeric(X[column], errors="coerce").to_numpy(dtype=np.float64)
+            elif kind == "age":
+                raw = parse_listing_age(X[[column]]).ravel()
+            if kind in ("numeric", "age"):
+                raw = np.where(np.isnan(raw), spec["fill"], raw)
+                columns[:, j] = (raw - spec["mean"]) / spec["scale"]
+                continue
+
+            if ("values", column) not in cache:
+                cache[("values", column)] = (
+                    X[column].astype(object).where(X[column].notna(), spec["fill"]).to_numpy()
+                )
+            values = cache[("values", column)]
+            if kind == "onehot":
+                columns[:, j] = values == spec["category"]
+            elif kind == "infrequent":
+                columns[:, j] = ~pd.Series(values).isin(spec["frequent"]).to_numpy()
+        return columns
+
+    def predict(self, X):
+        features = self.transform(X)
+        n_rows = len(features)
+        rows = np.arange(n_rows)[:, None]
+        # Wszystkie drzewa schodzimy równocześnie: wiersz x drzewo, max_depth kroków
+        node = np.broadcast_to(self.roots, (n_rows, len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            left = self.left[node]
+            is_leaf = left == -1
+            if is_leaf.all():
+                break
+            go_left = features[rows, self.feature_index[node]] <= self.threshold[node]
+            node = np.where(is_leaf, node, np.where(go_left, left, self.right[node]))
+        return self.baseline + self.value[node].astype(np.float64).sum(axis=1) * self.scale
+
+
+def _onehot_specs(encoder, imputer, columns):
+    """Jedna specyfikacja na kolumnę wyjściową OneHotEncodera (z kategorią 'infrequent' na końcu)."""
+    specs = []
+    infrequent = getattr(encoder, "infrequent_categories_", [None] * len(columns))
+    for i, column in enumerate(columns):
+        rare = set() if infrequent[i] is None else set(infrequent[i])
+        frequent = [c for c in encoder.categories_[i] if c not in rare]
+        fill = imputer.statistics_[i]
+        specs.extend({"kind": "onehot", "column": column, "fill": fill, "category": c} for c in frequent)
+        if rare:
+            specs.append({"kind": "infrequent", "column": column, "fill": fill, "frequent": frequent})
+    return specs
+
+
+def _feature_specs(preprocessor):
+    """Rozkłada wytrenowany ColumnTransformer na specyfikacje kolejnych kolumn wyjściowych."""
+    specs, blocks = [], []
+    for name, transformer, columns in preprocessor.transformers_:
+        if transformer == "drop" or name not in preprocessor.output_indices_:
+            continue
+        width = preprocessor.output_indices_[name].stop - preprocessor.output_indices_[name].start
+        steps = transformer.named_steps
+        if name in ("num", "age"):
+            imputer, scaler = steps["imputer"], steps["scaler"]
+            kind = "numeric" if name == "num" else "age"
+            specs.extend(
+                {"kind": kind, "column": column, "fill": imputer.statistics_[i],
+                 "mean": scaler.mean_[i], "scale": scaler.scale_[i]}
+                for i, column in enumerate(columns)
+            )
+        elif isinstance(steps.get("encoder"), OneHotEncoder):
+            specs.extend(_onehot_specs(steps["encoder"], steps["imputer"], columns))
+        else:
+            blocks.append({"transformer": transformer, "columns": list(columns)})
+            specs.extend(
+                {"kind": "block", "column": None, "block": len(blocks) - 1, "index": i}
+                for i in range(width)
+            )
+        if len(specs) != preprocessor.output_indices_[name].stop:
+            raise ValueError(f"Nie udało się odtworzyć kolumn transformera '{name}'")
+    return specs, blocks
+
+
+def compact_pipeline(pipeline):
+    """
+    Buduje CompactTreeModel z wytrenowanego pipeline'u (preprocessor + regresor drzewiasty).
+    """
+    specs, blocks = _feature_specs(pipeline.named_steps["preprocessor"])
+    trees, scale, baseline, dtype = _tree_arrays(pipeline.named_steps["regressor"])
+
+    # Tylko cechy, na których którekolwiek drzewo robi podział
+    used = sorted({int(f) for feature, *_ in trees for f in feature[feature >= 0]})
+    remap = np.full(len(specs), -1, dtype=np.int64)
+    remap[used] = np.arange(len(used))
+    used_blocks = sorted({specs[i]["block"] for i in used if specs[i]["kind"] == "block"})
+    block_remap = {old: new for new, old in enumerate(used_blocks)}
+    features = []
+    for i in used:
+        spec = dict(specs[i])
+        if spec["kind"] == "block":
+            spec["block"] = block_remap[spec["block"]]
+        features.append(spec)
+
+    feature_index, threshold, left, right, value, roots = [], [], [], [], [], []
+    offset, max_depth = 0, 0
+    for feature, thr, lft, rgt, val in trees:
+        is_leaf = lft == -1
+        feature_index.append(np.where(is_leaf, 0, remap[np.where(is_leaf, 0, feature)]))
+        threshold.append(thr)
+        left.append(np.where(is_leaf, -1, lft + offset))
+        right.append(np.where(is_leaf, -1, rgt + offset))
+        value.append(val)
+        roots.append(offset)
+        offset += len(feature)
+        max_depth = max(max_depth, _depth(lft, rgt))
+
+    return CompactTreeModel(
+        features=features,
+        blocks=[blocks[i] for i in used_blocks],
+        feature_index=np.concatenate(feature_index).astype(np.int32),
+        # Progi HistGradientBoosting bywają równe wartościom z danych (kwantyle),
+        # więc zostają w float64; progi drzew sklearn są dokładne w float32
+        threshold=_float32_at_most(np.concatenate(threshold)) if dtype == np.float32 else np.concatenate(threshold),
+        left=np.concatenate(left).astype(np.int32),
+        right=np.concatenate(right).astype(np.int32),
+        value=np.concatenate(value).astype(np.float32),
+        roots=np.asarray(roots, dtype=np.int32),
+        max_depth=max_depth,
+        scale=scale,
+        baseline=baseline,
+        dtype=dtype,
+    )
+
+
+def _depth(left, right):
+    depth, frontier = 0, [0]
+    while frontier:
+        frontier = [child for node in frontier for child in (left[node], right[node]) if child != -1]
+        depth += 1
+    return depth
+
+
+def _pickled_size(obj):
+    buffer = io.BytesIO()
+    joblib.dump(obj, buffer)
+    return buffer.getbuffer().nbytes
+
+
+def export_compact(pipeline, X_test, y_test, output_path):
+    """
+    Zapisuje odchudzony model i porównuje go z oryginałem na zbiorze testowym.
+
+    Returns:
+        dict: rozmiary plików, liczba cech przed/po przycięciu, R² i różnice predykcji
+    """
+    from sklearn.metrics import r2_score
+
+    compact = compact_pipeline(pipeline)
+    y_original = pipeline.predict(X_test)
+    y_compact = compact.predict(X_test)
+
+    joblib.dump(compact, output_path)
+    preprocessor_width = pipeline.named_steps["preprocessor"].output_indices_
+    report = {
+        "original_size_bytes": _pickled_size(pipeline),
+        "compact_size_bytes": _pickled_size(compact),
+        "features_before": max(s.stop for s in preprocessor_width.values()),
+        "features_after": len(compact.features),
+        "original_test_r2": round(float(r2_score(y_test, y_original)), 6),
+        "compact_test_r2": round(float(r2_score(y_test, y_compact)), 6),
+        "max_abs_prediction_delta": float(np.max(np.abs(y_original - y_compact))) if len(y_test) else 0.0,
+    }
+    report["r2_delta"] = round(report["compact_test_r2"] - report["original_test_r2"], 6)
+
+    print(f"📦 Model kompaktowy zapisano jako '{output_path}'")
+    print(f"   Rozmiar: {report['original_size_bytes'] / 1024:.1f} KB -> {report['compact_size_bytes'] / 1024:.1f} KB")
+    print(f"   Cechy: {report['features_before']} -> {report['features_after']}")
+    print(f"   R² test: {report['original_test_r2']:.4f} -> {report['compact_test_r2']:.4f} "
+          f"(maks. różnica predykcji {report['max_abs_prediction_delta']:.2f} zł)")
+    return report
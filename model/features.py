@@ -0,0 +1,274 @@
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.compose import ColumnTransformer
+from sklearn.feature_extraction import FeatureHasher
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import (
+    FunctionTransformer,
+    OneHotEncoder,
+    OrdinalEncoder,
+    StandardScaler,
+    TargetEncoder,
+)
+from spatial import at_points, build_tree, fallback_points, valid_coordinates
+
+# Kolumny, których słownik rośnie z każdym nowym scrapingiem
+HIGH_CARDINALITY_FEATURES = ["street", "locality"]
+
+# Kolumny z tekstową datą publikacji ("6 dni temu", "ponad miesiąc temu")
+DATE_FEATURES = ["date_posted"]
+
+# Sposoby kodowania kolumn o dużej liczności:
+#   onehot  - pełny one-hot (szerokość rośnie razem ze słownikiem ulic)
+#   capped  - one-hot tylko dla częstych kategorii, reszta w jednej kolumnie "infrequent"
+#   hashed  - hashing trick do stałej liczby kolumn
+#   target  - target encoding z walidacją krzyżową (jedna kolumna na cechę)
+#   ordinal - kod całkowity kategorii (jedna kolumna na cechę)
+ENCODINGS = ["onehot", "capped", "hashed", "target", "ordinal"]
+
+# Mediana ceny za m² k najbliższych ofert (z drzewa przestrzennego ze spatial.py);
+# dzielnica (jeśli jest) służy tylko do wykrycia zastępczych punktów geokodera
+NEIGHBOUR_FEATURES = ["latitude", "longitude", "area"]
+NEIGHBOUR_LOCALITY = "locality"
+NEIGHBOURS_K = 10
+
+MAX_CATEGORIES = 64
+MIN_FREQUENCY = 5
+HASH_FEATURES = 256
+
+# Jednostki w tekstowej dacie publikacji -> liczba dni.
+# "ponad tydzień/miesiąc" zamieniamy na dolną granicę przedziału.
+# Kolejność ma znaczenie: "wczorajnowe" to ogłoszenie z wczoraj, a "tydzień"
+# i "tygodnie" zawierają w sobie "dzień"/"dni".
+LISTING_AGE_UNITS = [
+    (r"wczoraj", 1),
+    (r"dzisiaj|dziś|nowe|godzin|minut", 0),
+    (r"tydz|tygod", 7),
+    (r"dni|dzień", 1),
+    (r"miesi", 30),
+    (r"rok|lat", 365),
+]
+
+
+def parse_listing_age(values):
+    """
+    Zamienia tekstową datę publikacji na wiek ogłoszenia w dniach.
+
+    Args:
+        values: Kolumna lub tablica 2D z tekstem typu "6 dni temu"
+
+    Returns:
+        np.ndarray: Tablica 2D z liczbą dni; NaN dla nierozpoznanych wartości
+    """
+    values = np.asarray(values, dtype=object)
+    shape = values.shape if values.ndim == 2 else (-1, 1)
+    text = pd.Series(values.ravel()).astype("string").str.lower()
+    count = pd.to_numeric(text.str.extract(r"(\d+)", expand=False), errors="coerce").fillna(1)
+
+    unit = pd.Series(np.nan, index=text.index)
+    for pattern, days in LISTING_AGE_UNITS:
+        mask = unit.isna() & text.str.contains(pattern, na=False)
+        unit[mask] = days
+
+    return (count * unit).to_numpy(dtype=float).reshape(shape)
+
+
+def listing_age_feature_names(transformer, input_features):
+    return np.array([f"{col}_age_days" for col in input_features], dtype=object)
+
+
+class HashingEncoder(BaseEstimator, TransformerMixin):
+    """Kodowanie kategorii hashing trickiem do stałej liczby kolumn."""
+
+    def __init__(self, n_features=HASH_FEATURES, dense=False):
+        self.n_features = n_features
+        self.dense = dense
+
+    def fit(self, X, y=None):
+        self.n_features_in_ = np.asarray(X).shape[1]
+        return self
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=object)
+        # Prefiks z numerem kolumny, żeby ta sama nazwa w różnych kolumnach dawała różne hashe
+        tokens = ([f"{col}={value}" for col, value in enumerate(row)] for row in X)
+        hasher = FeatureHasher(n_features=self.n_features, input_type="string", alternate_sign=False)
+        out = hasher.transform(tokens)
+        return out.toarray() if self.dense else out
+
+    def get_feature_names_out(self, input_features=None):
+        return np.array([f"hash_{i}" for i in range(self.n_features)], dtype=object)
+
+
+class NeighbourPriceEncoder(BaseEstimator, TransformerMixin):
+    """
+    Mediana ceny za m² k najbliższych ofert treningowych (kolumny:
+    latitude, longitude, area i opcjonalnie locality; cena za m² = cel / area).
+
+    Drzewo (BallTree, haversine) budowane raz w fit i zapisywane razem
+    z modelem, więc przy predykcji jedno ogłoszenie to jedno zapytanie
+    O(log n). Jak TargetEncoder: fit_transform na danych treningowych
+    pomija samą ofertę (leave-one-out), żeby cecha nie zawierała jej ceny.
+    Punkt wspólny dla ofert z wielu dzielnic (zastępczy środek miasta
+    z geokodera, spatial.fallback_points) jest traktowany jak brak
+    współrzędnych - cecha to wtedy NaN, uzupełniany przez imputer.
+    """
+
+    def __init__(self, k=NEIGHBOURS_K):
+        self.k = k
+
+    @staticmethod
+    def _split(X):
+        X = np.asarray(X, dtype=object)
+        latitude, longitude, area = (pd.to_numeric(pd.Series(X[:, i]), errors="coerce").to_numpy(dtype=float)
+                                     for i in range(3))
+        locality = X[:, 3] if X.shape[1] > 3 else None
+        return latitude, longitude, area, locality
+
+    def _valid(self, latitude, longitude):
+        # fallback_points_ nie ma w modelach zapisanych przed jego wprowadzeniem
+        fallback = getattr(self, "fallback_points_", set())
+        return valid_coordinates(latitude, longitude) & ~at_points(latitude, longitude, fallback)
+
+    def fit(self, X, y):
+        latitude, longitude, area, locality = self._split(X)
+        self.fallback_points_ = fallback_points(latitude, longitude, locality) if locality is not None else set()
+        price_sqm = np.asarray(y, dtype=float) / np.where(area > 0, area, np.nan)
+        self.train_mask_ = self._valid(latitude, longitude) & np.isfinite(price_sqm)
+        if not self.train_mask_.any():
+            raise ValueError("Brak ofert treningowych z poprawnymi współrzędnymi i ceną za m²")
+        self.tree_ = build_tree(latitude[self.train_mask_], longitude[self.train_mask_])
+        self.price_sqm_ = price_sqm[self.train_mask_]
+        self.n_features_in_ = np.asarray(X).shape[1]
+        return self
+
+    def _neighbour_medians(self, latitude, longitude, exclude_self=False):
+        n_train = len(self.price_sqm_)
+        k = min(self.k + int(exclude_self), n_train)
+        coords = np.radians(np.column_stack([latitude, longitude]))
+        _, neighbours = self.tree_.query(coords, k=k)
+        if exclude_self and k > 1:
+            # Przy wielu ofertach w tym samym punkcie drzewo może nie zwrócić samej
+            # oferty - wtedy odrzucamy najdalszego sąsiada, żeby zawsze zostało k - 1
+            keep = neighbours != np.arange(len(neighbours))[:, None]
+            keep[keep.all(axis=1), -1] = False
+            neighbours = neighbours[keep].reshape(len(neighbours), k - 1)
+        return np.median(self.price_sqm_[neighbours], axis=1)
+
+    def transform(self, X):
+        latitude, longitude, _, _ = self._split(X)
+        valid = self._valid(latitude, longitude)
+        out = np.full((len(latitude), 1), np.nan)
+        if valid.any():
+            out[valid, 0] = self._neighbour_medians(latitude[valid], longitude[valid])
+        return out
+
+    def fit_transform(self, X, y):
+        self.fit(X, y)
+        latitude, longitude, _, _ = self._split(X)
+        valid = self._valid(latitude, longitude)
+        out = np.full((len(latitude), 1), np.nan)
+        # Oferty w drzewie (w tej samej kolejności) - leave-one-out
+        mask = self.train_mask_
+        out[mask, 0] = self._neighbour_medians(latitude[mask], longitude[mask], exclude_self=True)
+        # Oferty bez ceny za m², ale ze współrzędnymi - zwykłe k sąsiadów
+        rest = valid & ~mask
+        if rest.any():
+            out[rest, 0] = self._neighbour_medians(latitude[rest], longitude[rest])
+        return out
+
+    def get_feature_names_out(self, input_features=None):
+        return np.array(["neighbour_price_sqm_median"], dtype=object)
+
+
+def make_high_cardinality_encoder(encoding, dense=False):
+    """Zwraca enkoder dla kolumn o dużej liczności (street, locality)."""
+    if encoding == "onehot":
+        return OneHotEncoder(handle_unknown="ignore", sparse_output=not dense)
+    if encoding == "capped":
+        return OneHotEncoder(
+            handle_unknown="infrequent_if_exist",
+            min_frequency=MIN_FREQUENCY,
+            max_categories=MAX_CATEGORIES,
+            sparse_output=not dense,
+        )
+    if encoding == "hashed":
+        return HashingEncoder(n_features=HASH_FEATURES, dense=dense)
+    if encoding == "target":
+        return TargetEncoder(target_type="continuous")
+    if encoding == "ordinal":
+        return OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=-1)
+    raise ValueError(f"Nieznany sposób kodowania '{encoding}'. Dostępne: {', '.join(ENCODINGS)}")
+
+
+def build_preprocessor(available_numeric, available_categorical, encoding="capped", dense=False,
+                       neighbours_k=NEIGHBOURS_K):
+    """
+    Buduje ColumnTransformer: numeryczne, wiek ogłoszenia, mediana ceny za m²
+    najbliższych ofert, kategorie o małej i dużej liczności.
+
+    Args:
+        available_numeric (list): Kolumny numeryczne
+        available_categorical (list): Kolumny kategoryczne (w tym date_posted)
+        encoding (str): Kodowanie kolumn o dużej liczności (patrz ENCODINGS)
+        dense (bool): Czy wynik ma być macierzą gęstą (np. dla HistGradientBoosting)
+        neighbours_k (int): Liczba sąsiadów cechy NeighbourPriceEncoder (0 - bez tej cechy)
+    """
+    date_columns = [col for col in available_categorical if col in DATE_FEATURES]
+    high_cardinality = [col for col in available_categorical if col in HIGH_CARDINALITY_FEATURES]
+    low_cardinality = [
+        col for col in available_categorical
+        if col not in DATE_FEATURES and col not in HIGH_CARDINALITY_FEATURES
+    ]
+
+    numeric_transformer = Pipeline(
+        steps=[
+            ("imputer", SimpleImputer(strategy="median")),
+            ("scaler", StandardScaler()),
+        ]
+    )
+    transformers = [("num", numeric_transformer, available_numeric)]
+
+    if date_columns:
+        age_transformer = Pipeline(
+            steps=[
+                ("parser", FunctionTransformer(parse_listing_age, feature_names_out=listing_age_feature_names)),
+                ("imputer", SimpleImputer(strategy="median")),
+                ("scaler", StandardScaler()),
+            ]
+        )
+        transformers.append(("age", age_transformer, date_columns))
+
+    if neighbours_k and all(col in available_numeric for col in NEIGHBOUR_FEATURES):
+        locality = [NEIGHBOUR_LOCALITY] if NEIGHBOUR_LOCALITY in available_categorical else []
+        neighbour_columns = NEIGHBOUR_FEATURES + locality
+        neighbour_transformer = Pipeline(
+            steps=[
+                ("encoder", NeighbourPriceEncoder(k=neighbours_k)),
+                ("imputer", SimpleImputer(strategy="median")),
+                ("scaler", StandardScaler()),
+            ]
+        )
+        transformers.append(("neighbours", neighbour_transformer, neighbour_columns))
+
+    if low_cardinality:
+        categorical_transformer = Pipeline(
+            steps=[
+                ("imputer", SimpleImputer(strategy="most_frequent")),
+                ("encoder", OneHotEncoder(handle_unknown="ignore", sparse_output=not dense)),
+            ]
+        )
+        transformers.append(("cat", categorical_transformer, low_cardinality))
+
+    if high_cardinality:
+        high_cardinality_transformer = Pipeline(
+            steps=[
+                ("imputer", SimpleImputer(strategy="most_frequent")),
+                ("encoder", make_high_cardinality_encoder(encoding, dense)),
+            ]
+        )
+        transformers.append(("high_card", high_cardinality_transformer, high_cardinality))
+
+    return ColumnTransformer(transformers=transformers)
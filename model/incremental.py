@@ -0,0 +1,124 @@
+import joblib
+import numpy as np
+from scipy import sparse
+from sklearn.base import BaseEstimator, RegressorMixin, TransformerMixin
+from sklearn.linear_model import SGDRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from features import DATE_FEATURES, HASH_FEATURES, HashingEncoder, parse_listing_age
+from prepare_data import detect_feature_columns, find_detailed_files, iter_split_chunks
+
+DEFAULT_INCREMENTAL_MODEL_PATH = "model_incremental_adresowo.pkl"
+
+
+class StreamingPreprocessor(BaseEstimator, TransformerMixin):
+    """
+    Preprocessing uczony kawałkami: skaler numeryczny z `partial_fit`
+    i bezstanowy hashing kategorii, więc nie potrzebuje całego zbioru naraz.
+    """
+
+    def __init__(self, numeric, categorical, n_hash_features=HASH_FEATURES):
+        self.numeric = numeric
+        self.categorical = categorical
+        self.n_hash_features = n_hash_features
+
+    def _numeric_block(self, X):
+        block = X[self.numeric].to_numpy(dtype=float)
+        date_columns = [col for col in self.categorical if col in DATE_FEATURES]
+        if date_columns:
+            block = np.hstack([block, parse_listing_age(X[date_columns])])
+        return block
+
+    def partial_fit(self, X, y=None):
+        if not hasattr(self, "scaler_"):
+            self.scaler_ = StandardScaler()
+        # StandardScaler pomija NaN przy liczeniu średniej i wariancji
+        self.scaler_.partial_fit(self._numeric_block(X))
+        return self
+
+    def fit(self, X, y=None):
+        if hasattr(self, "scaler_"):
+            del self.scaler_
+        return self.partial_fit(X, y)
+
+    def transform(self, X):
+        # Po standaryzacji brak wartości = średnia, czyli 0
+        numeric = np.nan_to_num(self.scaler_.transform(self._numeric_block(X)), nan=0.0)
+        hashed_columns = [col for col in self.categorical if col not in DATE_FEATURES]
+        categorical = HashingEncoder(n_features=self.n_hash_features).transform(
+            X[hashed_columns].astype(object).where(X[hashed_columns].notna(), "brak")
+        )
+        return sparse.hstack([sparse.csr_matrix(numeric), categorical]).tocsr()
+
+
+class LogPriceSGDRegressor(BaseEstimator, RegressorMixin):
+    """SGDRegressor uczony na log(ceny), z `partial_fit` i predykcją w złotówkach."""
+
+    def __init__(self, alpha=1e-4, eta0=0.01, random_state=42):
+        self.alpha = alpha
+        self.eta0 = eta0
+        self.random_state = random_state
+
+    def partial_fit(self, X, y):
+        log_y = np.log1p(np.asarray(y, dtype=float))
+        if not hasattr(self, "regressor_"):
+            self.regressor_ = SGDRegressor(alpha=self.alpha, eta0=self.eta0, random_state=self.random_state)
+            # Przesunięcie o średnią z pierwszego kawałka - SGD nie musi "dochodzić" do wyrazu wolnego ~13
+            self.offset_ = float(log_y.mean())
+        self.regressor_.partial_fit(X, log_y - self.offset_)
+        return self
+
+    def fit(self, X, y):
+        if hasattr(self, "regressor_"):
+            del self.regressor_
+        return self.partial_fit(X, y)
+
+    def predict(self, X):
+        return np.expm1(self.regressor_.predict(X) + self.offset_)
+
+
+def train_incremental(chunksize=5000, epochs=5, output_path=DEFAULT_INCREMENTAL_MODEL_PATH):
+    """
+    Trenuje model kawałkami z `iter_split_chunks`, bez wczytywania całej
+    historii do pamięci. Ocena R² na zbiorze testowym też jest liczona
+    strumieniowo (sumy zamiast przechowywania predykcji).
+
+    Args:
+        chunksize (int): Liczba wierszy czytanych naraz z pliku
+        epochs (int): Liczba przejść SGD po zbiorze treningowym
+        output_path (str): Ścieżka do pliku modelu
+    """
+    available_numeric, available_categorical = detect_feature_columns(find_detailed_files())
+
+    # === 1. Pierwsze przejście: statystyki do standaryzacji ===
+    preprocessor = StreamingPreprocessor(available_numeric, available_categorical)
+    for X_chunk, _ in iter_split_chunks("train", chunksize):
+        preprocessor.partial_fit(X_chunk)
+
+    # === 2. Kolejne przejścia: partial_fit regresora ===
+    regressor = LogPriceSGDRegressor()
+    for epoch in range(1, epochs + 1):
+        n_rows = 0
+        for X_chunk, y_chunk in iter_split_chunks("train", chunksize):
+            regressor.partial_fit(preprocessor.transform(X_chunk), y_chunk)
+            n_rows += len(y_chunk)
+        print(f"  Epoka {epoch}/{epochs}: {n_rows} wierszy treningowych")
+
+    # === 3. Strumieniowa ocena na zbiorze testowym ===
+    n, sum_y, sum_y2, sse = 0, 0.0, 0.0, 0.0
+    for X_chunk, y_chunk in iter_split_chunks("test", chunksize):
+        y_true = y_chunk.to_numpy(dtype=float)
+        y_pred = regressor.predict(preprocessor.transform(X_chunk))
+        n += len(y_true)
+        sum_y += y_true.sum()
+        sum_y2 += (y_true ** 2).sum()
+        sse += ((y_true - y_pred) ** 2).sum()
+    sst = sum_y2 - sum_y ** 2 / n if n else 0.0
+    r2 = 1 - sse / sst if sst > 0 else float("nan")
+    print(f"🧪 Wynik na zbiorze testowym (R²): {r2:.3f} ({n} wierszy)")
+
+    pipeline = Pipeline(steps=[("preprocessor", preprocessor), ("regressor", regressor)])
+    joblib.dump(pipeline, output_path)
+    print(f"✅ Model zapisano jako '{output_path}'")
+
+    return r2
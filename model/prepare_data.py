@@ -1,78 +1,206 @@
 from pathlib import Path
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
+from profiling import TrainingProfiler
 
-def prepare_data():
-    # === 1. Wczytanie danych ===
-    data_dir = Path(__file__).resolve().parent.parent / "scraper"
-    detailed_files = sorted(data_dir.glob("*_detailed.csv"))
+DATA_DIR = Path(__file__).resolve().parent.parent / "scraper" / "data"
+
+TARGET_COLUMN = "price_total_zl"
+
+NUMERIC_FEATURES = [
+    "area",
+    "rooms",
+    "photo_count",
+    "year_built",
+    "latitude",
+    "longitude",
+]
+
+CATEGORICAL_FEATURES = [
+    "city",
+    "locality",
+    "street",
+    "owner_type",
+    "date_posted",
+    "building_type",
+    "floor",
+    "ownership_type",
+    "has_basement",
+    "has_parking",
+    "kitchen_type",
+    "window_type",
+]
+
+# Podział train/test po hashu URL: to samo ogłoszenie zawsze trafia do tego
+# samego zbioru, niezależnie od snapshotu i kolejności wierszy.
+TEST_SIZE = 0.2
+SPLIT_BUCKETS = 10_000
+
+
+def find_detailed_files(data_dir=DATA_DIR):
+    detailed_files = sorted(Path(data_dir).glob("*_detailed.csv"))
     if not detailed_files:
         raise FileNotFoundError(f"Nie znaleziono plików '*_detailed.csv' w katalogu {data_dir}")
+    return detailed_files
+
+
+def city_from_path(csv_path):
+    parts = csv_path.stem.split("_")
+    return next((part for part in parts if part not in {"ogloszenia", "detailed"}), csv_path.stem)
 
-    frames = []
+
+def detect_feature_columns(detailed_files):
+    """Ustala dostępne kolumny na podstawie samych nagłówków plików CSV."""
+    columns = {"city", "source_file"}
     for csv_path in detailed_files:
-        df_city = pd.read_csv(csv_path)
-        parts = csv_path.stem.split("_")
-        city_name = next((part for part in parts if part not in {"ogloszenia", "detailed"}), csv_path.stem)
-        df_city["city"] = city_name
-        df_city["source_file"] = csv_path.name
-        frames.append(df_city)
-
-    df = pd.concat(frames, ignore_index=True)
-
-    target_column = "price_total_zl"
-    if target_column not in df.columns:
-        raise ValueError(f"Kolumna docelowa '{target_column}' nie została znaleziona w danych.")
-
-    numeric_features = [
-        "area",
-        "rooms",
-        "photo_count",
-        "year_built",
-        "latitude",
-        "longitude",
-    ]
-
-    categorical_features = [
-        "city",
-        "locality",
-        "street",
-        "owner_type",
-        "date_posted",
-        "building_type",
-        "floor",
-        "ownership_type",
-        "has_basement",
-        "has_parking",
-        "kitchen_type",
-        "window_type",
-    ]
-
-    available_numeric = [col for col in numeric_features if col in df.columns]
-    available_categorical = [col for col in categorical_features if col in df.columns]
+        columns.update(pd.read_csv(csv_path, nrows=0).columns)
+
+    if TARGET_COLUMN not in columns:
+        raise ValueError(f"Kolumna docelowa '{TARGET_COLUMN}' nie została znaleziona w danych.")
+
+    available_numeric = [col for col in NUMERIC_FEATURES if col in columns]
+    available_categorical = [col for col in CATEGORICAL_FEATURES if col in columns]
 
     if not available_numeric:
         raise ValueError("Brak dostępnych kolumn numerycznych po filtracji.")
 
-    df[target_column] = pd.to_numeric(df[target_column], errors="coerce")
+    return available_numeric, available_categorical
+
+
+def split_hashes(df, feature_columns):
+    """Stabilny 64-bitowy hash klucza podziału (URL, a bez niego - cech wiersza)."""
+    key = df["url"].fillna("") if "url" in df.columns else df[feature_columns]
+    return pd.util.hash_pandas_object(key, index=False).to_numpy()
+
+
+def is_test_row(hashes, test_size=TEST_SIZE):
+    return (hashes % SPLIT_BUCKETS) < int(test_size * SPLIT_BUCKETS)
+
+
+def coerce_and_filter(df, available_numeric, available_categorical):
+    """Konwersja typów i odrzucenie wierszy bez ceny/powierzchni."""
+    for col in available_numeric + available_categorical:
+        if col not in df.columns:
+            df[col] = pd.NA
+
+    df[TARGET_COLUMN] = pd.to_numeric(df[TARGET_COLUMN], errors="coerce")
     for col in available_numeric:
         df[col] = pd.to_numeric(df[col], errors="coerce")
 
-    df = df.dropna(subset=[target_column])
+    df = df.dropna(subset=[TARGET_COLUMN])
     df = df.dropna(subset=available_numeric, how="all")
     if "area" in df.columns:
         df = df[df["area"] > 0]
-    df = df[df[target_column] > 0]
-    df = df.drop_duplicates(subset=["url"], keep="last") if "url" in df.columns else df
+    df = df[df[TARGET_COLUMN] > 0]
+    return df
+
+
+def prepare_data(test_size=TEST_SIZE, profiler=None):
+    profiler = profiler or TrainingProfiler(enabled=False)
+
+    # === 1. Wczytanie danych ===
+    with profiler.stage("load_csv"):
+        detailed_files = find_detailed_files()
+        available_numeric, available_categorical = detect_feature_columns(detailed_files)
+
+        frames = []
+        for csv_path in detailed_files:
+            df_city = pd.read_csv(csv_path)
+            df_city["city"] = city_from_path(csv_path)
+            df_city["source_file"] = csv_path.name
+            frames.append(df_city)
+
+        df = pd.concat(frames, ignore_index=True)
+
+    with profiler.stage("coerce_filter"):
+        df = coerce_and_filter(df, available_numeric, available_categorical)
+        df = df.drop_duplicates(subset=["url"], keep="last") if "url" in df.columns else df
 
     feature_columns = available_numeric + available_categorical
 
     # === 2. Definicja cech i celu ===
     X = df[feature_columns]
-    y = df[target_column]
+    y = df[TARGET_COLUMN]
 
-    # === 3. Podział na zbiory treningowy/testowy ===
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
-    )
+    # === 3. Podział na zbiory treningowy/testowy (po hashu URL) ===
+    with profiler.stage("split"):
+        test_mask = is_test_row(split_hashes(df, feature_columns), test_size)
+        X_train, X_test = X[~test_mask], X[test_mask]
+        y_train, y_test = y[~test_mask], y[test_mask]
     return X_train, X_test, y_train, y_test, available_numeric, available_categorical
+
+
+def _filtered_chunks(detailed_files, chunksize, available_numeric, available_categorical):
+    """Kawałki po konwersji typów i filtracji razem z hashami klucza podziału."""
+    feature_columns = available_numeric + available_categorical
+    for csv_path in detailed_files:
+        city_name = city_from_path(csv_path)
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            chunk["city"] = city_name
+            chunk["source_file"] = csv_path.name
+            chunk = coerce_and_filter(chunk, available_numeric, available_categorical)
+            if not chunk.empty:
+                yield chunk, split_hashes(chunk, feature_columns)
+
+
+def iter_data_chunks(chunksize=5000, data_dir=DATA_DIR):
+    """
+    Strumieniowo czyta pliki '*_detailed.csv' kawałkami, bez trzymania całej
+    historii w pamięci.
+
+    Duplikaty URL są usuwane tak jak w prepare_data (zostaje ostatnie
+    wystąpienie): pierwsze przejście zapamiętuje dla każdego 64-bitowego
+    hasha pozycję ostatniego wiersza, drugie zwraca tylko te wiersze.
+
+    Args:
+        chunksize (int): Liczba wierszy w jednym kawałku
+        data_dir (Path): Katalog z plikami '*_detailed.csv'
+
+    Yields:
+        tuple: (DataFrame z kawałkiem danych, hashe klucza podziału)
+    """
+    detailed_files = find_detailed_files(data_dir)
+    available_numeric, available_categorical = detect_feature_columns(detailed_files)
+
+    last_position = {}
+    position = 0
+    for chunk, hashes in _filtered_chunks(detailed_files, chunksize, available_numeric, available_categorical):
+        if "url" in chunk.columns:
+            last_position.update(zip(hashes.tolist(), range(position, position + len(hashes))))
+        position += len(hashes)
+
+    position = 0
+    for chunk, hashes in _filtered_chunks(detailed_files, chunksize, available_numeric, available_categorical):
+        positions = range(position, position + len(hashes))
+        position += len(hashes)
+        if "url" in chunk.columns:
+            keep = np.fromiter((last_position[h] == p for h, p in zip(hashes.tolist(), positions)),
+                               dtype=bool, count=len(hashes))
+            chunk, hashes = chunk[keep], hashes[keep]
+
+        if not chunk.empty:
+            yield chunk, hashes
+
+
+def iter_split_chunks(split="train", chunksize=5000, test_size=TEST_SIZE, data_dir=DATA_DIR):
+    """
+    Zwraca kolejne kawałki (X, y) ze zbioru treningowego lub testowego,
+    np. do trenowania estymatorów z `partial_fit`.
+
+    Args:
+        split (str): "train" albo "test"
+        chunksize (int): Liczba wierszy czytanych naraz z pliku
+        test_size (float): Udział zbioru testowego
+        data_dir (Path): Katalog z plikami '*_detailed.csv'
+    """
+    if split not in {"train", "test"}:
+        raise ValueError(f"Nieznany zbiór '{split}'. Dostępne: train, test")
+
+    available_numeric, available_categorical = detect_feature_columns(find_detailed_files(data_dir))
+    feature_columns = available_numeric + available_categorical
+
+    for chunk, hashes in iter_data_chunks(chunksize, data_dir):
+        test_mask = is_test_row(hashes, test_size)
+        selected = chunk[test_mask] if split == "test" else chunk[~test_mask]
+        if not selected.empty:
+            yield selected[feature_columns], selected[TARGET_COLUMN]
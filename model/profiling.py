@@ -0,0 +1,128 @@
+import cProfile
+import json
+import platform
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+
+class TrainingProfiler:
+    """
+    Zbiera czas ściany i czas CPU (opcjonalnie też szczytową pamięć przez
+    tracemalloc) dla kolejnych etapów treningu i zapisuje je do raportu JSON.
+    Czas CPU i pamięć dotyczą bieżącego procesu - praca wykonana w procesach
+    roboczych joblib (n_jobs=-1) widoczna jest tylko w czasie ściany i w
+    czasach kandydatów CV.
+
+    tracemalloc śledzi każdą alokację i wyraźnie spowalnia kod w Pythonie,
+    dlatego pamięć jest mierzona tylko z trace_memory=True, a raport
+    zaznacza, że czasy zebrano przy włączonym śledzeniu.
+
+    Z enabled=False wszystkie metody są pustymi operacjami, więc funkcje
+    mogą przyjmować profiler opcjonalnie.
+    """
+
+    def __init__(self, enabled=True, trace_memory=False):
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.cv_candidates = []
+        self.metadata = {}
+        self._started_tracemalloc = False
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            tracemalloc.reset_peak()
+            start_memory, _ = tracemalloc.get_traced_memory()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            record = {"stage": name, "wall_seconds": round(wall, 4), "cpu_seconds": round(cpu, 4)}
+            if self.trace_memory:
+                _, peak_memory = tracemalloc.get_traced_memory()
+                record["peak_memory_mb"] = round(max(peak_memory - start_memory, 0) / 1024 ** 2, 2)
+            self.stages.append(record)
+
+    def record_cv_results(self, cv_results):
+        """Czasy poszczególnych kandydatów RandomizedSearchCV (z cv_results_)."""
+        if not self.enabled:
+            return
+        for i, params in enumerate(cv_results["params"]):
+            self.cv_candidates.append({
+                "candidate": i,
+                "params": {k: str(v) for k, v in params.items()},
+                "mean_fit_seconds": round(float(cv_results["mean_fit_time"][i]), 4),
+                "std_fit_seconds": round(float(cv_results["std_fit_time"][i]), 4),
+                "mean_score_seconds": round(float(cv_results["mean_score_time"][i]), 4),
+                "mean_test_score": round(float(cv_results["mean_test_score"][i]), 4),
+                "rank": int(cv_results["rank_test_score"][i]),
+            })
+
+    def report(self):
+        return {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            **self.metadata,
+            "memory_traced": self.trace_memory,
+            "total_wall_seconds": round(sum(s["wall_seconds"] for s in self.stages), 4),
+            "total_cpu_seconds": round(sum(s["cpu_seconds"] for s in self.stages), 4),
+            "stages": self.stages,
+            "cv_candidates": self.cv_candidates,
+        }
+
+    def write_json(self, path):
+        if not self.enabled:
+            return
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2, ensure_ascii=False)
+        print(f"⏱️  Raport czasów treningu zapisano do: {path}")
+
+    def print_summary(self):
+        if not self.enabled:
+            return
+        print(f"\n{'etap':<28}{'ściana [s]':>12}{'CPU [s]':>10}{'pamięć [MB]':>13}")
+        for s in self.stages:
+            memory = f"{s['peak_memory_mb']:>13.2f}" if "peak_memory_mb" in s else f"{'-':>13}"
+            print(f"{s['stage']:<28}{s['wall_seconds']:>12.3f}{s['cpu_seconds']:>10.3f}{memory}")
+        if self.trace_memory:
+            print("⚠️  Czasy zmierzone z włączonym tracemalloc - są zawyżone względem zwykłego treningu")
+
+
+def profile_report_path(model_path):
+    """Raport czasów ląduje obok modelu: model.pkl -> model_training_profile.json"""
+    model_path = Path(model_path)
+    return model_path.with_name(f"{model_path.stem}_training_profile.json")
+
+
+@contextmanager
+def cprofile_to(path):
+    """
+    Zapisuje profil cProfile do pliku .prof (pstats; można go otworzyć
+    np. w snakeviz). Dla py-spy wystarczy uruchomić skrypt przez
+    `py-spy record -- python train.py`.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(str(path))
+        print(f"🔬 Profil cProfile zapisano do: {path}")
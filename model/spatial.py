@@ -0,0 +1,241 @@
+import argparse
+import os
+import time
+from pathlib import Path
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "scraper" / "data"
+DEFAULT_SPATIAL_INDEX_PATH = Path(__file__).resolve().parent / "spatial_index.joblib"
+
+EARTH_RADIUS_KM = 6371.0088
+
+OFFER_COLUMNS = [
+    "url", "city", "locality", "street", "rooms", "area", "price_total_zl", "price_sqm_zl",
+    "latitude", "longitude",
+]
+NUMERIC_COLUMNS = ["rooms", "area", "price_total_zl", "price_sqm_zl", "latitude", "longitude"]
+
+# Porównywalne oferty: ta sama liczba pokoi i metraż +-25%
+DEFAULT_RADIUS_KM = 1.0
+AREA_TOLERANCE = 0.25
+
+# Geokoder bez dokładnego adresu zwraca środek miasta: ten sam punkt dostają
+# wtedy oferty z wielu dzielnic. Punkt wspólny dla ofert z co najmniej tylu
+# różnych dzielnic traktujemy jak brak współrzędnych.
+FALLBACK_MIN_LOCALITIES = 3
+
+
+def valid_coordinates(latitude, longitude):
+    latitude = np.asarray(latitude, dtype=float)
+    longitude = np.asarray(longitude, dtype=float)
+    return np.isfinite(latitude) & np.isfinite(longitude) & (np.abs(latitude) <= 90) & (np.abs(longitude) <= 180)
+
+
+def fallback_points(latitude, longitude, locality, min_localities=FALLBACK_MIN_LOCALITIES):
+    """
+    Zastępcze współrzędne geokodera: punkty (lat, lon) wspólne dla ofert
+    z co najmniej min_localities różnych dzielnic.
+
+    Returns:
+        set: Krotki (latitude, longitude)
+    """
+    points = pd.DataFrame({
+        "latitude": np.asarray(latitude, dtype=float),
+        "longitude": np.asarray(longitude, dtype=float),
+        "locality": np.asarray(locality, dtype=object),
+    }).dropna(subset=["latitude", "longitude"])
+    localities = points.groupby(["latitude", "longitude"])["locality"].nunique()
+    return set(localities[localities >= min_localities].index)
+
+
+def at_points(latitude, longitude, points):
+    """Maska ofert leżących dokładnie w którymś z punktów."""
+    latitude = np.asarray(latitude, dtype=float)
+    longitude = np.asarray(longitude, dtype=float)
+    if not points:
+        return np.zeros(len(latitude), dtype=bool)
+    return np.fromiter(((lat, lon) in points for lat, lon in zip(latitude, longitude)), dtype=bool,
+                       count=len(latitude))
+
+
+def build_tree(latitude, longitude):
+    """BallTree z metryką haversine (współrzędne w radianach, odległość na kuli)."""
+    coords = np.radians(np.column_stack([latitude, longitude]).astype(float))
+    return BallTree(coords, metric="haversine")
+
+
+def query_point(latitude, longitude):
+    return np.radians([[float(latitude), float(longitude)]])
+
+
+def city_from_path(csv_path):
+    parts = csv_path.stem.split("_")
+    return next((part for part in parts if part not in {"ogloszenia", "cleaned", "detailed"}), csv_path.stem)
+
+
+def load_cleaned_listings(data_dir=DATA_DIR):
+    """
+    Oczyszczone ogłoszenia ('*_cleaned.csv') z poprawnymi współrzędnymi.
+    Oferty w zastępczych punktach geokodera (fallback_points) są pomijane -
+    inaczej "oferty w promieniu R km" obejmowałyby całe miasto.
+    """
+    files = sorted(Path(data_dir).glob("*_cleaned.csv"))
+    if not files:
+        raise FileNotFoundError(f"Nie znaleziono plików '*_cleaned.csv' w katalogu {data_dir}")
+
+    frames = []
+    for csv_path in files:
+        df_city = pd.read_csv(csv_path)
+        df_city["city"] = city_from_path(csv_path)
+        frames.append(df_city)
+    df = pd.concat(frames, ignore_index=True)
+
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    df = df[valid_coordinates(df["latitude"], df["longitude"])]
+    if "locality" in df.columns:
+        fallback = fallback_points(df["latitude"], df["longitude"], df["locality"])
+        df = df[~at_points(df["latitude"], df["longitude"], fallback)]
+    if "url" in df.columns:
+        df = df.drop_duplicates(subset=["url"], keep="last")
+    return df[[col for col in OFFER_COLUMNS if col in df.columns]].reset_index(drop=True)
+
+
+class SpatialIndex:
+    """
+    Indeks przestrzenny ogłoszeń (BallTree, odległość haversine): k
+    najbliższych ofert i oferty w promieniu R km w czasie ~O(log n),
+    bez przeglądania całego zbioru. Zapisywany razem z polami ofert,
+    więc serwowanie tylko go wczytuje.
+    """
+
+    def __init__(self, listings, tree=None):
+        self.listings = listings.reset_index(drop=True)
+        self.tree = tree if tree is not None else build_tree(self.listings["latitude"], self.listings["longitude"])
+
+    def __len__(self):
+        return len(self.listings)
+
+    @classmethod
+    def build(cls, data_dir=DATA_DIR):
+        return cls(load_cleaned_listings(data_dir))
+
+    def save(self, path=DEFAULT_SPATIAL_INDEX_PATH):
+        # Sam stan (ramka + drzewo), żeby plik dało się wczytać niezależnie od modułu __main__;
+        # zapis przez plik tymczasowy - serwer przeładowujący indeks nie wczyta połowy pliku
+        tmp_path = Path(f"{path}.tmp")
+        joblib.dump({"listings": self.listings, "tree": self.tree}, tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_SPATIAL_INDEX_PATH):
+        state = joblib.load(path)
+        return cls(state["listings"], state["tree"])
+
+    def _offers(self, positions, distances_rad):
+        offers = self.listings.iloc[positions].copy()
+        offers.insert(0, "distance_km", np.round(np.asarray(distances_rad) * EARTH_RADIUS_KM, 3))
+        return offers
+
+    def nearest(self, latitude, longitude, k=10):
+        """
+        Returns:
+            pd.DataFrame: k najbliższych ofert z kolumną distance_km (rosnąco)
+        """
+        k = min(k, len(self))
+        distances, positions = self.tree.query(query_point(latitude, longitude), k=k)
+        return self._offers(positions[0], distances[0])
+
+    def within(self, latitude, longitude, radius_km=DEFAULT_RADIUS_KM):
+        """
+        Returns:
+            pd.DataFrame: Oferty w promieniu radius_km, posortowane wg odległości
+        """
+        positions, distances = self.tree.query_radius(
+            query_point(latitude, longitude), r=radius_km / EARTH_RADIUS_KM, return_distance=True, sort_results=True,
+        )
+        return self._offers(positions[0], distances[0])
+
+    def comparables(self, latitude, longitude, radius_km=DEFAULT_RADIUS_KM, k=10, rooms=None, area=None,
+                    area_tolerance=AREA_TOLERANCE):
+        """
+        Porównywalne oferty w promieniu: opcjonalnie ta sama liczba pokoi i metraż
+        w granicach +-area_tolerance.
+
+        Args:
+            latitude (float): Szerokość geograficzna
+            longitude (float): Długość geograficzna
+            radius_km (float): Promień w km
+            k (int): Maksymalna liczba ofert
+            rooms (int): Liczba pokoi (None - dowolna)
+            area (float): Metraż (None - dowolny)
+            area_tolerance (float): Dopuszczalna względna różnica metrażu
+
+        Returns:
+            pd.DataFrame: Najbliższe pasujące oferty z kolumną distance_km
+        """
+        offers = self.within(latitude, longitude, radius_km)
+        if rooms is not None:
+            offers = offers[offers["rooms"] == rooms]
+        if area is not None:
+            offers = offers[(offers["area"] - area).abs() <= area_tolerance * area]
+        return offers.head(k)
+
+
+def offers_to_records(offers):
+    """Ramka ofert -> lista słowników do JSON (NaN -> None)."""
+    return offers.astype(object).where(offers.notna(), None).to_dict("records")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Indeks przestrzenny ogłoszeń (oferty w pobliżu)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Przykłady użycia:
+  # Budowa indeksu z plików '*_cleaned.csv'
+  python spatial.py build
+
+  # 5 najbliższych ofert i porównywalne 3-pokojowe ~60 m² w promieniu 1.5 km
+  python spatial.py query --lat 51.7592 --lon 19.4560 -k 5 --radius 1.5 --rooms 3 --area 60
+        """
+    )
+    parser.add_argument("--index", default=str(DEFAULT_SPATIAL_INDEX_PATH), help="Plik indeksu")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Zbuduj indeks")
+    build_parser.add_argument("--data-dir", default=str(DATA_DIR), help="Katalog z danymi")
+
+    query_parser = subparsers.add_parser("query", help="Oferty w pobliżu punktu")
+    query_parser.add_argument("--lat", type=float, required=True, help="Szerokość geograficzna")
+    query_parser.add_argument("--lon", type=float, required=True, help="Długość geograficzna")
+    query_parser.add_argument("-k", type=int, default=10, help="Liczba ofert (domyślnie: 10)")
+    query_parser.add_argument("--radius", type=float, default=DEFAULT_RADIUS_KM, help="Promień w km (domyślnie: 1)")
+    query_parser.add_argument("--rooms", type=int, default=None, help="Liczba pokoi porównywalnych ofert")
+    query_parser.add_argument("--area", type=float, default=None, help="Metraż porównywalnych ofert")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        index = SpatialIndex.build(args.data_dir)
+        index.save(args.index)
+        print(f"✅ Indeks przestrzenny: {len(index)} ofert w {time.perf_counter() - start:.2f} s -> {args.index}")
+    else:
+        start = time.perf_counter()
+        index = SpatialIndex.load(args.index)
+        print(f"⏱️  Wczytanie indeksu: {(time.perf_counter() - start) * 1000:.1f} ms ({len(index)} ofert)")
+        columns = ["distance_km", "locality", "street", "rooms", "area", "price_total_zl", "price_sqm_zl"]
+
+        start = time.perf_counter()
+        nearest = index.nearest(args.lat, args.lon, args.k)
+        print(f"\n📍 {args.k} najbliższych ofert ({(time.perf_counter() - start) * 1000:.2f} ms):")
+        print(nearest[columns].to_string(index=False))
+
+        start = time.perf_counter()
+        comparables = index.comparables(args.lat, args.lon, args.radius, args.k, args.rooms, args.area)
+        print(f"\n🏘️  Porównywalne oferty w promieniu {args.radius} km ({(time.perf_counter() - start) * 1000:.2f} ms):")
+        print(comparables[columns].to_string(index=False) if len(comparables) else "brak")
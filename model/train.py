@@ -1,86 +1,389 @@
+import argparse
+import io
+import json
+import time
 import joblib
 from pathlib import Path
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.impute import SimpleImputer
-from sklearn.compose import ColumnTransformer
+from sklearn.base import clone
 from sklearn.tree import DecisionTreeRegressor
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
 from sklearn.pipeline import Pipeline
 from prepare_data import prepare_data
+from features import ENCODINGS, build_preprocessor
+from incremental import DEFAULT_INCREMENTAL_MODEL_PATH, train_incremental
+from profiling import TrainingProfiler, cprofile_to, profile_report_path
+from compact_model import export_compact
 
-def train_model():
-    import pandas as pd
-    from sklearn.model_selection import train_test_split, RandomizedSearchCV
-    from sklearn.metrics import r2_score
+DEFAULT_MODEL_PATH = "model_random_forest_adresowo.pkl"
+DEFAULT_ENCODING = "capped"
 
-    X_train, X_test, y_train, y_test, available_numeric, available_categorical = prepare_data()
-    
-    # === 5. Definicja kolumn numerycznych i kategorycznych ===
-    numeric_transformer = Pipeline(
-        steps=[
-            ("imputer", SimpleImputer(strategy="median")),
-            ("scaler", StandardScaler()),
-        ]
-    )
-    transformers = [("num", numeric_transformer, available_numeric)]
-    if available_categorical:
-        categorical_transformer = Pipeline(
-            steps=[
-                ("imputer", SimpleImputer(strategy="most_frequent")),
-                ("encoder", OneHotEncoder(handle_unknown="ignore")),
-            ]
-        )
-        transformers.append(("cat", categorical_transformer, available_categorical))
+# === Dostępne silniki modelu ===
+# search_n_jobs: równoległość RandomizedSearchCV. Las losowy sam trenuje drzewa
+# na wszystkich rdzeniach, więc przeszukiwanie dla niego działa sekwencyjnie,
+# żeby nie przeciążać procesora.
+# dense: HistGradientBoostingRegressor nie przyjmuje macierzy rzadkich.
+ENGINES = {
+    "tree": {
+        "estimator": DecisionTreeRegressor(max_depth=6, random_state=42),
+        "param_distributions": {
+            "regressor__max_depth": [None, 4, 6, 8, 10, 15],
+            "regressor__min_samples_split": [2, 5, 10, 20, 50],
+            "regressor__min_samples_leaf": [1, 2, 4, 8, 12],
+            "regressor__max_features": [None, "sqrt", "log2"],
+        },
+        "search_n_jobs": -1,
+        "dense": False,
+    },
+    "hgb": {
+        "estimator": HistGradientBoostingRegressor(random_state=42),
+        "param_distributions": {
+            "regressor__learning_rate": [0.03, 0.05, 0.1, 0.2],
+            "regressor__max_iter": [100, 200, 400],
+            "regressor__max_leaf_nodes": [15, 31, 63],
+            "regressor__min_samples_leaf": [5, 10, 20, 40],
+            "regressor__l2_regularization": [0.0, 0.1, 1.0],
+        },
+        "search_n_jobs": -1,
+        "dense": True,
+    },
+    "random_forest": {
+        "estimator": RandomForestRegressor(n_estimators=200, n_jobs=-1, random_state=42),
+        "param_distributions": {
+            "regressor__n_estimators": [100, 200, 400],
+            "regressor__max_depth": [None, 8, 12, 20],
+            "regressor__min_samples_leaf": [1, 2, 4, 8],
+            "regressor__max_features": [1.0, "sqrt", 0.5],
+        },
+        "search_n_jobs": 1,
+        "dense": False,
+    },
+}
 
-    # === 6. ColumnTransformer: preprocessing ===
-    preprocessor = ColumnTransformer(transformers=transformers)
+
+def build_pipeline(engine, available_numeric, available_categorical, encoding=DEFAULT_ENCODING):
+    """
+    Buduje pipeline (preprocessing + regresor) dla wybranego silnika.
+
+    Args:
+        engine (str): Nazwa silnika z ENGINES
+        available_numeric (list): Kolumny numeryczne
+        available_categorical (list): Kolumny kategoryczne
+        encoding (str): Kodowanie kolumn o dużej liczności (features.ENCODINGS)
+    """
+    spec = ENGINES[engine]
+
+    # === 5-6. Preprocessing: numeryczne, wiek ogłoszenia, kategorie ===
+    preprocessor = build_preprocessor(
+        available_numeric, available_categorical, encoding=encoding, dense=spec["dense"]
+    )
 
     # === 7. Pipeline z modelem ===
-    pipeline = Pipeline(
+    return Pipeline(
         steps=[
             ("preprocessor", preprocessor),
-            (
-                "regressor",
-                DecisionTreeRegressor(
-                    max_depth=6,
-                    random_state=42,
-                ),
-            ),
+            ("regressor", clone(spec["estimator"])),
         ]
     )
 
+
+def fit_engine(engine, X_train, y_train, available_numeric, available_categorical, n_iter=20,
+               encoding=DEFAULT_ENCODING, refit=True):
+    """
+    Hiperoptymalizacja i trening pipeline'u dla jednego silnika
+    (refit=False - tylko wybór parametrów, bez dopasowania najlepszego pipeline'u).
+    """
+    from sklearn.model_selection import RandomizedSearchCV
+
+    spec = ENGINES[engine]
+    pipeline = build_pipeline(engine, available_numeric, available_categorical, encoding)
+
     # === 8. Hiperoptymalizacja ===
-    param_distributions = {
-        "regressor__max_depth": [None, 4, 6, 8, 10, 15],
-        "regressor__min_samples_split": [2, 5, 10, 20, 50],
-        "regressor__min_samples_leaf": [1, 2, 4, 8, 12],
-        "regressor__max_features": [None, "sqrt", "log2"],
-    }
     search = RandomizedSearchCV(
         pipeline,
-        param_distributions=param_distributions,
-        n_iter=20,
+        param_distributions=spec["param_distributions"],
+        n_iter=n_iter,
         cv=5,
         scoring="r2",
         random_state=42,
-        n_jobs=-1,
-        refit=True,
+        n_jobs=spec["search_n_jobs"],
+        refit=refit,
     )
     search.fit(X_train, y_train)
+    return search
+
+
+def measure_engine(engine, data, n_iter=20, single_row_repeats=50, encoding=DEFAULT_ENCODING):
+    """
+    Trenuje silnik i mierzy koszty, które interesują nas przy serwowaniu.
+
+    Returns:
+        tuple: (najlepszy pipeline, słownik z metrykami)
+    """
+    from sklearn.metrics import r2_score
+
+    X_train, X_test, y_train, y_test, available_numeric, available_categorical = data
 
+    start = time.perf_counter()
+    search = fit_engine(
+        engine, X_train, y_train, available_numeric, available_categorical, n_iter, encoding
+    )
+    search_seconds = time.perf_counter() - start
     best_pipeline = search.best_estimator_
+
+    # Czas samego dopasowania najlepszej konfiguracji (bez walidacji krzyżowej)
+    refit_pipeline = clone(best_pipeline)
+    start = time.perf_counter()
+    refit_pipeline.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+
+    # Predykcja wsadowa na całym zbiorze testowym
+    start = time.perf_counter()
+    y_pred = best_pipeline.predict(X_test)
+    batch_seconds = time.perf_counter() - start
+
+    # Predykcja pojedynczego wiersza - tak jak w endpoincie /predict_price/
+    single_row = X_test.iloc[[0]]
+    start = time.perf_counter()
+    for _ in range(single_row_repeats):
+        best_pipeline.predict(single_row)
+    single_seconds = (time.perf_counter() - start) / single_row_repeats
+
+    buffer = io.BytesIO()
+    joblib.dump(best_pipeline, buffer)
+
+    metrics = {
+        "engine": engine,
+        "encoding": encoding,
+        "n_features": best_pipeline.named_steps["preprocessor"].transform(single_row).shape[1],
+        "best_params": dict(search.best_params_),
+        "cv_r2": round(float(search.best_score_), 4),
+        "test_r2": round(float(r2_score(y_test, y_pred)), 4),
+        "search_seconds": round(search_seconds, 3),
+        "fit_seconds": round(fit_seconds, 3),
+        "predict_ms_per_row_batch": round(batch_seconds / len(X_test) * 1000, 4),
+        "predict_ms_single_row": round(single_seconds * 1000, 3),
+        "model_size_bytes": buffer.getbuffer().nbytes,
+    }
+    return best_pipeline, metrics
+
+
+def compare_engines(engines=None, n_iter=20, report_path="model_comparison.json",
+                    encoding=DEFAULT_ENCODING):
+    """
+    Trenuje kilka silników na tych samych danych z prepare_data i zapisuje
+    raport porównawczy (czas treningu, opóźnienie predykcji, rozmiar, R²).
+
+    Args:
+        engines (list): Nazwy silników (domyślnie: wszystkie z ENGINES)
+        n_iter (int): Liczba kandydatów RandomizedSearchCV na silnik
+        report_path (str): Ścieżka do raportu JSON
+        encoding (str): Kodowanie kolumn o dużej liczności (features.ENCODINGS)
+    """
+    engines = engines or list(ENGINES)
+    data = prepare_data()
+
+    results = []
+    for engine in engines:
+        print(f"⏱️  Trenuję silnik: {engine}")
+        _, metrics = measure_engine(engine, data, n_iter=n_iter, encoding=encoding)
+        results.append(metrics)
+
+    header = f"{'silnik':<15}{'fit [s]':>10}{'ms/wiersz':>12}{'ms/1 wiersz':>13}{'rozmiar [KB]':>14}{'R² test':>10}"
+    print("\n" + header)
+    print("-" * len(header))
+    for m in results:
+        print(
+            f"{m['engine']:<15}{m['fit_seconds']:>10.3f}{m['predict_ms_per_row_batch']:>12.4f}"
+            f"{m['predict_ms_single_row']:>13.3f}{m['model_size_bytes'] / 1024:>14.1f}{m['test_r2']:>10.3f}"
+        )
+
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False, default=str)
+    print(f"\n📄 Raport porównawczy zapisano do: {report_path}")
+
+    return results
+
+
+def train_model(engine="tree", output_path=DEFAULT_MODEL_PATH, n_iter=20, encoding=DEFAULT_ENCODING,
+                cprofile=False, export_compact_model=False, trace_memory=False):
+    """
+    Trenuje model, zapisuje go do output_path, a obok raport czasów
+    poszczególnych etapów (*_training_profile.json).
+
+    Args:
+        engine (str): Nazwa silnika z ENGINES
+        output_path (str): Ścieżka do pliku modelu
+        n_iter (int): Liczba kandydatów RandomizedSearchCV
+        encoding (str): Kodowanie kolumn o dużej liczności (features.ENCODINGS)
+        cprofile (bool): Czy dodatkowo zapisać profil cProfile (*.prof)
+        export_compact_model (bool): Czy zapisać też odchudzony model do serwowania (*_compact.pkl)
+        trace_memory (bool): Czy mierzyć szczytową pamięć etapów (tracemalloc, spowalnia trening)
+    """
+    if cprofile:
+        with cprofile_to(Path(output_path).with_suffix(".prof")):
+            return train_model(engine, output_path, n_iter, encoding, cprofile=False,
+                               export_compact_model=export_compact_model, trace_memory=trace_memory)
+
+    from sklearn.metrics import r2_score
+
+    profiler = TrainingProfiler(trace_memory=trace_memory)
+    profiler.metadata.update({"engine": engine, "encoding": encoding, "n_iter": n_iter})
+
+    X_train, X_test, y_train, y_test, available_numeric, available_categorical = prepare_data(
+        profiler=profiler
+    )
+    profiler.metadata.update({"n_train": len(X_train), "n_test": len(X_test)})
+
+    with profiler.stage("search_cv"):
+        search = fit_engine(
+            engine, X_train, y_train, available_numeric, available_categorical, n_iter, encoding, refit=False
+        )
+    profiler.record_cv_results(search.cv_results_)
+
+    # Dopasowanie najlepszej konfiguracji krok po kroku (tak jak Pipeline.fit): czas
+    # preprocessingu pochodzi z prawdziwego treningu, bez osobnego, wyrzucanego dopasowania
+    best_pipeline = clone(search.estimator).set_params(**search.best_params_)
+    with profiler.stage("preprocessor_fit_transform"):
+        X_train_transformed = best_pipeline.named_steps["preprocessor"].fit_transform(X_train, y_train)
+    with profiler.stage("regressor_fit"):
+        best_pipeline.named_steps["regressor"].fit(X_train_transformed, y_train)
+    print(f"⚙️  Silnik: {engine}, kodowanie ulic/dzielnic: {encoding}")
     print("🔍 Najlepsze znalezione parametry:", search.best_params_)
     print(f"📊 Najlepszy wynik walidacji krzyżowej (R²): {search.best_score_:.3f}")
 
     # === 9. Predykcja i ocena na zbiorze testowym ===
-    y_pred = best_pipeline.predict(X_test)
-    r2 = r2_score(y_test, y_pred)
+    with profiler.stage("evaluate"):
+        y_pred = best_pipeline.predict(X_test)
+        r2 = r2_score(y_test, y_pred)
     print(f"🧪 Wynik na zbiorze testowym (R²): {r2:.3f}")
 
     # === 12. Zapis modelu ===
-    joblib.dump(best_pipeline, "model_random_forest_adresowo.pkl")
-    print("✅ Model zapisano jako 'model_random_forest_adresowo.pkl'")
+    with profiler.stage("joblib_dump"):
+        joblib.dump(best_pipeline, output_path)
+    print(f"✅ Model zapisano jako '{output_path}'")
+
+    # === 13. Eksport odchudzonego modelu (float32, bez nieużywanych kategorii) ===
+    if export_compact_model:
+        compact_path = Path(output_path).with_name(f"{Path(output_path).stem}_compact.pkl")
+        with profiler.stage("compact_export"):
+            profiler.metadata["compact_export"] = export_compact(best_pipeline, X_test, y_test, compact_path)
+
+    profiler.metadata["test_r2"] = round(float(r2), 4)
+    profiler.print_summary()
+    profiler.write_json(profile_report_path(output_path))
 
     return r2
 
 if __name__ == "__main__":
-    train_model()
\ No newline at end of file
+    parser = argparse.ArgumentParser(
+        description="Trening modelu predykcji cen mieszkań",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+Przykłady użycia:
+  # Trening drzewa decyzyjnego (domyślnie)
+  python train.py
+
+  # Trening lasu losowego na wszystkich rdzeniach
+  python train.py --engine random_forest
+
+  # Porównanie wszystkich silników (czas, opóźnienie, rozmiar, R²)
+  python train.py --compare
+
+  # Las losowy + odchudzony model do serwowania (float32, przycięte kategorie)
+  python train.py --engine random_forest --export-compact
+
+  # Trening z profilem cProfile (raport czasów etapów powstaje zawsze)
+  python train.py --cprofile
+
+  # Raport etapów z szczytową pamięcią (tracemalloc - czasy będą zawyżone)
+  python train.py --trace-memory
+
+  # Trening strumieniowy (partial_fit) bez wczytywania całej historii
+  python train.py --incremental --chunksize 2000 --epochs 5
+        '''
+    )
+    parser.add_argument(
+        "--engine",
+        type=str,
+        default="tree",
+        choices=list(ENGINES),
+        help="Silnik modelu. Domyślnie: tree"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help=f"Ścieżka do pliku modelu. Domyślnie: {DEFAULT_MODEL_PATH} "
+             f"(lub {DEFAULT_INCREMENTAL_MODEL_PATH} dla --incremental)"
+    )
+    parser.add_argument(
+        "--n-iter",
+        type=int,
+        default=20,
+        help="Liczba kandydatów w RandomizedSearchCV. Domyślnie: 20"
+    )
+    parser.add_argument(
+        "--encoding",
+        type=str,
+        default=DEFAULT_ENCODING,
+        choices=ENCODINGS,
+        help=f"Kodowanie kolumn street/locality. Domyślnie: {DEFAULT_ENCODING}"
+    )
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Wytrenuj wszystkie silniki i zapisz raport porównawczy model_comparison.json"
+    )
+    parser.add_argument(
+        "--export-compact",
+        action="store_true",
+        help="Zapisz też odchudzony model do serwowania (*_compact.pkl) i sprawdź różnicę R²"
+    )
+    parser.add_argument(
+        "--cprofile",
+        action="store_true",
+        help="Zapisz dodatkowo profil cProfile obok modelu (*.prof)"
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Mierz szczytową pamięć etapów przez tracemalloc (spowalnia trening)"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Trenuj strumieniowo (SGD + partial_fit) na kawałkach danych"
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=5000,
+        help="Liczba wierszy w kawałku dla --incremental. Domyślnie: 5000"
+    )
+    parser.add_argument(
+        "--epochs",
+        type=int,
+        default=5,
+        help="Liczba przejść po danych dla --incremental. Domyślnie: 5"
+    )
+    args = parser.parse_args()
+
+    if args.incremental:
+        train_incremental(
+            chunksize=args.chunksize,
+            epochs=args.epochs,
+            output_path=args.output or DEFAULT_INCREMENTAL_MODEL_PATH,
+        )
+    elif args.compare:
+        report_path = Path(args.output or DEFAULT_MODEL_PATH).resolve().parent / "model_comparison.json"
+        compare_engines(n_iter=args.n_iter, report_path=report_path, encoding=args.encoding)
+    else:
+        train_model(
+            engine=args.engine,
+            output_path=args.output or DEFAULT_MODEL_PATH,
+            n_iter=args.n_iter,
+            encoding=args.encoding,
+            cprofile=args.cprofile,
+            export_compact_model=args.export_compact,
+            trace_memory=args.trace_memory,
+        )
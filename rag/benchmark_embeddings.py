@@ -0,0 +1,101 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from corpus import TEXT_COLUMN, load_listings, split_descriptions
+from embeddings import DEFAULT_MODEL, DEFAULT_ONNX_DIR, Embedder, MicroBatcher, OnnxEmbedder
+
+
+def sample_texts(n_texts, n_queries, seed=42):
+    """Fragmenty opisów (indeksowanie) i krótkie zapytania (pierwsze słowa fragmentów)."""
+    listings = load_listings()
+    texts, _, _ = split_descriptions(listings[TEXT_COLUMN])
+    rng = np.random.default_rng(seed)
+    chunks = [texts[i] for i in rng.choice(len(texts), size=min(n_texts, len(texts)), replace=False)]
+    queries = [" ".join(texts[i].split()[:6]) for i in rng.choice(len(texts), size=n_queries, replace=False)]
+    return chunks, queries
+
+
+def throughput(embedder, texts):
+    """Zdania na sekundę przy kodowaniu dużymi partiami (indeksowanie)."""
+    embedder.encode(texts[:8])  # rozgrzewka
+    start = time.perf_counter()
+    embedder.encode(texts)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def query_latencies(encode, queries, clients):
+    """Czasy pojedynczych zapytań przy `clients` równoległych klientach."""
+    encode(queries[:2])  # rozgrzewka
+
+    def timed(query):
+        start = time.perf_counter()
+        encode([query])
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        return np.array(list(executor.map(timed, queries)))
+
+
+def benchmark(n_texts=2000, n_queries=400, clients=8, onnx_dir=DEFAULT_ONNX_DIR, model_name=DEFAULT_MODEL):
+    """
+    Porównanie ścieżek embeddingów: Sentence Transformers wywoływany osobno
+    dla każdego zapytania (jak HuggingFaceEmbeddings w notebooku), ONNX int8
+    oraz ONNX int8 z micro-batchingiem zapytań.
+
+    Args:
+        n_texts (int): Liczba fragmentów do pomiaru przepustowości
+        n_queries (int): Liczba zapytań do pomiaru opóźnień
+        clients (int): Liczba równoległych klientów wysyłających zapytania
+        onnx_dir (Path): Katalog z wyeksportowanym modelem ONNX
+        model_name (str): Model bazowy
+
+    Returns:
+        dict: Dla każdego wariantu zdania/s oraz p50/p95 zapytania w ms
+    """
+    texts, queries = sample_texts(n_texts, n_queries)
+    reference = Embedder(model_name)
+    onnx = OnnxEmbedder(onnx_dir, model_name)
+    batcher = MicroBatcher(onnx)
+
+    variants = {
+        "sentence-transformers": (reference, reference.encode),
+        "onnx-int8": (onnx, onnx.encode),
+        "onnx-int8 + micro-batch": (onnx, batcher.encode),
+    }
+    results = {}
+    for name, (embedder, encode) in variants.items():
+        latencies = query_latencies(encode, queries, clients) * 1000
+        results[name] = {
+            "sentences_per_s": round(throughput(embedder, texts), 1),
+            "query_p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "query_p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        }
+
+    # Zgodność wektorów int8 z oryginałem (podobieństwo kosinusowe)
+    sample = texts[:200]
+    agreement = np.sum(reference.encode(sample) * onnx.encode(sample), axis=1)
+    results["onnx_cosine_vs_reference"] = {"mean": round(float(agreement.mean()), 4),
+                                          "min": round(float(agreement.min()), 4)}
+    results["micro_batch_mean_size"] = round(float(np.mean(batcher.batch_sizes)), 1)
+
+    print(f"{'wariant':<26}{'zdania/s':>10}{'p50 [ms]':>10}{'p95 [ms]':>10}")
+    for name in variants:
+        r = results[name]
+        print(f"{name:<26}{r['sentences_per_s']:>10.1f}{r['query_p50_ms']:>10.2f}{r['query_p95_ms']:>10.2f}")
+    print(f"\nZgodność ONNX int8 z oryginałem: średni cos {results['onnx_cosine_vs_reference']['mean']:.4f}, "
+          f"min {results['onnx_cosine_vs_reference']['min']:.4f}")
+    print(f"Średni rozmiar partii micro-batchera: {results['micro_batch_mean_size']:.1f} zapytań")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark embeddingów: Sentence Transformers vs. ONNX int8")
+    parser.add_argument("--texts", type=int, default=2000, help="Liczba fragmentów (domyślnie: 2000)")
+    parser.add_argument("--queries", type=int, default=400, help="Liczba zapytań (domyślnie: 400)")
+    parser.add_argument("--clients", type=int, default=8, help="Równolegli klienci (domyślnie: 8)")
+    parser.add_argument("--onnx-dir", default=str(DEFAULT_ONNX_DIR), help="Katalog modelu ONNX")
+    args = parser.parse_args()
+
+    benchmark(args.texts, args.queries, args.clients, args.onnx_dir)
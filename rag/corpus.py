@@ -0,0 +1,75 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "scraper" / "data"
+
+TEXT_COLUMN = "description_text"
+
+# Parametry podziału jak w notebooku puste_Parent_Retrieval.ipynb
+CHUNK_SIZE = 400
+CHUNK_OVERLAP = 80
+
+
+def find_detailed_files(data_dir=DATA_DIR):
+    detailed_files = sorted(Path(data_dir).glob("*_detailed.csv"))
+    if not detailed_files:
+        raise FileNotFoundError(f"Nie znaleziono plików '*_detailed.csv' w katalogu {data_dir}")
+    return detailed_files
+
+
+def city_from_path(csv_path):
+    parts = Path(csv_path).stem.split("_")
+    return next((part for part in parts if part not in {"ogloszenia", "detailed"}), Path(csv_path).stem)
+
+
+def load_listings(data_dir=DATA_DIR, files=None):
+    """
+    Ogłoszenia z opisem ze wszystkich plików '*_detailed.csv'.
+
+    Numer wiersza w zwróconej ramce (0..N-1) jest identyfikatorem ogłoszenia
+    w indeksie - fragmenty opisów wskazują na niego zamiast kopiować opis.
+
+    Returns:
+        pd.DataFrame: Ogłoszenia z kolumną 'city', bez pustych opisów i duplikatów URL
+    """
+    frames = []
+    for csv_path in files or find_detailed_files(data_dir):
+        df_city = pd.read_csv(csv_path)
+        df_city["city"] = city_from_path(csv_path)
+        frames.append(df_city)
+
+    df = pd.concat(frames, ignore_index=True)
+    df[TEXT_COLUMN] = df[TEXT_COLUMN].astype("string").str.strip()
+    df = df[df[TEXT_COLUMN].fillna("") != ""]
+    if "url" in df.columns:
+        df = df.drop_duplicates(subset=["url"], keep="last")
+    return df.reset_index(drop=True)
+
+
+def split_descriptions(descriptions, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    Dzieli opisy na fragmenty (RecursiveCharacterTextSplitter).
+
+    Args:
+        descriptions: Opisy ogłoszeń w kolejności identyfikatorów
+        chunk_size (int): Maksymalna długość fragmentu w znakach
+        chunk_overlap (int): Zakładka między kolejnymi fragmentami
+
+    Returns:
+        tuple: (lista tekstów fragmentów, np.ndarray int32 z identyfikatorem ogłoszenia dla każdego
+            fragmentu, np.ndarray int32 (N, 2) z początkiem i długością fragmentu w opisie)
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    texts, parents, spans = [], [], []
+    for parent_id, description in enumerate(descriptions):
+        start = 0
+        for chunk in splitter.split_text(description):
+            # Jak add_start_index w langchain: szukamy od poprzedniego fragmentu
+            start = max(description.find(chunk, start), 0)
+            texts.append(chunk)
+            parents.append(parent_id)
+            spans.append((start, len(chunk)))
+            start += 1
+    return texts, np.asarray(parents, dtype=np.int32), np.asarray(spans, dtype=np.int32).reshape(-1, 2)
@@ -0,0 +1,135 @@
+import hashlib
+import re
+import sqlite3
+from pathlib import Path
+import numpy as np
+
+DEFAULT_STORE_DIR = Path(__file__).resolve().parent / "cache"
+
+SQLITE_BATCH = 500
+EMBED_BATCH = 4096  # fragmentów na jedno wywołanie modelu
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    PRIMARY KEY (model, text_hash)
+);
+CREATE TABLE IF NOT EXISTS models (
+    model TEXT PRIMARY KEY,
+    dim INTEGER NOT NULL,
+    rows INTEGER NOT NULL
+);
+"""
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def model_slug(model_name):
+    return re.sub(r"[^A-Za-z0-9]+", "_", model_name).strip("_")
+
+
+class EmbeddingStore:
+    """
+    Trwały cache embeddingów fragmentów: klucz to (model, hash tekstu),
+    wartość - wiersz w pliku float32 czytanym przez mmap (osobny plik dla
+    każdego modelu). Przy kolejnym indeksowaniu liczone są tylko fragmenty,
+    których jeszcze nie było, więc koszt zależy od nowych ogłoszeń, a nie
+    od wielkości całego korpusu.
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR, model_name=None):
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        self.db_path = self.store_dir / "embeddings.sqlite"
+        self.vectors_path = self.store_dir / f"vectors_{model_slug(model_name)}.f32"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript(SCHEMA)
+            row = conn.execute("SELECT dim, rows FROM models WHERE model = ?", (model_name,)).fetchone()
+        self.dim, self.rows = row if row else (None, 0)
+
+    def __len__(self):
+        return self.rows
+
+    def vectors(self):
+        """Wszystkie zapisane wektory modelu (mmap tylko do odczytu)."""
+        if not self.rows:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+
+    def lookup(self, hashes):
+        """Numery wierszy dla hashy tekstów (-1 dla brakujących)."""
+        found = {}
+        with sqlite3.connect(self.db_path) as conn:
+            for start in range(0, len(hashes), SQLITE_BATCH):
+                batch = hashes[start:start + SQLITE_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                found.update(conn.execute(
+                    f"SELECT text_hash, row FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    (self.model_name, *batch),
+                ).fetchall())
+        return np.array([found.get(h, -1) for h in hashes], dtype=np.int64)
+
+    def _append(self, hashes, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Wymiar wektorów {vectors.shape[1]} nie zgadza się z zapisanym ({self.dim})")
+
+        # Najpierw wektory, potem wpisy w SQLite: przerwany zapis zostawia
+        # najwyżej nieużywane wiersze na końcu pliku
+        with open(self.vectors_path, "r+b" if self.vectors_path.exists() else "wb") as f:
+            f.seek(self.rows * self.dim * 4)
+            f.write(vectors.tobytes())
+            f.truncate()
+        rows = range(self.rows, self.rows + len(vectors))
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany(
+                "INSERT INTO embeddings (model, text_hash, row) VALUES (?, ?, ?)",
+                [(self.model_name, h, row) for h, row in zip(hashes, rows)],
+            )
+            conn.execute(
+                "INSERT INTO models (model, dim, rows) VALUES (?, ?, ?) "
+                "ON CONFLICT(model) DO UPDATE SET rows = excluded.rows",
+                (self.model_name, self.dim, self.rows + len(vectors)),
+            )
+        self.rows += len(vectors)
+
+    def get_or_embed(self, texts, embedder, batch_size=EMBED_BATCH):
+        """
+        Embeddingi dla tekstów: z cache albo policzone i dopisane do cache.
+
+        Args:
+            texts (list): Teksty fragmentów
+            embedder (Embedder): Model (musi mieć ten sam `model_name` co magazyn)
+            batch_size (int): Liczba nowych fragmentów na jedno wywołanie modelu
+
+        Returns:
+            tuple: (macierz float32 (len(texts), dim), dict ze statystykami cache)
+        """
+        if embedder.model_name != self.model_name:
+            raise ValueError(f"Magazyn jest dla modelu '{self.model_name}', a nie '{embedder.model_name}'")
+
+        hashes = [text_hash(text) for text in texts]
+        rows = self.lookup(hashes)
+        cached = int((rows >= 0).sum())
+
+        # Każdy nowy tekst liczymy raz, nawet jeśli powtarza się w wielu ogłoszeniach
+        missing = {}
+        for i in np.flatnonzero(rows < 0):
+            missing.setdefault(hashes[i], texts[i])
+        missing_hashes = list(missing)
+        for start in range(0, len(missing_hashes), batch_size):
+            batch = missing_hashes[start:start + batch_size]
+            self._append(batch, embedder.encode([missing[h] for h in batch]))
+            print(f"🧮 Policzono {min(start + batch_size, len(missing_hashes))}/{len(missing_hashes)} nowych fragmentów")
+
+        if missing_hashes:
+            rows = self.lookup(hashes)
+        stats = {"chunks": len(texts), "cached": cached, "embedded": len(missing_hashes)}
+        return np.asarray(self.vectors()[rows]), stats
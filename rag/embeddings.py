@@ -0,0 +1,246 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from pathlib import Path
+import numpy as np
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_BATCH_SIZE = 256
+
+# Model wyeksportowany do ONNX i skwantyzowany do int8 (export_onnx)
+ONNX_SUFFIX = "@onnx-int8"
+DEFAULT_ONNX_DIR = Path(__file__).resolve().parent / "models" / "all-MiniLM-L6-v2-onnx"
+ONNX_MODEL_FILE = "model_int8.onnx"
+MAX_SEQUENCE_LENGTH = 256
+
+# Micro-batching zapytań: czekamy najwyżej tyle na kolejne zapytania do partii
+MICRO_BATCH_SIZE = 32
+MICRO_BATCH_WAIT_MS = 5
+
+
+class Embedder:
+    """
+    Embeddingi Sentence Transformers na CPU, znormalizowane do długości 1
+    (iloczyn skalarny = podobieństwo kosinusowe). Model ładowany leniwie,
+    przy pierwszym użyciu.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, batch_size=DEFAULT_BATCH_SIZE, device="cpu"):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.device = device
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    @property
+    def dim(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts):
+        """
+        Args:
+            texts (list): Teksty do zakodowania
+
+        Returns:
+            np.ndarray: Macierz float32 (len(texts), dim) ze znormalizowanymi wektorami
+        """
+        if not len(texts):
+            return np.empty((0, self.dim), dtype=np.float32)
+        vectors = self.model.encode(
+            list(texts), batch_size=self.batch_size, normalize_embeddings=True,
+            convert_to_numpy=True, show_progress_bar=False,
+        )
+        return vectors.astype(np.float32, copy=False)
+
+
+def export_onnx(model_name=DEFAULT_MODEL, output_dir=DEFAULT_ONNX_DIR, max_length=MAX_SEQUENCE_LENGTH):
+    """
+    Eksportuje transformer modelu Sentence Transformers do ONNX i kwantyzuje
+    wagi do int8 (dynamic quantization). Wymaga torch i transformers tylko
+    przy eksporcie - serwowanie potrzebuje wyłącznie onnxruntime i tokenizers.
+
+    Args:
+        model_name (str): Model z Hugging Face
+        output_dir (Path): Katalog na model_int8.onnx i tokenizer.json
+        max_length (int): Maksymalna liczba tokenów
+
+    Returns:
+        Path: Ścieżka do skwantyzowanego modelu
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["przykładowe zdanie"], return_tensors="pt", padding="max_length",
+                       truncation=True, max_length=16)
+    fp32_path = output_dir / "model.onnx"
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in ["input_ids", "attention_mask", "token_type_ids"]}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            str(fp32_path),
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+        )
+
+    int8_path = output_dir / ONNX_MODEL_FILE
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+    fp32_path.unlink()
+    with open(output_dir / "max_length.txt", "w") as f:
+        f.write(str(max_length))
+    print(f"✅ Model ONNX int8: {int8_path} ({int8_path.stat().st_size / 1e6:.1f} MB)")
+    return int8_path
+
+
+class OnnxEmbedder:
+    """
+    Ten sam model co Embedder, ale przez onnxruntime z wagami int8: bez torch,
+    z mean poolingiem jak w all-MiniLM-L6-v2. Teksty w partii są sortowane
+    wg długości, więc krótkie zapytania nie są dopełniane do najdłuższego
+    opisu. `model_name` ma przyrostek ONNX_SUFFIX - cache embeddingów
+    trzyma wektory int8 osobno od wektorów z oryginalnego modelu.
+    """
+
+    def __init__(self, model_dir=DEFAULT_ONNX_DIR, model_name=DEFAULT_MODEL, batch_size=DEFAULT_BATCH_SIZE,
+                 threads=None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        self.model_name = model_name + ONNX_SUFFIX
+        self.batch_size = batch_size
+        max_length_file = model_dir / "max_length.txt"
+        max_length = int(max_length_file.read_text()) if max_length_file.exists() else MAX_SEQUENCE_LENGTH
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads or os.cpu_count() or 1
+        self.session = ort.InferenceSession(str(model_dir / ONNX_MODEL_FILE), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.dim = self.session.get_outputs()[0].shape[-1]
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def encode(self, texts):
+        texts = list(texts)
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            vectors[batch] = self._encode_batch([texts[i] for i in batch])
+        return vectors
+
+
+class MicroBatcher:
+    """
+    Łączy równoległe zapytania w jedną partię dla modelu: wątek roboczy
+    zbiera zapytania, aż uzbiera `max_batch_size` tekstów albo minie
+    `max_wait_ms` od pierwszego, i liczy je jednym wywołaniem. Ma ten sam
+    interfejs co Embedder (`encode`, `model_name`), więc można go podać
+    zamiast modelu np. do ListingRetriever.
+    """
+
+    def __init__(self, embedder, max_batch_size=MICRO_BATCH_SIZE, max_wait_ms=MICRO_BATCH_WAIT_MS):
+        self.embedder = embedder
+        self.model_name = embedder.model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batch_sizes = deque(maxlen=10000)  # rozmiary ostatnich partii (statystyki)
+        self._requests = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    @property
+    def dim(self):
+        return self.embedder.dim
+
+    def submit(self, texts):
+        """Dodaje teksty do kolejki; Future zwraca ich macierz wektorów."""
+        future = Future()
+        self._requests.put((list(texts), future))
+        return future
+
+    def encode(self, texts):
+        return self.submit(texts).result()
+
+    def _run(self):
+        while True:
+            pending = [self._requests.get()]
+            size = len(pending[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(request)
+                size += len(request[0])
+
+            texts = [text for request_texts, _ in pending for text in request_texts]
+            self.batch_sizes.append(len(texts))
+            try:
+                vectors = self.embedder.encode(texts)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for request_texts, future in pending:
+                future.set_result(vectors[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+
+
+def load_embedder(model_name=DEFAULT_MODEL, onnx_dir=DEFAULT_ONNX_DIR):
+    """Model wg nazwy zapisanej w indeksie: z przyrostkiem ONNX_SUFFIX - OnnxEmbedder."""
+    if model_name.endswith(ONNX_SUFFIX):
+        return OnnxEmbedder(onnx_dir, model_name[:-len(ONNX_SUFFIX)])
+    return Embedder(model_name)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Eksport modelu embeddingów do ONNX z kwantyzacją int8")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help=f"Model (domyślnie: {DEFAULT_MODEL})")
+    parser.add_argument("--output-dir", default=str(DEFAULT_ONNX_DIR), help="Katalog wynikowy")
+    parser.add_argument("--max-length", type=int, default=MAX_SEQUENCE_LENGTH, help="Maksymalna liczba tokenów")
+    args = parser.parse_args()
+
+    export_onnx(args.model, args.output_dir, args.max_length)
@@ -0,0 +1,227 @@
+import json
+import time
+from pathlib import Path
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+# Pliki indeksu w katalogu (wektory i identyfikatory czytane przez mmap)
+CENTROIDS_FILE = "centroids.npy"
+VECTORS_FILE = "vectors.npy"
+IDS_FILE = "ids.npy"
+OFFSETS_FILE = "offsets.npy"
+META_FILE = "ivf.json"
+
+DEFAULT_NPROBE = 32
+
+# Gdy filtry przepuszczają mniej wektorów niż ten ułamek, liczymy je dokładnie
+# (listy IVF mogłyby nie zawierać żadnego dopuszczonego wektora)
+EXACT_FILTER_FRACTION = 0.05
+
+
+def default_n_lists(n_vectors):
+    """Liczba list ~4*sqrt(N): lista ma wtedy ~sqrt(N)/4 wektorów."""
+    return int(max(1, min(n_vectors, round(4 * np.sqrt(n_vectors)))))
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class IvfIndex:
+    """
+    Indeks IVF (inverted file) dla podobieństwa kosinusowego.
+
+    Wektory są pogrupowane wg najbliższego centroidu k-means i zapisane
+    w jednym pliku .npy w kolejności list, więc lista to ciągły wycinek
+    [offsets[i], offsets[i + 1]). Zapytanie porównujemy z centroidami,
+    a dokładnie liczymy tylko `nprobe` najbliższych list - koszt rośnie
+    z ~sqrt(N) zamiast z N. Po `load` wektory są mapowane z dysku (mmap),
+    więc otwarcie indeksu nie zależy od jego rozmiaru.
+    """
+
+    def __init__(self, centroids, vectors, ids, offsets, nprobe=DEFAULT_NPROBE):
+        self.centroids = centroids
+        self.vectors = vectors
+        self.ids = ids
+        self.offsets = offsets
+        self.nprobe = nprobe
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @property
+    def dim(self):
+        return self.centroids.shape[1]
+
+    @classmethod
+    def build(cls, vectors, ids=None, n_lists=None, nprobe=DEFAULT_NPROBE, seed=42, centroids=None):
+        """
+        Trenuje centroidy i układa wektory wg list.
+
+        Z podanymi `centroids` (np. z poprzedniego indeksu) k-means jest
+        pomijany - wektory są tylko przypisywane do list, co przy
+        przyrostowej aktualizacji kosztuje jedno mnożenie macierzy.
+
+        Args:
+            vectors (np.ndarray): Macierz (N, dim); wektory są normalizowane
+            ids (np.ndarray): Identyfikatory wektorów (domyślnie 0..N-1)
+            n_lists (int): Liczba list (domyślnie ~4*sqrt(N))
+            nprobe (int): Domyślna liczba przeszukiwanych list
+            seed (int): Ziarno k-means
+            centroids (np.ndarray): Gotowe centroidy (n_lists, dim) zamiast trenowania
+
+        Returns:
+            IvfIndex: Indeks w pamięci (do zapisania przez `save`)
+        """
+        vectors = normalize(vectors)
+        ids = np.arange(len(vectors), dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64)
+        if len(vectors) == 0:
+            raise ValueError("Nie można zbudować indeksu bez wektorów")
+
+        if centroids is None:
+            n_lists = min(n_lists or default_n_lists(len(vectors)), len(vectors))
+            kmeans = MiniBatchKMeans(n_clusters=n_lists, batch_size=4096, n_init=1, random_state=seed)
+            assignments = kmeans.fit_predict(vectors)
+            centroids = normalize(kmeans.cluster_centers_)
+        else:
+            centroids = normalize(centroids)
+            n_lists = len(centroids)
+            assignments = assign_lists(vectors, centroids)
+
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=n_lists)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(centroids, vectors[order], ids[order], offsets, nprobe=nprobe)
+
+    def save(self, index_dir):
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        np.save(index_dir / CENTROIDS_FILE, self.centroids)
+        np.save(index_dir / VECTORS_FILE, np.ascontiguousarray(self.vectors, dtype=np.float32))
+        np.save(index_dir / IDS_FILE, self.ids)
+        np.save(index_dir / OFFSETS_FILE, self.offsets)
+        with open(index_dir / META_FILE, "w", encoding="utf-8") as f:
+            json.dump({"n_vectors": len(self), "n_lists": self.n_lists, "dim": self.dim, "nprobe": self.nprobe}, f)
+
+    @classmethod
+    def load(cls, index_dir, mmap=True):
+        index_dir = Path(index_dir)
+        mmap_mode = "r" if mmap else None
+        with open(index_dir / META_FILE, encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(
+            centroids=np.load(index_dir / CENTROIDS_FILE),
+            vectors=np.load(index_dir / VECTORS_FILE, mmap_mode=mmap_mode),
+            ids=np.load(index_dir / IDS_FILE, mmap_mode=mmap_mode),
+            offsets=np.load(index_dir / OFFSETS_FILE),
+            nprobe=meta["nprobe"],
+        )
+
+    def search(self, queries, k=10, nprobe=None, allowed=None):
+        """
+        Przybliżone top-k dla jednego zapytania albo macierzy zapytań.
+
+        Args:
+            queries (np.ndarray): Wektor (dim,) albo macierz (M, dim)
+            k (int): Liczba wyników na zapytanie
+            nprobe (int): Liczba przeszukiwanych list (więcej = dokładniej i wolniej)
+            allowed (np.ndarray): Maska bool po identyfikatorach - filtr stosowany
+                przed rankingiem (None - wszystkie wektory)
+
+        Returns:
+            tuple: (scores, ids) - macierze (M, k) posortowane malejąco; brakujące wyniki mają id -1
+        """
+        if allowed is not None and allowed.mean() < EXACT_FILTER_FRACTION:
+            return self.exact_search(queries, k, positions=np.flatnonzero(allowed[self.ids]))
+
+        queries = normalize(np.atleast_2d(queries))
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+
+        centroid_scores = queries @ self.centroids.T
+        probes = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+        for qi, query in enumerate(queries):
+            # Listy są ciągłymi wycinkami pliku - czytamy je po kolei z mmap
+            ranges = sorted((self.offsets[lst], self.offsets[lst + 1]) for lst in probes[qi])
+            ranges = [(start, end) for start, end in ranges if end > start]
+            if not ranges:
+                continue
+            candidates = np.concatenate([self.vectors[start:end] for start, end in ranges])
+            candidate_ids = np.concatenate([self.ids[start:end] for start, end in ranges])
+            if allowed is not None:
+                keep = allowed[candidate_ids]
+                candidates, candidate_ids = candidates[keep], candidate_ids[keep]
+            candidate_scores = candidates @ query
+            top = _top_k(candidate_scores, k)
+            scores[qi, :len(top)] = candidate_scores[top]
+            ids[qi, :len(top)] = candidate_ids[top]
+        return scores, ids
+
+    def exact_search(self, queries, k=10, positions=None):
+        """
+        Dokładne top-k (pełny przegląd) - punkt odniesienia dla `search`;
+        z `positions` przegląda tylko te pozycje (np. wektory po filtrach).
+        """
+        queries = normalize(np.atleast_2d(queries))
+        if positions is None:
+            vectors, candidate_ids = np.asarray(self.vectors), np.asarray(self.ids)
+        else:
+            vectors, candidate_ids = self.vectors[positions], self.ids[positions]
+        all_scores = queries @ vectors.T
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for qi in range(len(queries)):
+            top = _top_k(all_scores[qi], k)
+            scores[qi, :len(top)] = all_scores[qi, top]
+            ids[qi, :len(top)] = candidate_ids[top]
+        return scores, ids
+
+
+def assign_lists(vectors, centroids, batch_size=65536):
+    """Numer najbliższego centroidu dla każdego wektora (liczone partiami)."""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), batch_size):
+        assignments[start:start + batch_size] = np.argmax(vectors[start:start + batch_size] @ centroids.T, axis=1)
+    return assignments
+
+
+def _top_k(scores, k):
+    """Indeksy k największych wartości, posortowane malejąco."""
+    if len(scores) > k:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def benchmark(index, queries, k=10, nprobe=None):
+    """
+    Trafność (recall@k względem pełnego przeglądu) i czas zapytań.
+
+    Returns:
+        dict: recall@k oraz czasy IVF i pełnego przeglądu na zapytanie
+    """
+    # Pojedyncze zapytania, jak w serwowaniu
+    start = time.perf_counter()
+    approx_ids = np.vstack([index.search(query, k, nprobe)[1] for query in queries])
+    ivf_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    exact_ids = np.vstack([index.exact_search(query, k)[1] for query in queries])
+    exact_seconds = time.perf_counter() - start
+
+    hits = sum(len(set(a[a >= 0]) & set(e[e >= 0])) for a, e in zip(approx_ids, exact_ids))
+    total = int((exact_ids >= 0).sum())
+    return {
+        "queries": len(queries),
+        "recall_at_k": round(hits / max(total, 1), 4),
+        "ivf_ms_per_query": round(ivf_seconds / len(queries) * 1000, 3),
+        "exact_ms_per_query": round(exact_seconds / len(queries) * 1000, 3),
+    }
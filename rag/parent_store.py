@@ -0,0 +1,107 @@
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+COLUMNS_FILE = "columns.json"
+
+
+class ParentStore:
+    """
+    Kolumnowy magazyn ogłoszeń (dokumentów nadrzędnych) na dysku.
+
+    Kolumna liczbowa to jeden plik .npy (float64, NaN = brak), a tekstowa -
+    ciągły blob UTF-8 z tablicą przesunięć [offsets[i], offsets[i + 1]).
+    Wszystko jest czytane przez mmap, więc odczyt kilku ogłoszeń nie wymaga
+    wczytania całego magazynu, a fragmenty w indeksie trzymają tylko numer
+    ogłoszenia zamiast kopii opisu.
+    """
+
+    def __init__(self, store_dir, columns, n_rows):
+        self.store_dir = Path(store_dir)
+        self.columns = columns
+        self.n_rows = n_rows
+        self._arrays = {}
+        self._decoded = {}
+
+    def __len__(self):
+        return self.n_rows
+
+    @classmethod
+    def write(cls, df, store_dir):
+        """
+        Zapisuje ramkę kolumnami; numer wiersza (0..N-1) jest identyfikatorem ogłoszenia.
+
+        Returns:
+            ParentStore: Magazyn otwarty do odczytu
+        """
+        store_dir = Path(store_dir)
+        store_dir.mkdir(parents=True, exist_ok=True)
+        columns = {}
+        for name in df.columns:
+            values = df[name]
+            if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+                np.save(store_dir / f"{name}.npy", values.to_numpy(dtype=np.float64, na_value=np.nan))
+                columns[name] = "numeric"
+            else:
+                encoded = [b"" if pd.isna(value) else str(value).encode("utf-8") for value in values]
+                offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+                offsets[1:] = np.cumsum([len(value) for value in encoded])
+                with open(store_dir / f"{name}.utf8", "wb") as f:
+                    f.write(b"".join(encoded))
+                np.save(store_dir / f"{name}.offsets.npy", offsets)
+                columns[name] = "text"
+        with open(store_dir / COLUMNS_FILE, "w", encoding="utf-8") as f:
+            json.dump({"n_rows": len(df), "columns": columns}, f, indent=2, ensure_ascii=False)
+        return cls(store_dir, columns, len(df))
+
+    @classmethod
+    def load(cls, store_dir):
+        with open(Path(store_dir) / COLUMNS_FILE, encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(store_dir, meta["columns"], meta["n_rows"])
+
+    def _column(self, name):
+        if name not in self._arrays:
+            if self.columns[name] == "numeric":
+                self._arrays[name] = np.load(self.store_dir / f"{name}.npy", mmap_mode="r")
+            else:
+                blob_path = self.store_dir / f"{name}.utf8"
+                blob = np.memmap(blob_path, dtype=np.uint8, mode="r") if blob_path.stat().st_size else np.empty(0, np.uint8)
+                self._arrays[name] = (blob, np.load(self.store_dir / f"{name}.offsets.npy", mmap_mode="r"))
+        return self._arrays[name]
+
+    def column(self, name):
+        """
+        Cała kolumna jako tablica numpy (do filtrów): liczbowa - mmap float64,
+        tekstowa - zdekodowane napisy (None dla braków), pamiętane po pierwszym użyciu.
+        """
+        if self.columns[name] == "numeric":
+            return self._column(name)
+        if name not in self._decoded:
+            self._decoded[name] = np.array([self.value(name, row) for row in range(self.n_rows)], dtype=object)
+        return self._decoded[name]
+
+    def value(self, name, row):
+        if self.columns[name] == "numeric":
+            value = float(self._column(name)[row])
+            if np.isnan(value):
+                return None
+            return int(value) if value.is_integer() else value
+        blob, offsets = self._column(name)
+        return bytes(blob[offsets[row]:offsets[row + 1]]).decode("utf-8") or None
+
+    def get(self, rows, columns=None):
+        """
+        Args:
+            rows: Identyfikatory ogłoszeń
+            columns (list): Kolumny do odczytu (domyślnie wszystkie)
+
+        Returns:
+            list: Słowniki kolumna -> wartość (None dla braków)
+        """
+        columns = columns or list(self.columns)
+        return [{name: self.value(name, int(row)) for name in columns} for row in rows]
+
+    def size_bytes(self):
+        return sum(path.stat().st_size for path in self.store_dir.iterdir())
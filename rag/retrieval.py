@@ -0,0 +1,450 @@
+import argparse
+import json
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from corpus import CHUNK_OVERLAP, CHUNK_SIZE, DATA_DIR, TEXT_COLUMN, load_listings, split_descriptions
+from embedding_store import DEFAULT_STORE_DIR, EmbeddingStore
+from embeddings import DEFAULT_MODEL, DEFAULT_ONNX_DIR, Embedder, OnnxEmbedder, load_embedder
+from ivf_index import IvfIndex, benchmark
+from parent_store import ParentStore
+from text_index import Bm25Index, normalize_text, tokenize
+
+DEFAULT_INDEX_DIR = Path(__file__).resolve().parent / "index"
+
+PARENTS_FILE = "chunk_parents.npy"
+SPANS_FILE = "chunk_spans.npy"
+PARENT_STORE_DIR = "parents"
+BM25_DIR = "bm25"
+META_FILE = "meta.json"
+
+# Ile razy więcej fragmentów pobieramy, żeby po złączeniu w ogłoszenia zostało ich k
+OVERSAMPLE = 5
+
+# Reciprocal rank fusion: wynik = suma 1 / (RRF_K + pozycja) po rankingach
+RRF_K = 60
+SEARCH_MODES = ("hybrid", "vector", "keyword")
+
+# Ile embeddingów zapytań trzymamy w pamięci (powtarzające się zapytania nie liczą modelu)
+QUERY_CACHE_SIZE = 1024
+
+# Centroidy IVF trenujemy od nowa, gdy korpus urósł ponad tyle razy od ostatniego treningu
+RETRAIN_GROWTH = 2.0
+
+# Pola ogłoszenia zwracane razem z trafieniem
+LISTING_COLUMNS = [
+    "url", "city", "locality", "street", "rooms", "area", "price_total_zl", "price_sqm_zl",
+    "owner_type", "date_posted", "floor", "year_built", "building_type", "image_url",
+    "latitude", "longitude", TEXT_COLUMN,
+]
+NUMERIC_COLUMNS = ["rooms", "area", "price_total_zl", "price_sqm_zl", "year_built", "latitude", "longitude"]
+
+
+def reusable_centroids(index_dir, model_name, n_chunks):
+    """
+    Centroidy poprzedniego indeksu, jeśli pasują (ten sam model, korpus nie
+    urósł ponad RETRAIN_GROWTH razy od treningu); inaczej None.
+    """
+    meta_path = Path(index_dir) / META_FILE
+    if not meta_path.exists():
+        return None, None
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    trained_chunks = meta.get("trained_chunks", meta.get("chunks", 0))
+    if meta.get("model") != model_name or n_chunks > RETRAIN_GROWTH * trained_chunks:
+        return None, None
+    return IvfIndex.load(Path(index_dir) / "ivf").centroids, trained_chunks
+
+
+def keyword_document(listing):
+    """Tekst do BM25: dzielnica i ulica (powtórzone - większa waga pola) oraz opis."""
+    fields = [listing.get("locality"), listing.get("street")]
+    fields = " ".join(str(value) for value in fields if isinstance(value, str))
+    return f"{fields} {fields} {listing.get(TEXT_COLUMN) or ''}"
+
+
+def keyword_passage(description, query, width=CHUNK_SIZE):
+    """Fragment opisu wokół pierwszego wystąpienia słowa z zapytania (albo początek opisu)."""
+    text = normalize_text(description)
+    positions = [text.find(token) for token in tokenize(query)]
+    positions = [position for position in positions if position >= 0]
+    start = max(min(positions) - width // 4, 0) if positions else 0
+    return description[start:start + width]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """
+    Args:
+        rankings: Listy identyfikatorów, każda posortowana od najlepszego
+
+    Returns:
+        list: Pary (identyfikator, wynik RRF) posortowane malejąco
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda pair: -pair[1])
+
+
+def memory_per_listing(listings, parents, spans, parent_store, index):
+    """
+    Bajty na ogłoszenie: mapowanie fragment -> ogłoszenie, magazyn ogłoszeń
+    i wektory, a dla porównania - kopia opisu ogłoszenia w metadanych
+    każdego fragmentu (jak Document w notebooku).
+    """
+    n = max(len(listings), 1)
+    descriptions = listings[TEXT_COLUMN].to_numpy()
+    duplicated_parents = sum(len(descriptions[parent].encode("utf-8")) for parent in parents)
+    return {
+        "chunk_map": round((parents.nbytes + spans.nbytes) / n, 1),
+        "parent_store": round(parent_store.size_bytes() / n, 1),
+        "vectors": round(len(index) * index.dim * 4 / n, 1),
+        "duplicated_parent_text": round(duplicated_parents / n, 1),
+    }
+
+
+def build_index(index_dir=DEFAULT_INDEX_DIR, data_dir=DATA_DIR, embedder=None, n_lists=None,
+                store_dir=DEFAULT_STORE_DIR, retrain=False):
+    """
+    Buduje indeks offline: opisy -> fragmenty -> embeddingi -> IVF.
+
+    Embeddingi pochodzą z EmbeddingStore, więc liczone są tylko nowe lub
+    zmienione fragmenty. Centroidy IVF są brane z poprzedniego indeksu
+    (bez ponownego k-means), dopóki korpus nie urośnie RETRAIN_GROWTH razy.
+    Indeks powstaje w katalogu tymczasowym i podmienia poprzedni dopiero na
+    końcu, więc działająca wyszukiwarka nigdy nie widzi połowy indeksu.
+
+    Args:
+        index_dir (Path): Katalog docelowy indeksu
+        data_dir (Path): Katalog z plikami '*_detailed.csv'
+        embedder (Embedder): Model embeddingów (domyślnie all-MiniLM-L6-v2)
+        n_lists (int): Liczba list IVF przy trenowaniu (domyślnie ~4*sqrt(liczba fragmentów))
+        store_dir (Path): Katalog cache embeddingów
+        retrain (bool): Wymuś ponowny trening centroidów
+
+    Returns:
+        dict: Metadane zbudowanego indeksu
+    """
+    embedder = embedder or Embedder()
+    store = EmbeddingStore(store_dir, embedder.model_name)
+    index_dir = Path(index_dir)
+    tmp_dir = index_dir.with_name(index_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    timings = {}
+
+    start = time.perf_counter()
+    listings = load_listings(data_dir)
+    texts, parents, spans = split_descriptions(listings[TEXT_COLUMN])
+    timings["chunking_s"] = round(time.perf_counter() - start, 3)
+    print(f"📄 {len(listings)} ogłoszeń -> {len(texts)} fragmentów")
+
+    start = time.perf_counter()
+    vectors, cache_stats = store.get_or_embed(texts, embedder)
+    timings["embedding_s"] = round(time.perf_counter() - start, 3)
+    print(f"🧮 Embeddingi: {cache_stats['cached']} z cache, {cache_stats['embedded']} policzonych "
+          f"w {timings['embedding_s']:.1f} s")
+
+    start = time.perf_counter()
+    centroids, trained_chunks = (None, None) if retrain else reusable_centroids(index_dir, embedder.model_name, len(texts))
+    index = IvfIndex.build(vectors, n_lists=n_lists, centroids=centroids)
+    timings["ivf_s"] = round(time.perf_counter() - start, 3)
+    ivf_mode = "nowe centroidy" if centroids is None else "centroidy z poprzedniego indeksu"
+
+    index.save(tmp_dir / "ivf")
+    np.save(tmp_dir / PARENTS_FILE, parents)
+    np.save(tmp_dir / SPANS_FILE, spans)
+    stored = listings[[col for col in LISTING_COLUMNS if col in listings.columns]].copy()
+    for col in NUMERIC_COLUMNS:
+        if col in stored.columns:
+            # Kolumny filtrów muszą być liczbowe ("Zapytaj o cenę" -> brak)
+            stored[col] = pd.to_numeric(stored[col], errors="coerce")
+    parent_store = ParentStore.write(stored, tmp_dir / PARENT_STORE_DIR)
+    start = time.perf_counter()
+    Bm25Index.build([keyword_document(listing) for listing in listings.to_dict("records")]).save(tmp_dir / BM25_DIR)
+    timings["bm25_s"] = round(time.perf_counter() - start, 3)
+    meta = {
+        "model": embedder.model_name,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "listings": len(listings),
+        "chunks": len(texts),
+        "trained_chunks": len(texts) if centroids is None else trained_chunks,
+        "n_lists": index.n_lists,
+        "embedding_cache": cache_stats,
+        "bytes_per_listing": memory_per_listing(listings, parents, spans, parent_store, index),
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        "timings": timings,
+    }
+    with open(tmp_dir / META_FILE, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+
+    old_dir = index_dir.with_name(index_dir.name + ".old")
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if index_dir.exists():
+        index_dir.rename(old_dir)
+    tmp_dir.rename(index_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    print(f"✅ Indeks zapisano w {index_dir} ({index.n_lists} list IVF, {ivf_mode}, {timings['ivf_s']:.1f} s)")
+    return meta
+
+
+class ListingRetriever:
+    """
+    Wyszukiwarka ogłoszeń (parent document retrieval) nad gotowym indeksem
+    z dysku. Łączy dwa rankingi ogłoszeń przez reciprocal rank fusion:
+    BM25 po opisie, dzielnicy i ulicy (dokładne słowa, np. "Bałuty",
+    "kamienica") oraz IVF po embeddingach fragmentów opisów (znaczenie).
+    Filtry na kolumnach (pokoje, metraż, cena, miasto) są stosowane przed
+    rankingiem w obu indeksach. Nie buduje ani nie przelicza indeksu -
+    tylko go otwiera (mmap).
+    """
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR, embedder=None):
+        index_dir = Path(index_dir)
+        with open(index_dir / META_FILE, encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.index = IvfIndex.load(index_dir / "ivf")
+        self.keywords = Bm25Index.load(index_dir / BM25_DIR)
+        self.chunk_parents = np.load(index_dir / PARENTS_FILE, mmap_mode="r")
+        self.chunk_spans = np.load(index_dir / SPANS_FILE, mmap_mode="r")
+        self.parents = ParentStore.load(index_dir / PARENT_STORE_DIR)
+        self.embedder = embedder or load_embedder(self.meta["model"])
+        self._query_vectors = OrderedDict()
+        self._query_lock = threading.Lock()
+
+    def passage(self, chunk_id):
+        """Tekst fragmentu odtworzony z opisu ogłoszenia (początek i długość)."""
+        start, length = (int(value) for value in self.chunk_spans[chunk_id])
+        description = self.parents.value(TEXT_COLUMN, int(self.chunk_parents[chunk_id])) or ""
+        return description[start:start + length]
+
+    def embed_queries(self, queries):
+        """
+        Embeddingi zapytań; nowe liczone jedną partią, powtórzone brane z pamięci (LRU).
+        Bezpieczne dla wielu wątków - model liczy poza blokadą, więc równoległe
+        zapytania mogą trafić do jednej partii (MicroBatcher).
+        """
+        with self._query_lock:
+            known = {query: self._query_vectors[query] for query in queries if query in self._query_vectors}
+            for query in known:
+                self._query_vectors.move_to_end(query)
+        missing = list(dict.fromkeys(query for query in queries if query not in known))
+        if missing:
+            computed = dict(zip(missing, self.embedder.encode(missing)))
+            known.update(computed)
+            with self._query_lock:
+                self._query_vectors.update(computed)
+                while len(self._query_vectors) > QUERY_CACHE_SIZE:
+                    self._query_vectors.popitem(last=False)
+        return np.vstack([known[query] for query in queries])
+
+    def filter_mask(self, filters):
+        """
+        Maska ogłoszeń spełniających filtry.
+
+        Args:
+            filters (dict): kolumna -> (min, max) dla kolumn liczbowych (None = bez
+                ograniczenia) albo kolumna -> wartość dla tekstowych, np.
+                {"city": "lodz", "rooms": (2, 3), "price_total_zl": (None, 600000)}
+
+        Returns:
+            np.ndarray: Maska bool po identyfikatorach ogłoszeń albo None bez filtrów
+        """
+        if not filters:
+            return None
+        mask = np.ones(len(self.parents), dtype=bool)
+        for column, condition in filters.items():
+            if column not in self.parents.columns:
+                raise ValueError(f"Nieznana kolumna filtra: '{column}'")
+            values = self.parents.column(column)
+            if isinstance(condition, (tuple, list)):
+                if self.parents.columns[column] != "numeric":
+                    raise ValueError(f"Filtr zakresu wymaga kolumny liczbowej: '{column}'")
+                low, high = condition
+                if low is not None:
+                    mask &= values >= low
+                if high is not None:
+                    mask &= values <= high
+            else:
+                mask &= values == condition
+        return mask
+
+    def _vector_hits(self, queries, depth, nprobe, allowed):
+        """Dla każdego zapytania: ogłoszenia w kolejności najlepszego fragmentu."""
+        chunk_allowed = None if allowed is None else allowed[self.chunk_parents]
+        scores, chunk_ids = self.index.search(self.embed_queries(queries), depth, nprobe, allowed=chunk_allowed)
+        hits = []
+        for query_scores, query_chunks in zip(scores, chunk_ids):
+            # Fragmenty są posortowane malejąco - pierwszy dla ogłoszenia jest najlepszy
+            best = {}
+            for score, chunk_id in zip(query_scores, query_chunks):
+                if chunk_id < 0:
+                    continue
+                parent_id = int(self.chunk_parents[chunk_id])
+                if parent_id in best:
+                    best[parent_id]["matched_chunks"] += 1
+                else:
+                    best[parent_id] = {"vector_score": round(float(score), 4), "chunk_id": int(chunk_id),
+                                       "matched_chunks": 1}
+            hits.append(best)
+        return hits
+
+    def _keyword_hits(self, query, depth, allowed):
+        scores, parent_ids = self.keywords.search(query, depth, allowed)
+        return {int(parent_id): {"bm25_score": round(float(score), 4)} for score, parent_id in zip(scores, parent_ids)}
+
+    def search(self, queries, k=5, nprobe=None, columns=None, mode="hybrid", filters=None):
+        """
+        Args:
+            queries: Zapytanie (str) albo lista zapytań - embeddingi liczone jedną partią
+            k (int): Liczba ogłoszeń na zapytanie
+            nprobe (int): Liczba przeszukiwanych list IVF
+            columns (list): Pola ogłoszenia w wyniku (domyślnie wszystkie zapisane)
+            mode (str): "hybrid" (BM25 + wektory, RRF), "vector" albo "keyword" (bez modelu)
+            filters (dict): Filtry kolumn stosowane przed rankingiem (zob. `filter_mask`)
+
+        Returns:
+            list: Dla jednego zapytania lista wyników, dla listy zapytań - lista list.
+                Wynik to pola ogłoszenia, wynik łączny i wyniki składowe,
+                liczba trafionych fragmentów i pasujący fragment opisu.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Nieznany tryb '{mode}'. Dostępne: {', '.join(SEARCH_MODES)}")
+        single = isinstance(queries, str)
+        queries = [queries] if single else list(queries)
+        if not queries:
+            return []
+
+        allowed = self.filter_mask(filters)
+        depth = k * OVERSAMPLE
+        vector_hits = self._vector_hits(queries, depth, nprobe, allowed) if mode != "keyword" else [{}] * len(queries)
+        keyword_hits = [self._keyword_hits(query, depth, allowed) if mode != "vector" else {} for query in queries]
+
+        results = []
+        for query, vectors, keywords in zip(queries, vector_hits, keyword_hits):
+            if mode == "hybrid":
+                ranked = reciprocal_rank_fusion([list(vectors), list(keywords)])[:k]
+            else:
+                hits = vectors if mode == "vector" else keywords
+                score_key = "vector_score" if mode == "vector" else "bm25_score"
+                ranked = [(parent_id, hit[score_key]) for parent_id, hit in list(hits.items())[:k]]
+
+            parent_ids = [parent_id for parent_id, _ in ranked]
+            listings = self.parents.get(parent_ids, columns)
+            query_results = []
+            for (parent_id, score), listing in zip(ranked, listings):
+                vector_hit = vectors.get(parent_id, {})
+                if "chunk_id" in vector_hit:
+                    passage = self.passage(vector_hit["chunk_id"])
+                else:
+                    passage = keyword_passage(self.parents.value(TEXT_COLUMN, parent_id) or "", query)
+                query_results.append({
+                    "listing_id": parent_id,
+                    "score": round(float(score), 4 if mode != "hybrid" else 6),
+                    "vector_score": vector_hit.get("vector_score"),
+                    "bm25_score": keywords.get(parent_id, {}).get("bm25_score"),
+                    "matched_chunks": vector_hit.get("matched_chunks", 0),
+                    "passage": passage,
+                    **listing,
+                })
+            results.append(query_results)
+        return results[0] if single else results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Indeks wektorowy opisów ogłoszeń (IVF na dysku)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Przykłady użycia:
+  # Budowa / aktualizacja indeksu (offline, po scrapowaniu; liczy tylko nowe fragmenty)
+  python retrieval.py build
+
+  # Pełna przebudowa centroidów IVF
+  python retrieval.py build --retrain
+
+  # Wyszukiwanie (BM25 + wektory)
+  python retrieval.py search "mieszkanie z ogródkiem blisko parku" -k 5
+
+  # Z filtrami, bez modelu embeddingów
+  python retrieval.py search "kamienica Bałuty" --mode keyword --city lodz --rooms 2 3 --max-price 600000
+
+  # Trafność i czas IVF vs. pełny przegląd
+  python retrieval.py bench --nprobe 8 16 32
+        """
+    )
+    parser.add_argument("--index-dir", default=str(DEFAULT_INDEX_DIR), help="Katalog indeksu")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Zbuduj indeks z plików '*_detailed.csv'")
+    build_parser.add_argument("--data-dir", default=str(DATA_DIR), help="Katalog z danymi")
+    build_parser.add_argument("--model", default=DEFAULT_MODEL, help=f"Model embeddingów (domyślnie: {DEFAULT_MODEL})")
+    build_parser.add_argument("--onnx", action="store_true",
+                              help="Licz embeddingi modelem ONNX int8 (najpierw: python embeddings.py)")
+    build_parser.add_argument("--n-lists", type=int, default=None, help="Liczba list IVF")
+    build_parser.add_argument("--store-dir", default=str(DEFAULT_STORE_DIR), help="Katalog cache embeddingów")
+    build_parser.add_argument("--retrain", action="store_true", help="Trenuj centroidy IVF od nowa")
+
+    search_parser = subparsers.add_parser("search", help="Wyszukaj ogłoszenia")
+    search_parser.add_argument("query", help="Zapytanie")
+    search_parser.add_argument("-k", type=int, default=5, help="Liczba wyników (domyślnie: 5)")
+    search_parser.add_argument("--nprobe", type=int, default=None, help="Liczba przeszukiwanych list IVF")
+    search_parser.add_argument("--mode", choices=SEARCH_MODES, default="hybrid", help="Tryb wyszukiwania (domyślnie: hybrid)")
+    search_parser.add_argument("--city", default=None, help="Filtr: miasto (np. lodz)")
+    search_parser.add_argument("--rooms", type=int, nargs=2, default=None, metavar=("MIN", "MAX"), help="Filtr: liczba pokoi")
+    search_parser.add_argument("--area", type=float, nargs=2, default=None, metavar=("MIN", "MAX"), help="Filtr: metraż")
+    search_parser.add_argument("--max-price", type=float, default=None, help="Filtr: maksymalna cena")
+
+    bench_parser = subparsers.add_parser("bench", help="Recall@k i czas zapytań IVF vs. pełny przegląd")
+    bench_parser.add_argument("-k", type=int, default=10, help="Liczba wyników (domyślnie: 10)")
+    bench_parser.add_argument("--queries", type=int, default=200, help="Liczba zapytań testowych")
+    bench_parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32], help="Wartości nprobe")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        embedder = OnnxEmbedder(DEFAULT_ONNX_DIR, args.model) if args.onnx else Embedder(args.model)
+        build_index(args.index_dir, args.data_dir, embedder, args.n_lists, args.store_dir, args.retrain)
+
+    elif args.command == "search":
+        start = time.perf_counter()
+        retriever = ListingRetriever(args.index_dir)
+        print(f"⏱️  Otwarcie indeksu: {(time.perf_counter() - start) * 1000:.1f} ms "
+              f"({retriever.meta['chunks']} fragmentów, {retriever.meta['listings']} ogłoszeń)")
+        filters = {}
+        if args.city:
+            filters["city"] = args.city
+        if args.rooms:
+            filters["rooms"] = tuple(args.rooms)
+        if args.area:
+            filters["area"] = tuple(args.area)
+        if args.max_price:
+            filters["price_total_zl"] = (None, args.max_price)
+        start = time.perf_counter()
+        hits = retriever.search(args.query, args.k, args.nprobe, mode=args.mode, filters=filters)
+        print(f"⏱️  Zapytanie ({args.mode}): {(time.perf_counter() - start) * 1000:.1f} ms")
+        for i, hit in enumerate(hits, 1):
+            print(f"\n=== {i}. {hit['score']:.4f} (wektory: {hit['vector_score']}, BM25: {hit['bm25_score']}) | "
+                  f"{hit.get('locality')} | {hit.get('rooms')} pok. | {hit.get('area')} m² | {hit.get('price_total_zl')} zł")
+            print(hit["url"])
+            print(hit["passage"])
+
+    elif args.command == "bench":
+        index = IvfIndex.load(Path(args.index_dir) / "ivf")
+        # Zapytania testowe: zaszumione wektory z indeksu
+        rng = np.random.default_rng(42)
+        sample = rng.choice(len(index), size=min(args.queries, len(index)), replace=False)
+        queries = np.asarray(index.vectors[np.sort(sample)])
+        queries = queries + rng.normal(scale=0.02, size=queries.shape).astype(np.float32)
+        print(f"Indeks: {len(index)} wektorów, {index.n_lists} list")
+        for nprobe in args.nprobe:
+            result = benchmark(index, queries, args.k, nprobe)
+            print(f"nprobe={nprobe:>3}: recall@{args.k}={result['recall_at_k']:.3f}, "
+                  f"IVF {result['ivf_ms_per_query']:.2f} ms/zapytanie, "
+                  f"pełny przegląd {result['exact_ms_per_query']:.2f} ms/zapytanie")
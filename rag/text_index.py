@@ -0,0 +1,147 @@
+import json
+import re
+from collections import Counter
+from pathlib import Path
+import numpy as np
+
+TERMS_FILE = "terms.npy"
+OFFSETS_FILE = "offsets.npy"
+DOCS_FILE = "docs.npy"
+WEIGHTS_FILE = "weights.npy"
+META_FILE = "bm25.json"
+
+K1 = 1.2
+B = 0.75
+
+# Polskie znaki -> litery bez ogonków ("Bałuty" = "baluty")
+FOLD = str.maketrans("ąćęłńóśźż", "acelnoszz")
+TOKEN_RE = re.compile(r"\w+")
+
+# Prosty stemming dla polskiego: wspólny prefiks odmian
+# ("kamienica", "kamienicy", "kamienicą" -> "kamien")
+PREFIX_LENGTH = 6
+
+STOPWORDS = {
+    "a", "aby", "ale", "bez", "by", "byc", "dla", "do", "i", "ich", "im", "jak", "jest", "jego", "jej",
+    "ma", "na", "nad", "nie", "o", "od", "oraz", "po", "pod", "przez", "przy", "sie", "sa", "ta", "tak",
+    "te", "ten", "to", "tu", "w", "we", "z", "za", "ze", "lub", "czy", "co", "juz", "tez", "tylko",
+}
+
+
+def normalize_text(text):
+    return text.lower().translate(FOLD)
+
+
+def tokenize(text):
+    """Tokeny do BM25: małe litery, bez ogonków, bez stop-słów, skrócone do prefiksu."""
+    return [token[:PREFIX_LENGTH] for token in TOKEN_RE.findall(normalize_text(text)) if token not in STOPWORDS]
+
+
+class Bm25Index:
+    """
+    Odwrócony indeks BM25 na dysku. Dla każdego terminu lista (dokument,
+    waga), gdzie waga to już gotowy wkład BM25 (idf * znormalizowane tf),
+    więc zapytanie to tylko suma wag z list swoich terminów. Słownik jest
+    posortowaną tablicą (wyszukiwanie binarne), a listy - ciągłymi
+    wycinkami plików .npy czytanych przez mmap.
+    """
+
+    def __init__(self, terms, offsets, docs, weights, n_docs):
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.weights = weights
+        self.n_docs = n_docs
+
+    @classmethod
+    def build(cls, documents, k1=K1, b=B):
+        """
+        Args:
+            documents: Teksty dokumentów; numer dokumentu to pozycja na liście
+            k1 (float): Nasycenie częstości terminu
+            b (float): Siła normalizacji długości dokumentu
+
+        Returns:
+            Bm25Index: Indeks w pamięci (do zapisania przez `save`)
+        """
+        counts = [Counter(tokenize(document)) for document in documents]
+        lengths = np.array([sum(count.values()) for count in counts], dtype=np.float32)
+        avg_length = max(float(lengths.mean()) if len(lengths) else 0.0, 1.0)
+
+        terms = np.array(sorted({term for count in counts for term in count}))
+        term_ids = {term: i for i, term in enumerate(terms)}
+        postings_terms, postings_docs, postings_tf = [], [], []
+        for doc_id, count in enumerate(counts):
+            postings_terms.extend(term_ids[term] for term in count)
+            postings_docs.extend([doc_id] * len(count))
+            postings_tf.extend(count.values())
+
+        postings_terms = np.asarray(postings_terms, dtype=np.int64)
+        docs = np.asarray(postings_docs, dtype=np.int32)
+        tf = np.asarray(postings_tf, dtype=np.float32)
+        order = np.argsort(postings_terms, kind="stable")
+        postings_terms, docs, tf = postings_terms[order], docs[order], tf[order]
+
+        df = np.bincount(postings_terms, minlength=len(terms))
+        idf = np.log1p((len(documents) - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * lengths[docs] / avg_length)
+        weights = (idf[postings_terms] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+        offsets = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+        return cls(terms, offsets, docs, weights, len(documents))
+
+    def save(self, index_dir):
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        np.save(index_dir / TERMS_FILE, self.terms)
+        np.save(index_dir / OFFSETS_FILE, self.offsets)
+        np.save(index_dir / DOCS_FILE, self.docs)
+        np.save(index_dir / WEIGHTS_FILE, self.weights)
+        with open(index_dir / META_FILE, "w", encoding="utf-8") as f:
+            json.dump({"n_docs": self.n_docs, "n_terms": len(self.terms), "k1": K1, "b": B,
+                       "prefix_length": PREFIX_LENGTH}, f)
+
+    @classmethod
+    def load(cls, index_dir):
+        index_dir = Path(index_dir)
+        with open(index_dir / META_FILE, encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(
+            terms=np.load(index_dir / TERMS_FILE, mmap_mode="r"),
+            offsets=np.load(index_dir / OFFSETS_FILE, mmap_mode="r"),
+            docs=np.load(index_dir / DOCS_FILE, mmap_mode="r"),
+            weights=np.load(index_dir / WEIGHTS_FILE, mmap_mode="r"),
+            n_docs=meta["n_docs"],
+        )
+
+    def postings(self, term):
+        position = int(np.searchsorted(self.terms, term))
+        if position >= len(self.terms) or self.terms[position] != term:
+            return None, None
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return self.docs[start:end], self.weights[start:end]
+
+    def search(self, query, k=10, allowed=None):
+        """
+        Args:
+            query (str): Zapytanie
+            k (int): Liczba wyników
+            allowed (np.ndarray): Maska bool dokumentów spełniających filtry (None - wszystkie)
+
+        Returns:
+            tuple: (scores, ids) posortowane malejąco, tylko dokumenty z dodatnim wynikiem
+        """
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            docs, weights = self.postings(term)
+            if docs is None:
+                continue
+            if allowed is not None:
+                keep = allowed[docs]
+                docs, weights = docs[keep], weights[keep]
+            scores[docs] += weights
+
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return scores[matched], matched
@@ -1,8 +1,119 @@
 import pandas as pd
+import numpy as np
 import argparse
 import os
+import re
+from collections import Counter
+from near_duplicates import DEFAULT_THRESHOLD, NearDuplicateIndex
+from history import city_from_file, snapshot_week
+from sketches import QUANTILE_COLUMNS, ListingStats, save_stats, stats_file
 
-def clean_scraped_data(input_file, output_file=None, min_valid_fields=5, remove_price_ask=False):
+# Wzorce kompilowane raz, używane przez akcesory .str na całych kolumnach
+THOUSANDS_SEPARATOR_PATTERN = re.compile(r'[\s\xa0\u202f]+')
+NUMBER_PATTERN = re.compile(r'(-?\d+(?:[.,]\d+)?)')
+FLOOR_NUMBER_PATTERN = re.compile(r'^\s*(-?\d+)')
+
+# Kolumny z liczbami zapisanymi jako tekst (np. "315 000", "6 702zł / m²") i ich docelowe typy
+NUMERIC_COLUMNS = {
+    'rooms': 'Int64',
+    'area': 'float64',
+    'price_total_zl': 'float64',
+    'price_sqm_zl': 'float64',
+    'photo_count': 'Int64',
+    'year_built': 'Int64',
+    'price_per_sqm_detailed': 'float64',
+    'latitude': 'float64',
+    'longitude': 'float64',
+}
+
+
+def parse_numeric_column(series):
+    """
+    Wektorowo zamienia tekst z liczbą na wartość liczbową.
+    Usuwa separatory tysięcy (spacje, twarde spacje), bierze pierwszą liczbę
+    z tekstu i traktuje przecinek jako separator dziesiętny.
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return pd.to_numeric(series, errors='coerce')
+    text = series.astype('string').str.replace(THOUSANDS_SEPARATOR_PATTERN, '', regex=True)
+    number = text.str.extract(NUMBER_PATTERN, expand=False).str.replace(',', '.', regex=False)
+    return pd.to_numeric(number, errors='coerce')
+
+
+def normalize_numeric_columns(df):
+    """
+    Konwertuje kolumny liczbowe na typy numeryczne i dodaje kolumny pochodne
+    z piętra (floor_number, has_elevator).
+
+    Returns:
+        tuple: (DataFrame, słownik {kolumna: liczba niepustych wartości, których nie udało się sparsować})
+    """
+    parse_failures = {}
+    for column, dtype in NUMERIC_COLUMNS.items():
+        if column not in df.columns:
+            continue
+        raw = df[column]
+        parsed = parse_numeric_column(raw)
+        has_text = raw.notna() & (raw.astype('string').str.strip() != '')
+        parse_failures[column] = int((has_text & parsed.isna()).sum())
+        if dtype == 'Int64':
+            parsed = parsed.round()
+        df[column] = parsed.astype(dtype)
+
+    if 'floor' in df.columns:
+        floor_text = df['floor'].astype('string').str.strip().str.lower()
+        floor_number = pd.to_numeric(
+            floor_text.str.extract(FLOOR_NUMBER_PATTERN, expand=False), errors='coerce'
+        )
+        floor_number = floor_number.mask(floor_text.str.startswith('parter', na=False), 0)
+        floor_number = floor_number.mask(floor_text.str.contains('suteren', na=False), -1)
+        df['floor_number'] = floor_number.astype('Int64')
+        df['has_elevator'] = floor_text.str.contains('winda', na=False)
+        parse_failures['floor'] = int((floor_text.notna() & (floor_text != '') & floor_number.isna()).sum())
+
+    return df, parse_failures
+
+
+def default_output_file(input_file):
+    """Generuje nazwę pliku wyjściowego w tym samym katalogu co input: {input}_cleaned.csv"""
+    base_name = os.path.splitext(input_file)[0]
+    # Usuń '_detailed' z nazwy jeśli istnieje
+    base_name = base_name.replace('_detailed', '')
+    return f"{base_name}_cleaned.csv"
+
+
+def near_duplicates_report_file(output_file):
+    """Raport scalonych prawie-duplikatów ląduje obok wyniku: x_cleaned.csv -> x_cleaned_near_duplicates.csv"""
+    return f"{os.path.splitext(output_file)[0]}_near_duplicates.csv"
+
+
+def stats_dir_for(output_file):
+    """Szkice statystyk leżą obok wyniku: data/x_cleaned.csv -> data/stats/{miasto}_{tydzień}.json"""
+    return os.path.join(os.path.dirname(os.path.abspath(output_file)), 'stats')
+
+
+def write_listing_stats(stats, input_file, output_file, seen_at=None):
+    """Zapisuje szkice (histogramy/HLL) snapshotu i wypisuje rozkłady bez sortowania kolumn."""
+    path = stats_file(city_from_file(input_file), snapshot_week(seen_at), stats_dir_for(output_file))
+    save_stats(stats, path)
+    summary = stats.summary((0.1, 0.5, 0.9))
+    print(f"\nRozkłady ze szkiców (histogramy/HLL, zapisano do: {path}):")
+    print(f"  - Unikalne URL: ~{summary['distinct_url']}, ulice: ~{summary['distinct_street']}, "
+          f"dzielnice: ~{summary['distinct_locality']}")
+    for column in QUANTILE_COLUMNS:
+        if summary[column]['count']:
+            print(f"  - {column}: p10 {summary[column]['q10']:,.0f}, mediana {summary[column]['q50']:,.0f}, "
+                  f"p90 {summary[column]['q90']:,.0f}")
+    return path
+
+
+def url_hashes(urls):
+    """64-bitowe hashe URL - w zbiorze widzianych trzymamy je zamiast pełnych napisów."""
+    return pd.util.hash_pandas_object(urls.astype('string').fillna(''), index=False).to_numpy()
+
+
+def clean_scraped_data(input_file, output_file=None, min_valid_fields=5, remove_price_ask=False,
+                       near_duplicate_threshold=None, write_stats=True, seen_at=None):
     """
     Czyści dane zeskrapowane z adresowo.pl.
     
@@ -11,6 +122,10 @@ def clean_scraped_data(input_file, output_file=None, min_valid_fields=5, remove_
         output_file (str): Ścieżka do pliku wyjściowego (domyślnie: {input}_cleaned.csv)
         min_valid_fields (int): Minimalna liczba niepustych pól wymagana do zachowania wiersza
         remove_price_ask (bool): Czy usuwać wiersze z "zapytaj o cenę"
+        near_duplicate_threshold (float): Próg podobieństwa opisów (0-1) dla usuwania
+            prawie-duplikatów (MinHash/LSH); None - bez tego etapu
+        write_stats (bool): Czy zapisać szkice rozkładów (sketches.ListingStats) obok wyniku
+        seen_at (str): Znacznik czasu snapshotu (ISO) - wyznacza tydzień szkicu (domyślnie: teraz)
     """
     print(f"Wczytuję dane z: {input_file}")
     
@@ -59,6 +174,24 @@ def clean_scraped_data(input_file, output_file=None, min_valid_fields=5, remove_
     if removed_duplicates > 0:
         print(f"Usunięto {removed_duplicates} duplikatów")
     
+    # Prawie-duplikaty: to samo mieszkanie wystawione pod różnymi URL z prawie identycznym opisem
+    near_duplicates = None
+    if near_duplicate_threshold is not None:
+        df_cleaned, near_duplicates = NearDuplicateIndex(near_duplicate_threshold).filter(df_cleaned)
+        if len(near_duplicates) > 0:
+            print(f"Usunięto {len(near_duplicates)} prawie-duplikatów (podobieństwo opisu >= {near_duplicate_threshold})")
+    
+    # Jednorazowa konwersja kolumn liczbowych - kolejne etapy nie muszą parsować tekstu
+    df_cleaned, parse_failures = normalize_numeric_columns(df_cleaned)
+    df_cleaned.attrs['parse_failures'] = parse_failures
+    failed_columns = {column: count for column, count in parse_failures.items() if count}
+    if failed_columns:
+        print("\nNie udało się sparsować wartości liczbowych:")
+        for column, count in failed_columns.items():
+            print(f"  - {column}: {count}")
+    else:
+        print("\nWszystkie wartości liczbowe sparsowano poprawnie")
+    
     final_count = len(df_cleaned)
     print(f"\nKońcowa liczba wierszy: {final_count}")
     print(f"Usunięto łącznie: {initial_count - final_count} wierszy ({(initial_count - final_count) / initial_count * 100:.1f}%)")
@@ -72,17 +205,154 @@ def clean_scraped_data(input_file, output_file=None, min_valid_fields=5, remove_
     
     # Zapisz wyczyszczone dane
     if output_file is None:
-        # Generuj nazwę pliku wyjściowego w tym samym katalogu co input
-        base_name = os.path.splitext(input_file)[0]
-        # Usuń '_detailed' z nazwy jeśli istnieje
-        base_name = base_name.replace('_detailed', '')
-        output_file = f"{base_name}_cleaned.csv"
+        output_file = default_output_file(input_file)
     
     df_cleaned.to_csv(output_file, index=False)
     print(f"\nWyczyszczone dane zapisano do: {output_file}")
+    if near_duplicates is not None:
+        report_file = near_duplicates_report_file(output_file)
+        near_duplicates.to_csv(report_file, index=False)
+        print(f"Raport prawie-duplikatów zapisano do: {report_file}")
+    if write_stats:
+        write_listing_stats(ListingStats().update(df_cleaned), input_file, output_file, seen_at)
     
     return df_cleaned
 
+def clean_scraped_data_chunked(input_file, output_file=None, min_valid_fields=5, remove_price_ask=False,
+                               chunksize=50000, near_duplicate_threshold=None, write_stats=True, seen_at=None):
+    """
+    Czyści dane strumieniowo, kawałek po kawałku, przy stałym zużyciu pamięci.
+    Daje ten sam wynik co clean_scraped_data, ale nie wczytuje całego pliku.
+    
+    Duplikaty URL są wykrywane między kawałkami przy pomocy zbioru 64-bitowych
+    hashy URL (zostaje pierwsze wystąpienie, jak w drop_duplicates(keep='first')).
+    Statystyki przed i po czyszczeniu są sumowane kawałek po kawałku, a wynik
+    dopisywany do pliku wyjściowego na bieżąco.
+    
+    Args:
+        input_file (str): Ścieżka do pliku CSV z surowymi danymi
+        output_file (str): Ścieżka do pliku wyjściowego (domyślnie: {input}_cleaned.csv)
+        min_valid_fields (int): Minimalna liczba niepustych pól wymagana do zachowania wiersza
+        remove_price_ask (bool): Czy usuwać wiersze z "zapytaj o cenę"
+        chunksize (int): Liczba wierszy w jednym kawałku
+        near_duplicate_threshold (float): Próg podobieństwa opisów dla usuwania
+            prawie-duplikatów; indeks LSH jest wspólny dla wszystkich kawałków
+        write_stats (bool): Czy zapisać szkice rozkładów, aktualizowane kawałek po kawałku
+        seen_at (str): Znacznik czasu snapshotu (ISO) - wyznacza tydzień szkicu (domyślnie: teraz)
+    
+    Returns:
+        dict: Podsumowanie (liczby wierszy, braki przed/po, błędy parsowania)
+    """
+    print(f"Wczytuję dane strumieniowo z: {input_file} (po {chunksize} wierszy)")
+    if output_file is None:
+        output_file = default_output_file(input_file)
+    
+    counts = Counter()
+    nan_before = Counter()
+    nan_after = Counter()
+    parse_failures = Counter()
+    seen_urls = set()
+    stats = ListingStats() if write_stats else None
+    header_written = False
+    near_duplicate_index = NearDuplicateIndex(near_duplicate_threshold) if near_duplicate_threshold is not None else None
+    report_file = near_duplicates_report_file(output_file) if near_duplicate_index else None
+    if report_file:
+        pd.DataFrame(columns=['kept', 'removed', 'similarity']).to_csv(report_file, index=False)
+    
+    for chunk in pd.read_csv(input_file, chunksize=chunksize):
+        counts['initial'] += len(chunk)
+        counts['empty_rows'] += int(chunk.isna().all(axis=1).sum())
+        for column in ['locality', 'street', 'rooms', 'area', 'price_total_zl']:
+            nan_before[column] += int(chunk[column].isna().sum())
+        
+        # Wiersze z małą liczbą niepustych pól
+        before = len(chunk)
+        chunk = chunk[chunk.notna().sum(axis=1) >= min_valid_fields]
+        counts['removed_sparse'] += before - len(chunk)
+        
+        # Wiersze bez lokalizacji
+        before = len(chunk)
+        chunk = chunk.dropna(subset=['locality', 'street'])
+        counts['removed_no_location'] += before - len(chunk)
+        
+        if remove_price_ask:
+            before = len(chunk)
+            chunk = chunk[~chunk['price_total_zl'].astype(str).str.contains('zapytaj', case=False, na=False)]
+            counts['removed_ask_price'] += before - len(chunk)
+        
+        # Duplikaty URL w obrębie kawałka i względem poprzednich kawałków
+        hashes = url_hashes(chunk['url'])
+        unseen = np.fromiter((h not in seen_urls for h in hashes), dtype=bool, count=len(hashes))
+        keep = unseen & ~pd.Series(hashes).duplicated().to_numpy()
+        seen_urls.update(hashes[keep].tolist())
+        counts['removed_duplicates'] += int((~keep).sum())
+        chunk = chunk[keep]
+        
+        if near_duplicate_index is not None:
+            chunk, near_duplicates = near_duplicate_index.filter(chunk)
+            counts['removed_near_duplicates'] += len(near_duplicates)
+            near_duplicates.to_csv(report_file, mode='a', header=False, index=False)
+        
+        chunk, chunk_failures = normalize_numeric_columns(chunk.copy())
+        parse_failures.update(chunk_failures)
+        for column in ['rooms', 'area', 'price_total_zl', 'price_sqm_zl']:
+            nan_after[column] += int(chunk[column].isna().sum())
+        counts['final'] += len(chunk)
+        if stats is not None:
+            stats.update(chunk)
+        
+        if len(chunk) or not header_written:
+            chunk.to_csv(output_file, mode='a' if header_written else 'w', header=not header_written, index=False)
+            header_written = True
+    
+    initial_count, final_count = counts['initial'], counts['final']
+    print(f"Początkowa liczba wierszy: {initial_count}")
+    
+    print("\nStatystyki przed czyszczeniem:")
+    print(f"  - Całkowicie puste wiersze: {counts['empty_rows']}")
+    for column in ['locality', 'street', 'rooms', 'area', 'price_total_zl']:
+        print(f"  - Wiersze z NaN w {column}: {nan_before[column]}")
+    
+    print(f"\nUsunięto {counts['removed_sparse']} wierszy z mniej niż {min_valid_fields} niepustych pól")
+    if counts['removed_no_location'] > 0:
+        print(f"Usunięto {counts['removed_no_location']} wierszy bez lokalizacji (locality/street)")
+    if counts['removed_ask_price'] > 0:
+        print(f"Usunięto {counts['removed_ask_price']} wierszy z 'zapytaj o cenę'")
+    if counts['removed_duplicates'] > 0:
+        print(f"Usunięto {counts['removed_duplicates']} duplikatów")
+    if counts['removed_near_duplicates'] > 0:
+        print(f"Usunięto {counts['removed_near_duplicates']} prawie-duplikatów (podobieństwo opisu >= {near_duplicate_threshold})")
+    
+    failed_columns = {column: count for column, count in parse_failures.items() if count}
+    if failed_columns:
+        print("\nNie udało się sparsować wartości liczbowych:")
+        for column, count in failed_columns.items():
+            print(f"  - {column}: {count}")
+    else:
+        print("\nWszystkie wartości liczbowe sparsowano poprawnie")
+    
+    print(f"\nKońcowa liczba wierszy: {final_count}")
+    if initial_count:
+        print(f"Usunięto łącznie: {initial_count - final_count} wierszy ({(initial_count - final_count) / initial_count * 100:.1f}%)")
+    
+    print("\nStatystyki po czyszczeniu:")
+    for column in ['rooms', 'area', 'price_total_zl', 'price_sqm_zl']:
+        print(f"  - Wiersze z NaN w {column}: {nan_after[column]}")
+    
+    print(f"\nWyczyszczone dane zapisano do: {output_file}")
+    if report_file:
+        print(f"Raport prawie-duplikatów zapisano do: {report_file}")
+    stats_path = write_listing_stats(stats, input_file, output_file, seen_at) if stats is not None else None
+    
+    return {
+        **counts,
+        'nan_before': dict(nan_before),
+        'nan_after': dict(nan_after),
+        'parse_failures': dict(parse_failures),
+        'output_file': output_file,
+        'stats_file': stats_path,
+    }
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description='Skrypt do czyszczenia danych zeskrapowanych z adresowo.pl',
@@ -100,6 +370,15 @@ Przykłady użycia:
   
   # Wyczyść z własną nazwą pliku wyjściowego
   python clean_data.py ogloszenia_warszawa.csv --output warszawa_clean.csv
+  
+  # Usuń też prawie-duplikaty (ten sam opis pod różnymi URL), próg podobieństwa 0.85
+  python clean_data.py ogloszenia_warszawa.csv --near-duplicates 0.85
+  
+  # Wyczyść duży plik strumieniowo, po 100 000 wierszy
+  python clean_data.py historia_snapshotow.csv --chunksize 100000
+  
+  # Szkice rozkładów trafiają do data/stats/{miasto}_{tydzień}.json; snapshot z innego dnia:
+  python clean_data.py ogloszenia_lodz_detailed.csv --seen-at 2025-10-06T08:00:00
         '''
     )
     
@@ -129,6 +408,36 @@ Przykłady użycia:
         help='Usuń wiersze z "zapytaj o cenę" w kolumnie price_total_zl'
     )
     
+    parser.add_argument(
+        '--near-duplicates',
+        type=float,
+        nargs='?',
+        const=DEFAULT_THRESHOLD,
+        default=None,
+        metavar='PRÓG',
+        help=f'Usuń prawie-duplikaty o podobnym opisie (MinHash/LSH, próg Jaccarda, domyślnie: {DEFAULT_THRESHOLD})'
+    )
+    
+    parser.add_argument(
+        '--chunksize',
+        type=int,
+        default=None,
+        help='Czyść strumieniowo po tyle wierszy naraz (stała pamięć). Domyślnie: cały plik naraz'
+    )
+    
+    parser.add_argument(
+        '--no-stats',
+        action='store_true',
+        help='Nie zapisuj szkiców rozkładów (histogramy/HyperLogLog) obok wyniku'
+    )
+    
+    parser.add_argument(
+        '--seen-at',
+        type=str,
+        default=None,
+        help='Znacznik czasu snapshotu (ISO), wyznacza tydzień szkiców. Domyślnie: teraz'
+    )
+    
     args = parser.parse_args()
     
     # Sprawdź czy plik istnieje
@@ -136,10 +445,25 @@ Przykłady użycia:
         print(f"Błąd: Plik {args.input_file} nie istnieje!")
         exit(1)
     
-    clean_scraped_data(
-        args.input_file,
-        args.output,
-        args.min_fields,
-        args.remove_price_ask
-    )
+    if args.chunksize:
+        clean_scraped_data_chunked(
+            args.input_file,
+            args.output,
+            args.min_fields,
+            args.remove_price_ask,
+            args.chunksize,
+            args.near_duplicates,
+            not args.no_stats,
+            args.seen_at
+        )
+    else:
+        clean_scraped_data(
+            args.input_file,
+            args.output,
+            args.min_fields,
+            args.remove_price_ask,
+            args.near_duplicates,
+            not args.no_stats,
+            args.seen_at
+        )
 
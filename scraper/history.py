@@ -0,0 +1,312 @@
+import pandas as pd
+import argparse
+import os
+import sqlite3
+from datetime import datetime
+
+# Domyślna baza historii - obok plików CSV, które co tydzień są nadpisywane
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'historia_ogloszen.sqlite')
+
+# Kolumny z wyczyszczonego snapshotu, które trzymamy w historii
+SNAPSHOT_COLUMNS = ['url', 'locality', 'street', 'rooms', 'area', 'price_total_zl', 'price_sqm_zl']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    url TEXT PRIMARY KEY,
+    city TEXT NOT NULL,
+    locality TEXT,
+    street TEXT,
+    rooms INTEGER,
+    area REAL,
+    price_total_zl REAL,
+    price_sqm_zl REAL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    active INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_listings_city_active ON listings(city, active);
+CREATE INDEX IF NOT EXISTS idx_listings_last_seen ON listings(last_seen);
+
+-- Zdarzenia cenowe: pierwsza cena (old_price NULL) i każda późniejsza zmiana
+CREATE TABLE IF NOT EXISTS price_events (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL REFERENCES listings(url),
+    seen_at TEXT NOT NULL,
+    old_price REAL,
+    new_price REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_price_events_url ON price_events(url, seen_at);
+CREATE INDEX IF NOT EXISTS idx_price_events_seen_at ON price_events(seen_at);
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    city TEXT NOT NULL,
+    source_file TEXT NOT NULL,
+    seen_at TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    new_listings INTEGER NOT NULL,
+    price_changes INTEGER NOT NULL,
+    gone_listings INTEGER NOT NULL
+);
+"""
+
+
+def connect(db_path=DEFAULT_DB_PATH):
+    """Otwiera bazę historii i tworzy tabele, jeśli ich nie ma."""
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def city_from_file(input_file):
+    """ogloszenia_warszawa_cleaned.csv -> warszawa"""
+    parts = os.path.splitext(os.path.basename(input_file))[0].split('_')
+    return next((part for part in parts if part not in {'ogloszenia', 'detailed', 'cleaned'}), parts[0])
+
+
+def snapshot_week(seen_at=None):
+    """Znacznik czasu ISO -> tydzień ISO, np. '2025-W41'."""
+    moment = datetime.fromisoformat(seen_at) if seen_at else datetime.now()
+    year, week, _ = moment.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _snapshot_rows(df):
+    """Wiersze snapshotu jako krotki dla executemany (NaN -> NULL)."""
+    df = df.reindex(columns=SNAPSHOT_COLUMNS).dropna(subset=['url'])
+    df = df.astype(object).where(df.notna(), None)
+    return df.itertuples(index=False, name=None)
+
+
+def update_history(input_file, db_path=DEFAULT_DB_PATH, seen_at=None, city=None, chunksize=50000):
+    """
+    Dopisuje wyczyszczony snapshot do historii ogłoszeń.
+
+    Snapshot trafia najpierw do tymczasowej tabeli, a potem jest porównywany
+    z historią zapytaniami po kluczu `url` (upsert), więc koszt zależy od
+    wielkości snapshotu, a nie od całej historii. Ponowne wczytanie tego samego
+    snapshotu nie tworzy nowych zdarzeń cenowych.
+
+    Args:
+        input_file (str): Ścieżka do pliku *_cleaned.csv
+        db_path (str): Ścieżka do bazy SQLite z historią
+        seen_at (str): Znacznik czasu snapshotu (ISO, domyślnie: teraz)
+        city (str): Miasto (domyślnie: z nazwy pliku)
+        chunksize (int): Liczba wierszy czytanych naraz z pliku
+
+    Returns:
+        dict: Liczby wierszy, nowych ogłoszeń, zmian cen i zniknięć
+    """
+    seen_at = seen_at or datetime.now().isoformat(timespec='seconds')
+    city = city or city_from_file(input_file)
+
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.execute("DROP TABLE IF EXISTS temp.snapshot")
+            conn.execute(
+                "CREATE TEMP TABLE snapshot ("
+                "url TEXT PRIMARY KEY ON CONFLICT IGNORE, locality TEXT, street TEXT, "
+                "rooms INTEGER, area REAL, price_total_zl REAL, price_sqm_zl REAL)"
+            )
+            for chunk in pd.read_csv(input_file, chunksize=chunksize):
+                conn.executemany("INSERT INTO snapshot VALUES (?, ?, ?, ?, ?, ?, ?)", _snapshot_rows(chunk))
+            rows = conn.execute("SELECT COUNT(*) FROM snapshot").fetchone()[0]
+
+            new_listings = conn.execute(
+                "SELECT COUNT(*) FROM snapshot s WHERE NOT EXISTS (SELECT 1 FROM listings l WHERE l.url = s.url)"
+            ).fetchone()[0]
+
+            # Zdarzenia cenowe liczymy przed upsertem, dopóki listings ma poprzednie ceny.
+            # Starsze snapshoty (seen_at < last_seen) nie nadpisują nowszych cen.
+            conn.execute(
+                """
+                INSERT INTO price_events (url, seen_at, old_price, new_price)
+                SELECT s.url, ?, NULL, s.price_total_zl
+                FROM snapshot s
+                WHERE s.price_total_zl IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM listings l WHERE l.url = s.url)
+                """,
+                (seen_at,),
+            )
+            price_changes = conn.execute(
+                """
+                INSERT INTO price_events (url, seen_at, old_price, new_price)
+                SELECT s.url, ?, l.price_total_zl, s.price_total_zl
+                FROM snapshot s JOIN listings l ON l.url = s.url
+                WHERE s.price_total_zl IS NOT NULL
+                  AND l.price_total_zl IS NOT s.price_total_zl
+                  AND l.last_seen <= ?
+                """,
+                (seen_at, seen_at),
+            ).rowcount
+
+            conn.execute(
+                """
+                INSERT INTO listings (url, city, locality, street, rooms, area, price_total_zl, price_sqm_zl,
+                                      first_seen, last_seen, active)
+                SELECT url, ?, locality, street, rooms, area, price_total_zl, price_sqm_zl, ?, ?, 1
+                FROM snapshot WHERE true
+                ON CONFLICT(url) DO UPDATE SET
+                    locality = excluded.locality,
+                    street = excluded.street,
+                    rooms = excluded.rooms,
+                    area = excluded.area,
+                    price_total_zl = COALESCE(excluded.price_total_zl, listings.price_total_zl),
+                    price_sqm_zl = COALESCE(excluded.price_sqm_zl, listings.price_sqm_zl),
+                    last_seen = excluded.last_seen,
+                    active = 1
+                WHERE excluded.last_seen >= listings.last_seen
+                """,
+                (city, seen_at, seen_at),
+            )
+            conn.execute(
+                "UPDATE listings SET first_seen = ? WHERE first_seen > ? AND url IN (SELECT url FROM snapshot)",
+                (seen_at, seen_at),
+            )
+
+            # Ogłoszenia z tego miasta, których nie ma w nowszym snapshocie, oznaczamy jako nieaktywne
+            gone_listings = conn.execute(
+                """
+                UPDATE listings SET active = 0
+                WHERE city = ? AND active = 1 AND last_seen < ?
+                  AND url NOT IN (SELECT url FROM snapshot)
+                """,
+                (city, seen_at),
+            ).rowcount
+
+            conn.execute(
+                "INSERT INTO snapshots (city, source_file, seen_at, rows, new_listings, price_changes, gone_listings) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (city, os.path.basename(input_file), seen_at, rows, new_listings, price_changes, gone_listings),
+            )
+            conn.execute("DROP TABLE temp.snapshot")
+    finally:
+        conn.close()
+
+    summary = {
+        'city': city,
+        'seen_at': seen_at,
+        'rows': rows,
+        'new_listings': new_listings,
+        'price_changes': price_changes,
+        'gone_listings': gone_listings,
+    }
+    print(f"Historia ({city}, {seen_at}): {rows} wierszy, {new_listings} nowych, "
+          f"{price_changes} zmian ceny, {gone_listings} zniknęło")
+    return summary
+
+
+def price_drops(db_path=DEFAULT_DB_PATH, since=None, city=None, min_drop_pct=0.0):
+    """
+    Obniżki cen zarejestrowane od `since` (indeks po seen_at).
+
+    Returns:
+        pd.DataFrame: url, miasto, data, stara i nowa cena, spadek w %
+    """
+    query = """
+        SELECT e.url, l.city, l.locality, l.street, e.seen_at, e.old_price, e.new_price,
+               100.0 * (e.old_price - e.new_price) / e.old_price AS drop_pct
+        FROM price_events e JOIN listings l ON l.url = e.url
+        WHERE e.old_price IS NOT NULL AND e.new_price < e.old_price
+          AND e.seen_at >= ?
+          AND (? IS NULL OR l.city = ?)
+          AND 100.0 * (e.old_price - e.new_price) / e.old_price >= ?
+        ORDER BY drop_pct DESC
+    """
+    conn = connect(db_path)
+    try:
+        return pd.read_sql_query(query, conn, params=(since or '', city, city, min_drop_pct))
+    finally:
+        conn.close()
+
+
+def price_history(urls, db_path=DEFAULT_DB_PATH):
+    """Szereg czasowy cen dla podanych ogłoszeń (indeks po url)."""
+    urls = list(urls)
+    conn = connect(db_path)
+    try:
+        frames = []
+        # SQLite ogranicza liczbę parametrów w jednym zapytaniu
+        for start in range(0, len(urls), 500):
+            batch = urls[start:start + 500]
+            placeholders = ', '.join('?' * len(batch))
+            frames.append(pd.read_sql_query(
+                f"SELECT url, seen_at, old_price, new_price FROM price_events "
+                f"WHERE url IN ({placeholders}) ORDER BY url, seen_at",
+                conn, params=batch,
+            ))
+    finally:
+        conn.close()
+    if not frames:
+        return pd.DataFrame(columns=['url', 'seen_at', 'old_price', 'new_price'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def listing_features(db_path=DEFAULT_DB_PATH, as_of=None):
+    """
+    Cechy czasowe ogłoszeń dla modelu: dni na rynku, liczba zmian ceny
+    i łączna zmiana ceny względem pierwszej ceny.
+
+    Returns:
+        pd.DataFrame: indeks url, kolumny days_on_market, price_changes, price_change_pct
+    """
+    as_of = as_of or datetime.now().isoformat(timespec='seconds')
+    query = """
+        SELECT l.url,
+               julianday(MIN(l.last_seen, ?)) - julianday(l.first_seen) AS days_on_market,
+               (SELECT COUNT(*) FROM price_events e WHERE e.url = l.url AND e.old_price IS NOT NULL) AS price_changes,
+               (SELECT e.new_price FROM price_events e WHERE e.url = l.url ORDER BY e.seen_at LIMIT 1) AS first_price,
+               l.price_total_zl AS last_price
+        FROM listings l
+        WHERE l.first_seen <= ?
+    """
+    conn = connect(db_path)
+    try:
+        df = pd.read_sql_query(query, conn, params=(as_of, as_of), index_col='url')
+    finally:
+        conn.close()
+    df['price_change_pct'] = 100.0 * (df['last_price'] - df['first_price']) / df['first_price']
+    return df[['days_on_market', 'price_changes', 'price_change_pct']]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Historia ogłoszeń między snapshotami (SQLite, klucz: url)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Przykłady użycia:
+  # Dopisz wyczyszczone snapshoty do historii
+  python history.py update data/ogloszenia_warszawa_cleaned.csv data/ogloszenia_lodz_cleaned.csv
+
+  # Obniżki cen w Warszawie od 1 października, co najmniej 5%
+  python history.py drops --city warszawa --since 2025-10-01 --min-drop 5
+        """
+    )
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help=f'Ścieżka do bazy historii (domyślnie: {DEFAULT_DB_PATH})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    update_parser = subparsers.add_parser('update', help='Dopisz wyczyszczone snapshoty do historii')
+    update_parser.add_argument('input_files', nargs='+', help='Pliki *_cleaned.csv')
+    update_parser.add_argument('--seen-at', default=None, help='Znacznik czasu snapshotu (ISO, domyślnie: teraz)')
+
+    drops_parser = subparsers.add_parser('drops', help='Pokaż obniżki cen')
+    drops_parser.add_argument('--city', default=None, help='Miasto (np. warszawa)')
+    drops_parser.add_argument('--since', default=None, help='Od daty (ISO, np. 2025-10-01)')
+    drops_parser.add_argument('--min-drop', type=float, default=0.0, help='Minimalny spadek ceny w procentach')
+
+    args = parser.parse_args()
+
+    if args.command == 'update':
+        for input_file in args.input_files:
+            if not os.path.exists(input_file):
+                print(f"Błąd: Plik {input_file} nie istnieje!")
+                exit(1)
+        for input_file in args.input_files:
+            update_history(input_file, args.db, args.seen_at)
+    else:
+        drops = price_drops(args.db, args.since, args.city, args.min_drop)
+        if drops.empty:
+            print("Brak obniżek cen")
+        else:
+            print(drops.to_string(index=False))
@@ -0,0 +1,288 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+import sqlite3
+from history import city_from_file, snapshot_week
+
+# Kostka statystyk rynku - obok plików CSV i historii ogłoszeń
+DEFAULT_CUBE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'market_stats.sqlite')
+
+# Wymiary kostki: miasto x dzielnica x liczba pokoi x tydzień snapshotu
+DIMENSIONS = ['city', 'locality', 'rooms_bucket', 'week']
+ROOMS_BUCKETS = ['1', '2', '3', '4+']
+UNKNOWN_BUCKET = '?'
+
+# Stałe przedziały histogramów: histogramy z różnych komórek (dzielnic, tygodni)
+# można po prostu dodać, a kwantyle liczyć z histogramu po scaleniu.
+# Ceny w skali logarytmicznej - błąd względny kwantyla ~2%. Histogram ma
+# dodatkowo przedział niedomiaru (przed pierwszą krawędzią) i nadmiaru (od
+# ostatniej), żeby wartości spoza zakresu nie udawały skrajnych przedziałów.
+HISTOGRAM_EDGES = {
+    'price_sqm_zl': np.geomspace(2_000, 60_000, 97),
+    'price_total_zl': np.geomspace(100_000, 10_000_000, 97),
+    'area': np.linspace(10, 200, 77),
+}
+MEASURES = list(HISTOGRAM_EDGES)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cube (
+    city TEXT NOT NULL,
+    locality TEXT NOT NULL,
+    rooms_bucket TEXT NOT NULL,
+    week TEXT NOT NULL,
+    listings INTEGER NOT NULL,
+    price_sqm_zl_count INTEGER NOT NULL,
+    price_sqm_zl_sum REAL NOT NULL,
+    price_sqm_zl_hist BLOB NOT NULL,
+    price_total_zl_count INTEGER NOT NULL,
+    price_total_zl_sum REAL NOT NULL,
+    price_total_zl_hist BLOB NOT NULL,
+    area_count INTEGER NOT NULL,
+    area_sum REAL NOT NULL,
+    area_hist BLOB NOT NULL,
+    PRIMARY KEY (city, locality, rooms_bucket, week)
+);
+CREATE INDEX IF NOT EXISTS idx_cube_week ON cube(week);
+"""
+
+
+def connect(db_path=DEFAULT_CUBE_PATH):
+    """Otwiera kostkę i tworzy tabelę, jeśli jej nie ma."""
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def rooms_bucket(rooms):
+    """Liczba pokoi -> przedział kostki ('1', '2', '3', '4+', '?' dla braków)."""
+    rooms = pd.to_numeric(rooms, errors='coerce').astype(float)
+    buckets = pd.Series(UNKNOWN_BUCKET, index=rooms.index, dtype=object)
+    buckets[rooms >= 1] = rooms[rooms >= 1].clip(upper=4).astype(int).astype(str).replace('4', '4+')
+    return buckets
+
+
+def histogram(values, measure):
+    """
+    Liczności w stałych przedziałach miary.
+
+    Returns:
+        np.ndarray: len(edges) + 1 liczności: [niedomiar, przedziały HISTOGRAM_EDGES[measure]..., nadmiar]
+    """
+    edges = HISTOGRAM_EDGES[measure]
+    values = values[np.isfinite(values)]
+    # Indeks 0 - poniżej edges[0], len(edges) - od edges[-1] w górę
+    bins = np.searchsorted(edges, values, side='right')
+    return np.bincount(bins, minlength=len(edges) + 1).astype(np.int64)
+
+
+def out_of_range(hist):
+    """Liczba wartości poza zakresem przedziałów (niedomiar + nadmiar)."""
+    return int(hist[0] + hist[-1])
+
+
+def histogram_quantiles(hist, measure, quantiles):
+    """
+    Kwantyle z histogramu (interpolacja liniowa wewnątrz przedziału).
+
+    Args:
+        hist (np.ndarray): Wynik histogram() dla miary (z niedomiarem i nadmiarem)
+        measure (str): Miara
+        quantiles (list): Kwantyle z przedziału [0, 1]
+
+    Returns:
+        list: Wartości kwantyli (NaN dla pustego histogramu i kwantyli, które
+            wypadają poza zakres przedziałów - ich wartości nie znamy)
+    """
+    edges = HISTOGRAM_EDGES[measure]
+    total = hist.sum()
+    if total == 0:
+        return [np.nan] * len(quantiles)
+    cumulative = np.cumsum(hist)
+    values = []
+    for q in quantiles:
+        target = q * total
+        i = min(int(np.searchsorted(cumulative, target, side='left')), len(hist) - 1)
+        if i == 0 or i == len(hist) - 1:
+            values.append(np.nan)
+            continue
+        before = cumulative[i - 1]
+        fraction = (target - before) / hist[i] if hist[i] else 0.0
+        values.append(float(edges[i - 1] + fraction * (edges[i] - edges[i - 1])))
+    return values
+
+
+def aggregate_snapshot(df, city, week):
+    """
+    Agreguje wyczyszczony snapshot do komórek kostki.
+
+    Returns:
+        list: Krotki wierszy tabeli cube
+    """
+    df = df.assign(
+        locality=df['locality'].fillna('').astype(str),
+        rooms_bucket=rooms_bucket(df['rooms']) if 'rooms' in df.columns else UNKNOWN_BUCKET,
+    )
+    for measure in MEASURES:
+        df[measure] = pd.to_numeric(df[measure], errors='coerce') if measure in df.columns else np.nan
+
+    rows = []
+    for (locality, bucket), cell in df.groupby(['locality', 'rooms_bucket'], sort=False):
+        row = [city, locality, bucket, week, len(cell)]
+        for measure in MEASURES:
+            values = cell[measure].to_numpy(dtype=float)
+            valid = values[np.isfinite(values)]
+            row += [len(valid), float(valid.sum()), histogram(valid, measure).astype(np.int32).tobytes()]
+        rows.append(tuple(row))
+    return rows
+
+
+def update_cube(input_file, db_path=DEFAULT_CUBE_PATH, seen_at=None, city=None):
+    """
+    Materializuje komórki kostki dla jednego wyczyszczonego snapshotu.
+
+    Komórki (miasto, tydzień) są zastępowane w całości, więc ponowne
+    uruchomienie po clean_data.py w tym samym tygodniu nie dubluje danych,
+    a poprzednie tygodnie zostają.
+
+    Args:
+        input_file (str): Ścieżka do pliku *_cleaned.csv
+        db_path (str): Ścieżka do bazy z kostką
+        seen_at (str): Znacznik czasu snapshotu (ISO, domyślnie: teraz)
+        city (str): Miasto (domyślnie: z nazwy pliku)
+
+    Returns:
+        dict: Miasto, tydzień, liczba ogłoszeń i komórek
+    """
+    city = city or city_from_file(input_file)
+    week = snapshot_week(seen_at)
+    df = pd.read_csv(input_file)
+    rows = aggregate_snapshot(df, city, week)
+
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM cube WHERE city = ? AND week = ?", (city, week))
+            conn.executemany(f"INSERT INTO cube VALUES ({', '.join('?' * 14)})", rows)
+    finally:
+        conn.close()
+
+    print(f"Kostka ({city}, {week}): {len(df)} ogłoszeń w {len(rows)} komórkach")
+    return {'city': city, 'week': week, 'listings': len(df), 'cells': len(rows)}
+
+
+def load_cube(db_path=DEFAULT_CUBE_PATH, city=None, weeks=None):
+    """
+    Wczytuje komórki kostki (bez wierszy ogłoszeń).
+
+    Args:
+        db_path (str): Ścieżka do bazy z kostką
+        city (str): Tylko to miasto (domyślnie: wszystkie)
+        weeks (list): Tylko te tygodnie (domyślnie: wszystkie)
+
+    Returns:
+        pd.DataFrame: Wymiary, liczności, sumy i histogramy (np.ndarray) miar
+    """
+    query = "SELECT * FROM cube WHERE (? IS NULL OR city = ?)"
+    params = [city, city]
+    if weeks:
+        query += f" AND week IN ({', '.join('?' * len(weeks))})"
+        params += list(weeks)
+    conn = connect(db_path)
+    try:
+        cube = pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+    for measure in MEASURES:
+        cube[f'{measure}_hist'] = [_with_range_bins(np.frombuffer(blob, dtype=np.int32).astype(np.int64), measure)
+                                  for blob in cube[f'{measure}_hist']]
+    return cube
+
+
+def _with_range_bins(hist, measure):
+    # Komórki zapisane przed dodaniem niedomiaru/nadmiaru: puste przedziały zakresu
+    if len(hist) == len(HISTOGRAM_EDGES[measure]) - 1:
+        return np.concatenate([[0], hist, [0]])
+    return hist
+
+
+def latest_weeks(cube):
+    """Najnowszy tydzień każdego miasta - aktualny stan rynku bez liczenia ogłoszeń kilka razy."""
+    latest = cube.groupby('city')['week'].transform('max')
+    return cube[cube['week'] == latest]
+
+
+def rollup(cube, by, quantiles=(0.25, 0.5, 0.75)):
+    """
+    Zwija kostkę do wybranych wymiarów: sumuje liczności, sumy i histogramy,
+    a potem liczy średnie i kwantyle ze scalonych histogramów.
+
+    Args:
+        cube (pd.DataFrame): Wynik load_cube
+        by (list): Wymiary wyniku, np. ['city', 'locality']
+        quantiles (tuple): Kwantyle do policzenia dla każdej miary
+
+    Returns:
+        pd.DataFrame: Jeden wiersz na grupę: listings, {miara}_mean, {miara}_q{kwantyl},
+            {miara}_out_of_range (wartości poza przedziałami histogramu), {miara}_hist
+    """
+    records = []
+    for key, group in cube.groupby(by, sort=False):
+        record = dict(zip(by, key if isinstance(key, tuple) else (key,)))
+        record['listings'] = int(group['listings'].sum())
+        for measure in MEASURES:
+            count = group[f'{measure}_count'].sum()
+            hist = np.sum(np.stack(group[f'{measure}_hist'].to_list()), axis=0)
+            record[f'{measure}_count'] = int(count)
+            record[f'{measure}_mean'] = group[f'{measure}_sum'].sum() / count if count else np.nan
+            record[f'{measure}_out_of_range'] = out_of_range(hist)
+            for q, value in zip(quantiles, histogram_quantiles(hist, measure, quantiles)):
+                record[f'{measure}_q{int(q * 100)}'] = value
+            record[f'{measure}_hist'] = hist
+        records.append(record)
+    return pd.DataFrame(records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Kostka statystyk rynku: miasto x dzielnica x pokoje x tydzień snapshotu',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Przykłady użycia:
+  # Zmaterializuj kostkę po clean_data.py
+  python market_stats.py update data/ogloszenia_warszawa_cleaned.csv data/ogloszenia_lodz_cleaned.csv
+
+  # Ranking dzielnic Łodzi wg mediany ceny za m² (ostatni tydzień)
+  python market_stats.py ranking --city lodz
+        """
+    )
+    parser.add_argument('--db', default=DEFAULT_CUBE_PATH, help=f'Ścieżka do kostki (domyślnie: {DEFAULT_CUBE_PATH})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    update_parser = subparsers.add_parser('update', help='Dodaj wyczyszczone snapshoty do kostki')
+    update_parser.add_argument('input_files', nargs='+', help='Pliki *_cleaned.csv')
+    update_parser.add_argument('--seen-at', default=None, help='Znacznik czasu snapshotu (ISO, domyślnie: teraz)')
+
+    ranking_parser = subparsers.add_parser('ranking', help='Ranking dzielnic wg mediany ceny za m²')
+    ranking_parser.add_argument('--city', default=None, help='Miasto (np. lodz)')
+    ranking_parser.add_argument('--min-listings', type=int, default=5, help='Minimalna liczba ogłoszeń w dzielnicy')
+
+    args = parser.parse_args()
+
+    if args.command == 'update':
+        for input_file in args.input_files:
+            if not os.path.exists(input_file):
+                print(f"Błąd: Plik {input_file} nie istnieje!")
+                exit(1)
+        for input_file in args.input_files:
+            update_cube(input_file, args.db, args.seen_at)
+    else:
+        cube = latest_weeks(load_cube(args.db, args.city))
+        if cube.empty:
+            print("Kostka jest pusta - uruchom: python market_stats.py update ...")
+            exit(1)
+        ranking = rollup(cube, ['city', 'locality'])
+        ranking = ranking[ranking['price_sqm_zl_count'] >= args.min_listings]
+        ranking = ranking.sort_values('price_sqm_zl_q50', ascending=False)
+        columns = ['city', 'locality', 'listings', 'price_sqm_zl_q50', 'price_sqm_zl_mean', 'price_total_zl_q50']
+        print(ranking[columns].round(0).to_string(index=False))
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+import re
+
+# Domyślne parametry wykrywania prawie-duplikatów
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_NUM_PERM = 128
+DEFAULT_SHINGLE_SIZE = 5
+# Maksymalna względna różnica powierzchni dla tego samego mieszkania (opisy
+# deweloperskie bywają identyczne dla różnych lokali w tej samej inwestycji)
+DEFAULT_AREA_TOLERANCE = 0.03
+# Opisy krótsze niż tyle słów są zbyt ogólne ("Mieszkanie na sprzedaż"), nie porównujemy ich
+MIN_WORDS = 20
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def lsh_params(threshold, num_perm):
+    """
+    Dobiera liczbę pasm (bands) i wierszy w paśmie (rows) tak, żeby próg
+    LSH (1/bands)^(1/rows) był jak najbliżej zadanego progu podobieństwa.
+    """
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+
+def shingles(text, shingle_size=DEFAULT_SHINGLE_SIZE):
+    """Zbiór n-gramów słownych opisu (małe litery, bez interpunkcji)."""
+    words = WORD_PATTERN.findall(str(text).lower())
+    if len(words) < max(shingle_size, MIN_WORDS):
+        return []
+    return sorted({" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)})
+
+
+class NearDuplicateIndex:
+    """
+    Indeks MinHash + LSH do wykrywania prawie identycznych opisów ogłoszeń.
+
+    Każdy opis dostaje sygnaturę MinHash (num_perm minimów z niezależnych
+    funkcji hashujących po n-gramach słów), dzieloną na pasma. Opisy
+    trafiające do tego samego kubełka w którymkolwiek paśmie są kandydatami,
+    a o duplikacie decyduje podobieństwo Jaccarda oszacowane z sygnatur.
+    Koszt jest liniowy w liczbie opisów zamiast O(n²) porównań parami.
+
+    Para opisów jest duplikatem tylko, jeśli zgadza się też liczba pokoi,
+    a powierzchnie różnią się najwyżej o area_tolerance (gdy są znane) -
+    deweloperzy używają jednego opisu dla wielu mieszkań w inwestycji.
+
+    Indeks przechowuje tylko pierwsze wystąpienia (reprezentantów), więc
+    można go karmić kolejnymi kawałkami danych - wynik jest taki sam jak
+    dla całego pliku naraz.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM,
+                 shingle_size=DEFAULT_SHINGLE_SIZE, area_tolerance=DEFAULT_AREA_TOLERANCE, seed=42):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.area_tolerance = area_tolerance
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._buckets = [{} for _ in range(self.bands)]
+        self._signatures = []
+        self._keys = []
+        self._attributes = []
+
+    def signature(self, text):
+        """Sygnatura MinHash opisu albo None, jeśli opis jest za krótki."""
+        text_shingles = shingles(text, self.shingle_size)
+        if not text_shingles:
+            return None
+        hashes = pd.util.hash_array(np.asarray(text_shingles, dtype=object)) & MAX_HASH
+        # Mnożenie w uint64 przekręca się modulo 2^64 - tak samo jak w klasycznych implementacjach MinHash
+        permuted = (np.outer(hashes, self._a) + self._b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _same_flat(self, attributes, other):
+        (area, rooms), (other_area, other_rooms) = attributes, other
+        if pd.notna(rooms) and pd.notna(other_rooms) and rooms != other_rooms:
+            return False
+        if self.area_tolerance is not None and pd.notna(area) and pd.notna(other_area):
+            return abs(area - other_area) <= self.area_tolerance * max(area, other_area)
+        return True
+
+    def add(self, key, text, area=None, rooms=None):
+        """
+        Dodaje opis do indeksu albo zwraca jego duplikat.
+
+        Returns:
+            tuple: (klucz reprezentanta, podobieństwo) jeśli opis jest prawie
+            duplikatem wcześniejszego, inaczej None (opis zostaje reprezentantem)
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return None
+
+        band_keys = self._band_keys(signature)
+        candidates = {
+            candidate
+            for i, band_key in enumerate(band_keys)
+            for candidate in self._buckets[i].get(band_key, ())
+        }
+        best = None
+        for candidate in candidates:
+            if not self._same_flat((area, rooms), self._attributes[candidate]):
+                continue
+            similarity = float(np.mean(self._signatures[candidate] == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (candidate, similarity)
+        if best is not None:
+            return self._keys[best[0]], best[1]
+
+        position = len(self._signatures)
+        self._signatures.append(signature)
+        self._keys.append(key)
+        self._attributes.append((area, rooms))
+        for i, band_key in enumerate(band_keys):
+            self._buckets[i].setdefault(band_key, []).append(position)
+        return None
+
+    def filter(self, df, text_column='description_text', key_column='url'):
+        """
+        Usuwa z DataFrame prawie-duplikaty (zostaje pierwsze wystąpienie).
+
+        Returns:
+            tuple: (DataFrame bez duplikatów, DataFrame z raportem scalonych wierszy)
+        """
+        keep = np.ones(len(df), dtype=bool)
+        merged = []
+        keys = df[key_column].to_numpy() if key_column in df.columns else df.index.to_numpy()
+        texts = df[text_column].to_numpy() if text_column in df.columns else [None] * len(df)
+        areas = pd.to_numeric(df['area'], errors='coerce').to_numpy() if 'area' in df.columns else [None] * len(df)
+        rooms = pd.to_numeric(df['rooms'], errors='coerce').to_numpy() if 'rooms' in df.columns else [None] * len(df)
+        for i, (key, text) in enumerate(zip(keys, texts)):
+            if text is None or (isinstance(text, float) and np.isnan(text)):
+                continue
+            match = self.add(key, text, areas[i], rooms[i])
+            if match is not None:
+                keep[i] = False
+                merged.append({'kept': match[0], 'removed': key, 'similarity': round(match[1], 3)})
+        report = pd.DataFrame(merged, columns=['kept', 'removed', 'similarity'])
+        return df[keep], report
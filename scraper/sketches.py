@@ -0,0 +1,235 @@
+import pandas as pd
+import numpy as np
+import argparse
+import base64
+import glob
+import json
+import os
+from market_stats import MEASURES, histogram, histogram_quantiles
+
+# Szkice statystyk zapisywane obok danych: data/stats/{miasto}_{tydzień}.json
+DEFAULT_STATS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'stats')
+
+# HyperLogLog: 2^12 rejestrów (4 kB), błąd względny ~1.6%
+DEFAULT_HLL_PRECISION = 12
+
+# Miary z rozkładem (te same histogramy o stałych przedziałach co w kostce
+# market_stats.py) i kolumny z liczbą unikalnych wartości (HLL)
+QUANTILE_COLUMNS = MEASURES
+DISTINCT_COLUMNS = ['url', 'street', 'locality']
+
+
+def hash_values(values):
+    """64-bitowe hashe wartości (te same co przy deduplikacji URL w clean_data.py); braki pomijane."""
+    values = pd.Series(values).dropna().astype('string')
+    return pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+
+
+def _bit_length(words):
+    """Długość bitowa liczb uint64 (frexp jest dokładne dla połówek 32-bitowych)."""
+    high = (words >> np.uint64(32)).astype(np.float64)
+    low = (words & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+
+
+class HyperLogLog:
+    """
+    Liczba unikalnych wartości w stałej pamięci (2^p rejestrów po 1 bajcie).
+    Rejestr trzyma maksymalną pozycję pierwszej jedynki hashy, które do niego
+    trafiły; scalanie szkiców to maksimum rejestrów.
+    """
+
+    def __init__(self, precision=DEFAULT_HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if len(hashes):
+            p = np.uint64(self.precision)
+            index = (hashes >> (np.uint64(64) - p)).astype(np.int64)
+            rest = hashes << p
+            rho = np.minimum(64 - _bit_length(rest) + 1, 64 - self.precision + 1).astype(np.uint8)
+            np.maximum.at(self.registers, index, rho)
+        return self
+
+    def update(self, values):
+        return self.update_hashes(hash_values(values))
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError(f"Nie można scalić HyperLogLog o różnej precyzji ({self.precision} i {other.precision})")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # Mała liczba wartości: linear counting po pustych rejestrach
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+    def to_dict(self):
+        return {'precision': self.precision, 'registers': base64.b64encode(self.registers.tobytes()).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['precision'])
+        sketch.registers = np.frombuffer(base64.b64decode(data['registers']), dtype=np.uint8).copy()
+        return sketch
+
+
+class ListingStats:
+    """
+    Strumieniowe statystyki ogłoszeń: liczba wierszy, suma, liczność i
+    histogram (przedziały market_stats.HISTOGRAM_EDGES) każdej miary z
+    QUANTILE_COLUMNS oraz HyperLogLog kolumn z DISTINCT_COLUMNS.
+    Aktualizowane kawałek po kawałku, łączone między miastami i tygodniami
+    (histogramy i rejestry HLL po prostu się sumują / biorą maksimum).
+    """
+
+    def __init__(self, precision=DEFAULT_HLL_PRECISION):
+        self.rows = 0
+        self.sums = {column: 0.0 for column in QUANTILE_COLUMNS}
+        self.counts = {column: 0 for column in QUANTILE_COLUMNS}
+        self.histograms = {column: histogram(np.empty(0), column) for column in QUANTILE_COLUMNS}
+        self.distinct_sketches = {column: HyperLogLog(precision) for column in DISTINCT_COLUMNS}
+
+    def update(self, df):
+        """
+        Args:
+            df (pd.DataFrame): Kawałek wyczyszczonych danych
+        """
+        self.rows += len(df)
+        for column in QUANTILE_COLUMNS:
+            if column in df.columns:
+                values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+                values = values[np.isfinite(values)]
+                self.sums[column] += float(values.sum())
+                self.counts[column] += len(values)
+                self.histograms[column] += histogram(values, column)
+        for column, sketch in self.distinct_sketches.items():
+            if column in df.columns:
+                sketch.update(df[column])
+        return self
+
+    def merge(self, other):
+        self.rows += other.rows
+        for column in QUANTILE_COLUMNS:
+            self.sums[column] += other.sums[column]
+            self.counts[column] += other.counts[column]
+            self.histograms[column] += other.histograms[column]
+        for column in DISTINCT_COLUMNS:
+            self.distinct_sketches[column].merge(other.distinct_sketches[column])
+        return self
+
+    def summary(self, quantiles=(0.1, 0.25, 0.5, 0.75, 0.9)):
+        """
+        Returns:
+            dict: rows, dla każdej miary count/mean/kwantyle, dla kolumn DISTINCT_COLUMNS liczba unikalnych
+        """
+        result = {'rows': self.rows}
+        for column in QUANTILE_COLUMNS:
+            count = self.counts[column]
+            result[column] = {
+                'count': count,
+                'mean': self.sums[column] / count if count else None,
+                **{f'q{int(q * 100)}': value for q, value in
+                   zip(quantiles, histogram_quantiles(self.histograms[column], column, quantiles))},
+            }
+        for column, sketch in self.distinct_sketches.items():
+            result[f'distinct_{column}'] = sketch.count()
+        return result
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'sums': self.sums,
+            'counts': self.counts,
+            'histograms': {column: hist.tolist() for column, hist in self.histograms.items()},
+            'distinct': {column: sketch.to_dict() for column, sketch in self.distinct_sketches.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.rows = data['rows']
+        stats.sums = dict(data['sums'])
+        stats.counts = dict(data['counts'])
+        stats.histograms = {column: np.asarray(hist, dtype=np.int64) for column, hist in data['histograms'].items()}
+        stats.distinct_sketches = {column: HyperLogLog.from_dict(d) for column, d in data['distinct'].items()}
+        return stats
+
+
+def stats_file(city, week, stats_dir=DEFAULT_STATS_DIR):
+    return os.path.join(stats_dir, f"{city}_{week}.json")
+
+
+def save_stats(stats, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(stats.to_dict(), f)
+
+
+def load_stats(path):
+    with open(path, encoding='utf-8') as f:
+        return ListingStats.from_dict(json.load(f))
+
+
+def merged_stats(stats_dir=DEFAULT_STATS_DIR, cities=None, weeks=None):
+    """
+    Łączy zapisane szkice wybranych miast i tygodni w jeden.
+
+    Args:
+        stats_dir (str): Katalog ze szkicami {miasto}_{tydzień}.json
+        cities (list): Miasta (domyślnie: wszystkie)
+        weeks (list): Tygodnie ISO, np. ['2025-W41'] (domyślnie: wszystkie)
+
+    Returns:
+        tuple: (ListingStats, liczba scalonych plików)
+    """
+    stats, merged = ListingStats(), 0
+    for path in sorted(glob.glob(os.path.join(stats_dir, '*_*.json'))):
+        city, week = os.path.splitext(os.path.basename(path))[0].rsplit('_', 1)
+        if (cities and city not in cities) or (weeks and week not in weeks):
+            continue
+        stats.merge(load_stats(path))
+        merged += 1
+    return stats, merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Rozkłady cen z histogramów i liczby unikalnych ogłoszeń z HyperLogLog',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Przykłady użycia:
+  # Wszystkie miasta i tygodnie (szkice zapisuje clean_data.py)
+  python sketches.py
+
+  # Łódź i Kraków w dwóch tygodniach, własne kwantyle
+  python sketches.py --cities lodz krakow --weeks 2025-W40 2025-W41 --quantiles 0.05 0.5 0.95
+        """
+    )
+    parser.add_argument('--stats-dir', default=DEFAULT_STATS_DIR, help=f'Katalog szkiców (domyślnie: {DEFAULT_STATS_DIR})')
+    parser.add_argument('--cities', nargs='+', default=None, help='Miasta (domyślnie: wszystkie)')
+    parser.add_argument('--weeks', nargs='+', default=None, help='Tygodnie ISO (domyślnie: wszystkie)')
+    parser.add_argument('--quantiles', nargs='+', type=float, default=[0.1, 0.25, 0.5, 0.75, 0.9],
+                        help='Kwantyle do wyświetlenia')
+    args = parser.parse_args()
+
+    stats, merged = merged_stats(args.stats_dir, args.cities, args.weeks)
+    if not merged:
+        print(f"Brak szkiców w {args.stats_dir} - uruchom clean_data.py")
+        exit(1)
+    summary = stats.summary(args.quantiles)
+    print(f"Scalono {merged} szkiców: {summary['rows']} ogłoszeń")
+    for column in DISTINCT_COLUMNS:
+        print(f"  - unikalne {column}: ~{summary[f'distinct_{column}']}")
+    for column in QUANTILE_COLUMNS:
+        values = ', '.join(f"{name}={value:,.0f}" for name, value in summary[column].items()
+                           if name != 'count' and value is not None)
+        print(f"  - {column} (n={summary[column]['count']}): {values}")